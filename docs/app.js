@@ -7,51 +7,21 @@ const DB = {
     set(key, data) { localStorage.setItem('tm_' + key, JSON.stringify(data)); },
     nextId(key) {
         const items = this.get(key);
+        // While syncing, new records get negative ids until the server assigns one
+        if (Sync.enabled()) return Math.min(0, ...items.map(i => i.id)) - 1;
         return items.length ? Math.max(...items.map(i => i.id)) + 1 : 1;
     }
 };
 
-// Seed reference data on first load (version bumps force re-seed)
+// Seed sample CRM data on first load (version bumps force re-seed). Reference
+// data (stores, neighborhoods, zip codes, competitors) comes from
+// the data/ bundles instead; see Bundles below.
 const SEED_VERSION = '4';
 function seedData() {
     if (localStorage.getItem('tm_seeded') === SEED_VERSION) return;
     // Clear old data on version bump
-    ['stores','neighborhoods','zipcodes','contacts','deals','tasks','interactions','campaigns','competitors'].forEach(k => localStorage.removeItem('tm_' + k));
-
-    DB.set('stores', [
-        {id:1, rank:1, name:"Kroger", category:"Grocery/Supermarket", address:"300 North Dean Road", city:"Auburn", zip:"36830", neighborhood:"Near Moores Mill / Cloverleaf"},
-        {id:2, rank:2, name:"Publix", category:"Grocery/Supermarket", address:"138 South Gay Street", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:3, rank:3, name:"Auburn Hardware", category:"Hardware Store", address:"117 East Magnolia Avenue", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:4, rank:4, name:"Russell Building Supply", category:"Hardware Store", address:"141 Bragg Avenue", city:"Auburn", zip:"36830", neighborhood:"Near University Estates"},
-        {id:5, rank:5, name:"fab'rik", category:"Clothing Store", address:"140 North College Street", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:6, rank:6, name:"Elisabet Boutique", category:"Clothing Store", address:"124 North College Street", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:7, rank:7, name:"Ellie Clothing", category:"Clothing Store", address:"113 North College Street", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:8, rank:8, name:"Johnston & Malone Book Store", category:"Bookstore", address:"115 South College Street", city:"Auburn", zip:"36830", neighborhood:"Downtown Auburn"},
-        {id:9, rank:9, name:"Woodley Enterprises", category:"Computer Store", address:"557 Temple Street", city:"Auburn", zip:"36830", neighborhood:"Near Grove Hill"},
-        {id:10, rank:10, name:"Z&Z Tobacco & Spirits", category:"Liquor Store", address:"203 Opelika Road", city:"Auburn", zip:"36830", neighborhood:"Near Yarbrough Farms"}
-    ]);
-
-    DB.set('neighborhoods', [
-        {id:1, rank:1, type:"NEIGHBORHOOD", name:"Moores Mill", zip:"36830", medianHome:553072, features:"Top 15% income in America. Golf course community, country club, custom homes. 40% have advanced degrees."},
-        {id:2, rank:2, type:"NEIGHBORHOOD", name:"Cloverleaf / Windsor Forest", zip:"36830", medianHome:null, features:"Ranked 2nd most expensive Auburn neighborhood."},
-        {id:3, rank:3, type:"NEIGHBORHOOD", name:"Willow Creek Farms", zip:"36830", medianHome:null, features:"Ranked 3rd most expensive. Upscale family neighborhood."},
-        {id:4, rank:4, type:"NEIGHBORHOOD", name:"Yarbrough Farms / AU Club", zip:"36830", medianHome:null, features:"Premium prices. Proximity to AU campus. High demand."},
-        {id:5, rank:5, type:"NEIGHBORHOOD", name:"Downtown Auburn", zip:"36830", medianHome:null, features:"Premium location near university. High demand, walkable."},
-        {id:6, rank:6, type:"NEIGHBORHOOD", name:"University Estates", zip:"36830", medianHome:null, features:"Faculty and professional housing near campus."},
-        {id:7, rank:7, type:"NEIGHBORHOOD", name:"Granite Hills / Head Estates", zip:"36830", medianHome:null, features:"Established upscale area."},
-        {id:8, rank:8, type:"NEIGHBORHOOD", name:"Grove Hill", zip:"36830", medianHome:null, features:"Homes $300K-$500K range. Established neighborhood."},
-        {id:9, rank:9, type:"NEIGHBORHOOD", name:"Stone Creek / Cobblestone", zip:"36832", medianHome:null, features:"Ranked 9th most expensive Auburn neighborhood."},
-        {id:10, rank:10, type:"NEIGHBORHOOD", name:"Asheton Lakes", zip:"36830", medianHome:null, features:"HOA community with lake amenities."}
-    ]);
-
-    DB.set('zipcodes', [
-        {id:1, rank:1, name:"Auburn (Primary)", zip:"36830", medianIncome:70188, avgIncome:103989, pctOver200k:12.9, features:"Highest income Auburn zip. 45-64 age bracket earns $22K median."},
-        {id:2, rank:2, name:"Opelika (West)", zip:"36804", medianIncome:null, avgIncome:null, pctOver200k:null, features:"Top 1 most expensive homes in Auburn metro."},
-        {id:3, rank:3, name:"Auburn (University)", zip:"36832", medianIncome:42717, avgIncome:69895, pctOver200k:6.0, features:"Heavy student population lowers median. Still has pockets of wealth."},
-        {id:4, rank:4, name:"Opelika (East)", zip:"36801", medianIncome:null, avgIncome:null, pctOver200k:null, features:"Top 2 most expensive homes in Auburn metro."},
-        {id:5, rank:5, name:"Waverly", zip:"36879", medianIncome:93029, avgIncome:null, pctOver200k:null, features:"Higher median income than Auburn 36830. Rural luxury estates."},
-        {id:6, rank:6, name:"Salem", zip:"36874", medianIncome:null, avgIncome:null, pctOver200k:null, features:"Growing area. 5yr home value up 39.7%."}
-    ]);
+    ['contacts','deals','tasks','interactions','campaigns'].forEach(k => localStorage.removeItem('tm_' + k));
+    localStorage.removeItem('tm_sync_cursor');  // refill synced tables from the server on the next sync
 
     // Seed sample CRM data so dashboard isn't empty
     DB.set('contacts', [
@@ -98,17 +68,6 @@ function seedData() {
         {id:3, name:"Yarbrough Farms Flyer Drop", campaignType:"Flyer Drop", targetArea:"Yarbrough Farms / AU Club", budget:75, startDate:"2026-02-23", endDate:"2026-02-23", status:"Planned", leadsGenerated:0, dealsWon:0, revenueGenerated:0, notes:"200 flyers, color printed. Drop on a Saturday morning.", createdDate:"2026-02-19T12:00:00Z", updatedDate:"2026-02-19T12:00:00Z"}
     ]);
 
-    DB.set('competitors', [
-        {id:1, name:"Sparkle Alabama", category:"Window Cleaning, Pressure Washing, Gutter Cleaning", owner:"", phone:"334-759-7080", email:"customerservice@sparklealabama.com", website:"https://sparklealabama.com", address:"500 N. 26th Street, Unit 405", city:"Opelika", zip:"36801", googleRating:4.8, reviewCount:50, yearEstablished:2016, socialMedia:{facebook:"facebook.com/sparklealabama", instagram:"instagram.com/sparklealabama"}, services:"Window Cleaning (pure water method), Pressure Washing, Soft Washing, Gutter Cleaning", serviceArea:"Auburn, Opelika, Lake Martin, Montgomery, Pike Road, Birmingham", pricing:"Free estimates, no published prices", seoKeywords:"window cleaning, gutter cleaning, pressure washing, residential, commercial, Alabama, pure water cleaning", adStrategy:"SEO-focused website with blog content. Free estimates as main CTA. Licensed & insured messaging. Pure water method as differentiator.", socialStrategy:"Active on Facebook and Instagram. Before/after photos. Local community engagement.", strengths:"Established since 2016, strong brand, wide service area, pure water method differentiator, professional website", weaknesses:"Covers huge area (Birmingham to Montgomery) - may be spread thin locally", threatLevel:"High", notes:"Biggest established competitor in Auburn/Opelika. Professional operation with good online presence."},
-        {id:2, name:"Tiger Window Cleaning (TWC)", category:"Window Cleaning, Pressure Washing, Soft Washing", owner:"Jack (Auburn student)", phone:"303-746-0542", email:"info@twcauburn.com", website:"https://www.twcauburn.com", address:"100 North Gay St, Box 104", city:"Auburn", zip:"36830", googleRating:4.8, reviewCount:51, yearEstablished:2023, socialMedia:{instagram:"@twc_auburn (223 followers, 24 posts)"}, services:"Interior/Exterior Window Cleaning, Screen Cleaning, Pressure Washing, Soft Washing, Driveway/Concrete Cleaning", serviceArea:"Within 1 hour of downtown Auburn", pricing:"Free estimates, same-day estimates available", seoKeywords:"professional window cleaning Auburn AL, same-day service, 4.8 star rating, Auburn students, licensed bonded insured", adStrategy:"SEO-optimized site highlighting 4.8 star Google rating and 51+ reviews. Student-owned angle. Same-day service as differentiator. 100% satisfaction guarantee.", socialStrategy:"Instagram @twc_auburn with 223 followers. Showcases work, student-led brand. Faith/values-based messaging.", strengths:"Student-run (low overhead), same-day estimates, strong Google reviews, satisfaction guarantee, downtown Auburn address", weaknesses:"Small team of students, may lose workers to graduation, limited track record (est. 2023)", threatLevel:"Medium", notes:"Direct competitor with similar name vibe. Student-run keeps costs low. Watch their growth."},
-        {id:3, name:"Auburn House Wash", category:"Pressure Washing, Soft Washing, Roof Cleaning", owner:"", phone:"334-826-9274", email:"sales@auburnhousewash.com", website:"https://auburnhousewash.com", address:"221 Lee Rd 10, Suite 1", city:"Auburn", zip:"36830", googleRating:4.5, reviewCount:30, yearEstablished:null, socialMedia:{facebook:"Yes", instagram:"Yes", twitter:"Yes"}, services:"Soft House Washing, Roof Cleaning (no-pressure), Hard Surface Cleaning, Decks/Fences, Gutter Cleaning, Concrete, Commercial Building Wash", serviceArea:"Auburn, Montgomery, Columbus, Lake Martin", pricing:"Instant quote tool on website, free estimates", seoKeywords:"pressure washing, soft washing, roof cleaning, Auburn, Montgomery, Columbus, Lake Martin, mold removal, mildew removal, algae removal", adStrategy:"Instant quote popup on website. Strong SEO with service-area pages. Three-Year Streak Free Guarantee for roof cleaning. Community outreach program.", socialStrategy:"Active on Facebook, Twitter, Instagram. Mixed Yelp reviews (negative review about washing in rain).", strengths:"Instant quote tool, 3-year roof guarantee, wide commercial offerings, community outreach", weaknesses:"Mixed reviews on Yelp (rain washing complaint, grass dying), covers too wide an area", threatLevel:"Medium", notes:"Watch their pricing and instant quote tool - good idea to copy. Roof cleaning specialty."},
-        {id:4, name:"Gibson Pressure Washing LLC", category:"Pressure Washing, Roof Cleaning, Window Cleaning", owner:"", phone:"706-518-4886", email:"", website:"https://www.gibsonpressurewash.com", address:"1813 Jollit Avenue", city:"Opelika", zip:"36801", googleRating:4.9, reviewCount:90, yearEstablished:null, socialMedia:{facebook:"Yes", youtube:"Yes", instagram:"Yes"}, services:"House Washing (soft wash), Roof Cleaning, Driveway/Concrete, Window Cleaning, Pool Deck, Deck/Fence, Gutter Cleaning/Brightening, Commercial (dumpster pad, building, parking lot, HOA, truck wash)", serviceArea:"Auburn, Opelika, Lake Martin, Montgomery, LaGrange GA", pricing:"15% OFF first-time customers, free estimates", seoKeywords:"pressure washing Auburn, roof cleaning, house washing, exterior cleaning, soft washing, driveway washing", adStrategy:"15% first-time customer discount as lead magnet. Before/after project gallery. Strong local SEO with area-specific pages. Free estimate CTA.", socialStrategy:"Active on Facebook, YouTube, Instagram. Before/after project photos. Video content on YouTube.", strengths:"Highest review count (90+), 4.9 rating, 15% new customer discount, wide commercial services, video marketing", weaknesses:"Based in Opelika not Auburn, 706 area code (GA number)", threatLevel:"High", notes:"Top-rated competitor. Their 15% first-time discount is smart. Study their before/after gallery approach."},
-        {id:5, name:"East Alabama Washing LLC", category:"Pressure Washing, Window Washing, Exterior Cleaning", owner:"Matt Harrison (AU alumnus)", phone:"334-319-5614", email:"", website:"https://www.eastalabamawashing.com", address:"", city:"Auburn", zip:"", googleRating:4.7, reviewCount:40, yearEstablished:2009, socialMedia:{}, services:"Pressure Washing, Roof/Gutter Cleaning, Concrete Cleaning, Wood Deck/Fencing, Window Washing, Commercial Exterior", serviceArea:"Auburn, Opelika, Lake Martin, surrounding areas", pricing:"Free estimates", seoKeywords:"exterior cleaning, pressure washing, Auburn Alabama, Opelika, residential, commercial", adStrategy:"Wix-based website. Established brand (since 2009). Highlights major clients (Auburn University, City of Auburn). Over 1 million sq ft serviced.", socialStrategy:"LinkedIn presence (Matt Harrison). Limited social media compared to competitors.", strengths:"Longest established (2009), AU alumnus connection, major institutional clients (Auburn University, City of Auburn), 1M+ sq ft serviced", weaknesses:"Wix website (harder to load/SEO), limited social media, older brand feel", threatLevel:"Medium", notes:"The OG competitor. Has institutional contracts. Matt Harrison is an AU alum - network advantage."},
-        {id:6, name:"The Clear Difference", category:"Window Cleaning, Gutter Cleaning, Pressure Washing, Christmas Lights", owner:"Marshall Brown", phone:"334-377-9966", email:"marshall@thecleardifference.com", website:"https://thecleardifference.com", address:"", city:"Auburn", zip:"", googleRating:5.0, reviewCount:100, yearEstablished:null, socialMedia:{facebook:"Yes", instagram:"Yes", linkedin:"Yes", pinterest:"Yes", twitter:"Yes", youtube:"Yes"}, services:"Gutter Cleaning, Gutter Guard Installation, Window Cleaning, Dryer Vent Cleaning, Landscape Lighting, Christmas Light Installation, Pressure Washing, Roof Cleaning, House Washing", serviceArea:"Auburn, Opelika, Dadeville", pricing:"Free estimates, responds within an hour", seoKeywords:"gutter cleaning Auburn Opelika, window cleaning, dryer vent cleaning, Christmas lights, gutter guard installation, roof cleaning", adStrategy:"100+ 5-star Google reviews prominently displayed. Satisfaction guaranteed. Fast response time (within 1 hour). Before/after photo documentation. Diverse service menu including Christmas lights and dryer vents.", socialStrategy:"Most social channels of any competitor - Facebook, Instagram, LinkedIn, Pinterest, Twitter, YouTube. Wide content distribution.", strengths:"Perfect 5.0 Google rating, 100+ reviews, fastest response time, widest service menu (Christmas lights, dryer vents, landscape lighting), most social channels", weaknesses:"Jack of all trades - may not specialize deeply in any one service", threatLevel:"High", notes:"WATCH THIS ONE CLOSELY. Perfect rating, most reviews, widest service range. Christmas lights and dryer vents are smart upsells we should consider."},
-        {id:7, name:"Rolling Suds", category:"Pressure Washing, Window Cleaning", owner:"Franchise", phone:"", email:"", website:"https://www.rollingsudspowerwashing.com", address:"", city:"Auburn", zip:"", googleRating:4.5, reviewCount:25, yearEstablished:1990, socialMedia:{}, services:"Pressure Washing, Soft Washing, Window Cleaning, House Washing, Driveway Cleaning", serviceArea:"Auburn AL and surrounding areas", pricing:"Free estimates", seoKeywords:"pressure washing near me Auburn AL, home power washing service, window washing Auburn", adStrategy:"National franchise SEO - area-specific landing pages for every ZIP code and service combination. Corporate marketing support. 500K+ satisfied customers claim.", socialStrategy:"Corporate social media, not locally managed.", strengths:"National brand recognition, franchise marketing support, established since 1990, area-specific SEO pages for every zip code", weaknesses:"Franchise model = higher prices, not locally owned, generic feel, corporate not personal", threatLevel:"Low", notes:"Franchise competitor. Their SEO strategy of zip-code specific pages is worth studying. Higher prices than local operators."},
-        {id:8, name:"CSI Restoration and Cleaning", category:"Pressure Washing, Window Cleaning, Restoration", owner:"", phone:"", email:"", website:"https://csi-restorationandcleaning.com", address:"", city:"Opelika", zip:"", googleRating:4.6, reviewCount:35, yearEstablished:1976, socialMedia:{}, services:"Window/Gutter Cleaning, Pressure Washing, Restoration Services, Commercial Cleaning", serviceArea:"Auburn, Opelika", pricing:"", seoKeywords:"restoration cleaning Opelika, pressure washing, commercial cleaning", adStrategy:"Longevity as trust signal (since 1976). Licensed and bonded. Dual focus on cleaning + restoration.", socialStrategy:"Minimal social media presence.", strengths:"Oldest company in market (since 1976), licensed and bonded, restoration services as differentiator", weaknesses:"Dated brand, minimal online presence, Opelika-focused", threatLevel:"Low", notes:"Legacy competitor. Not aggressive in marketing but has decades of trust. Restoration niche."}
-    ]);
-
     localStorage.setItem('tm_seeded', SEED_VERSION);
 }
 
@@ -170,9 +129,11 @@ function populateDealSelect(selectId, selectedId) {
 
 // ===== NAVIGATION =====
 let currentPage = 'dashboard';
+let currentOpts;
 
 function showPage(page, opts) {
     currentPage = page;
+    currentOpts = opts;
     // Hide all pages
     document.querySelectorAll('.page-content').forEach(p => p.style.display = 'none');
 
@@ -447,6 +408,7 @@ function saveContact(e) {
     }
 
     DB.set('contacts', contacts);
+    Sync.queue('contacts', 'put', id ? contacts.find(c => c.id == id) : data);
     flash(id ? 'Contact updated!' : 'Contact created!', 'success');
     showPage('contacts');
 }
@@ -454,6 +416,7 @@ function saveContact(e) {
 function deleteContact(id) {
     if (!confirm('Delete this contact?')) return;
     let contacts = DB.get('contacts');
+    Sync.queue('contacts', 'del', contacts.find(c => c.id == id));
     contacts = contacts.filter(c => c.id != id);
     DB.set('contacts', contacts);
     flash('Contact deleted.', 'success');
@@ -630,12 +593,14 @@ function saveDeal(e) {
     }
 
     DB.set('deals', deals);
+    Sync.queue('deals', 'put', id ? deals.find(d => d.id == id) : data);
     flash(id ? 'Deal updated!' : 'Deal created!', 'success');
     showPage('deals');
 }
 
 function deleteDeal(id) {
     if (!confirm('Delete this deal?')) return;
+    Sync.queue('deals', 'del', DB.get('deals').find(d => d.id == id));
     DB.set('deals', DB.get('deals').filter(d => d.id != id));
     flash('Deal deleted.', 'success');
     renderDeals();
@@ -730,6 +695,7 @@ function saveTask(e) {
     }
 
     DB.set('tasks', tasks);
+    Sync.queue('tasks', 'put', id ? tasks.find(t => t.id == id) : data);
     flash(id ? 'Task updated!' : 'Task created!', 'success');
     showPage('tasks');
 }
@@ -741,6 +707,7 @@ function completeTask(id) {
         tasks[idx].status = 'Completed';
         tasks[idx].completedDate = now();
         DB.set('tasks', tasks);
+        Sync.queue('tasks', 'put', tasks[idx]);
         flash('Task completed!', 'success');
         renderTasks();
         updateNavCounts();
@@ -749,6 +716,7 @@ function completeTask(id) {
 
 function deleteTask(id) {
     if (!confirm('Delete this task?')) return;
+    Sync.queue('tasks', 'del', DB.get('tasks').find(t => t.id == id));
     DB.set('tasks', DB.get('tasks').filter(t => t.id != id));
     flash('Task deleted.', 'success');
     renderTasks();
@@ -799,6 +767,7 @@ function saveInteraction(e) {
 
     interactions.push(data);
     DB.set('interactions', interactions);
+    Sync.queue('interactions', 'put', data);
     flash('Interaction logged!', 'success');
     showPage('interactions');
 }
@@ -885,12 +854,14 @@ function saveCampaign(e) {
     }
 
     DB.set('campaigns', campaigns);
+    Sync.queue('campaigns', 'put', id ? campaigns.find(c => c.id == id) : data);
     flash(id ? 'Campaign updated!' : 'Campaign created!', 'success');
     showPage('campaigns');
 }
 
 function deleteCampaign(id) {
     if (!confirm('Delete this campaign?')) return;
+    Sync.queue('campaigns', 'del', DB.get('campaigns').find(c => c.id == id));
     DB.set('campaigns', DB.get('campaigns').filter(c => c.id != id));
     flash('Campaign deleted.', 'success');
     renderCampaigns();
@@ -1030,6 +1001,301 @@ function renderCompetitorDetail(opts) {
     `;
 }
 
+// ===== REFERENCE DATA BUNDLES =====
+// scripts/build_static_data.py writes each dataset as content-hashed shards
+// under data/ and lists their hashes in data/manifest.json. Only shards whose
+// hash changed since the last visit are downloaded (gzipped where the browser
+// can unpack it); the rest are reassembled from this device's copy. Datasets
+// in the manifest that aren't listed here (businesses) are not downloaded, and
+// copies an older version stored are dropped.
+const BUNDLE_DATASETS = ['stores', 'neighborhoods', 'zipcodes', 'competitors'];
+
+const Bundles = {
+    hashes() { return JSON.parse(localStorage.getItem('tm_bundle_hashes') || '{}'); },
+    cached(name, i) { return JSON.parse(localStorage.getItem(`tm_shard_${name}_${i}`) || 'null'); },
+
+    async fetchShard(file) {
+        let payload = null;
+        if (typeof DecompressionStream !== 'undefined') {
+            try {
+                const res = await fetch('data/' + file + '.gz');
+                if (res.ok) payload = JSON.parse(await new Response(res.body.pipeThrough(new DecompressionStream('gzip'))).text());
+            } catch (err) { payload = null; }   // e.g. a host that already decoded it
+        }
+        if (!payload) {
+            const res = await fetch('data/' + file);
+            if (!res.ok) throw new Error(file + ': HTTP ' + res.status);
+            payload = await res.json();
+        }
+        return payload.rows.map(row => Object.fromEntries(payload.fields.map((f, i) => [f, row[i]])));
+    },
+
+    // Refresh changed datasets; returns the names that changed
+    async load() {
+        let manifest;
+        try {
+            const res = await fetch('data/manifest.json', { cache: 'no-cache' });
+            if (!res.ok) return [];
+            manifest = await res.json();
+        } catch (err) { return []; }   // offline: keep what we have
+
+        const have = this.hashes();
+        const changed = [];
+        for (const name of Object.keys(have)) {
+            if (BUNDLE_DATASETS.includes(name)) continue;
+            have[name].forEach((_, i) => localStorage.removeItem(`tm_shard_${name}_${i}`));
+            localStorage.removeItem('tm_' + name);
+            delete have[name];
+        }
+        for (const name of BUNDLE_DATASETS) {
+            const ds = manifest.datasets[name];
+            if (!ds || (name === 'competitors' && Sync.enabled())) continue;   // the CRM sync feed owns them then
+            const hashes = ds.shards.map(sh => sh.hash);
+            const old = have[name] || [];
+            if (hashes.join() === old.join()) continue;
+            try {
+                const parts = await Promise.all(ds.shards.map((sh, i) =>
+                    (old[i] === sh.hash && this.cached(name, i)) || this.fetchShard(sh.file)));
+                parts.forEach((rows, i) => localStorage.setItem(`tm_shard_${name}_${i}`, JSON.stringify(rows)));
+                for (let i = parts.length; i < old.length; i++) localStorage.removeItem(`tm_shard_${name}_${i}`);
+                DB.set(name, parts.flat());
+                have[name] = hashes;
+                changed.push(name);
+            } catch (err) {
+                console.warn('Bundle ' + name + ' not updated:', err);
+            }
+        }
+        localStorage.setItem('tm_bundle_hashes', JSON.stringify(have));
+        return changed;
+    }
+};
+
+// ===== SYNC WITH THE FLASK CRM (optional) =====
+// Once a server is set (sidebar > Sync), edits are queued in an outbox and
+// pushed in one batch to /api/sync/push; then only the records changed since
+// the last cursor are pulled from /api/sync. Records created offline carry
+// negative ids until the server assigns real ones. `_v` is the server version
+// a record was last seen at; an edit made against an older one is a conflict
+// and the server's copy wins.
+const SYNC_TABLES = ['contacts', 'deals', 'tasks', 'interactions', 'campaigns', 'competitors'];
+const SYNC_REFS = { contactId: 'contacts', dealId: 'deals' };
+const SYNC_INTERVAL_MS = 5 * 60 * 1000;
+
+const Sync = {
+    running: false,
+    timer: null,
+
+    url() { return (localStorage.getItem('tm_sync_url') || '').replace(/\/+$/, ''); },
+    enabled() { return !!this.url(); },
+    cursor() { return parseInt(localStorage.getItem('tm_sync_cursor') || '0', 10); },
+    outbox() { return JSON.parse(localStorage.getItem('tm_sync_outbox') || '{}'); },
+    saveOutbox(box) { localStorage.setItem('tm_sync_outbox', JSON.stringify(box)); this.showStatus(); },
+
+    headers(json) {
+        const h = {};
+        const token = localStorage.getItem('tm_sync_token');
+        if (token) h['Authorization'] = 'Bearer ' + token;
+        if (json) h['Content-Type'] = 'application/json';
+        return h;
+    },
+
+    // Record a local put/del of rec in the outbox (latest edit per record wins)
+    queue(table, op, rec) {
+        if (!this.enabled() || !rec) return;
+        const box = this.outbox();
+        const key = table + ':' + rec.id;
+        if (op === 'del' && rec.id < 0 && !this.isPending(table, rec.id)) delete box[key];  // never reached the server
+        else box[key] = { t: table, op: op, id: Number(rec.id), base: op === 'del' ? (rec._v ?? null) : undefined };
+        this.saveOutbox(box);
+        this.schedule(2000);
+    },
+
+    isPending(table, id) {
+        const pending = JSON.parse(localStorage.getItem('tm_sync_pending') || 'null');
+        return !!pending && pending.ops.some(o => o.t === table && o.id == id);
+    },
+
+    schedule(delay) {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.run(), delay);
+    },
+
+    // Push pending edits, then pull changes. Safe to call any time.
+    async run() {
+        if (!this.enabled() || this.running || !navigator.onLine) return;
+        this.running = true;
+        this.showStatus('syncing');
+        try {
+            await this.push();
+            const changed = await this.pull();
+            if (changed && !currentPage.endsWith('-form')) showPage(currentPage, currentOpts);
+            this.showStatus();
+        } catch (err) {
+            console.warn('Sync failed:', err);
+            this.showStatus('offline');
+        } finally {
+            this.running = false;
+            this.schedule(SYNC_INTERVAL_MS);
+        }
+    },
+
+    async push() {
+        // A batch is frozen until the server answers, and resent with the same id
+        // after a failure, so the server never applies it twice
+        let pending = JSON.parse(localStorage.getItem('tm_sync_pending') || 'null');
+        if (!pending) {
+            const box = this.outbox();
+            const ops = [];
+            Object.values(box).forEach(e => {
+                if (e.op === 'del') { ops.push({ t: e.t, op: 'del', id: e.id, base: e.base }); return; }
+                const rec = DB.get(e.t).find(r => r.id == e.id);
+                if (!rec) return;
+                const data = { ...rec };
+                delete data.id; delete data._v;
+                ops.push({ t: e.t, op: 'put', id: e.id, base: rec._v ?? null, data: data });
+            });
+            if (!ops.length) return;
+            pending = { batch: Date.now().toString(36) + Math.random().toString(36).slice(2), ops: ops };
+            localStorage.setItem('tm_sync_pending', JSON.stringify(pending));
+            this.saveOutbox({});
+        }
+
+        const res = await fetch(this.url() + '/api/sync/push', {
+            method: 'POST', headers: this.headers(true), body: JSON.stringify(pending)
+        });
+        if (res.status === 400) {   // malformed batch: it will never apply, so drop it
+            console.warn('Sync push rejected:', await res.text());
+            localStorage.removeItem('tm_sync_pending');
+            return;
+        }
+        if (!res.ok) throw new Error('push HTTP ' + res.status);
+        const result = await res.json();
+        localStorage.removeItem('tm_sync_pending');
+
+        let conflicts = 0;
+        result.results.forEach((r, i) => {
+            const op = pending.ops[i];
+            if (r.status === 'ok' && op.op === 'put') {
+                if (op.id < 0) this.renameId(op.t, op.id, r.id);
+                this.patch(op.t, r.id, rec => rec && { ...rec, _v: r.v });
+            } else if (r.status === 'conflict') {
+                conflicts++;
+                this.patch(op.t, r.id, () => this.fromServer(r.row));
+                this.drop(op.t, r.id);
+            } else if (r.status === 'gone') {
+                this.patch(op.t, r.id, () => null);
+                this.drop(op.t, r.id);
+            }
+        });
+        if (conflicts) flash(`${conflicts} edit(s) changed on the server meanwhile; kept the server's version.`, 'error');
+    },
+
+    async pull() {
+        let cursor = this.cursor(), more = true, changed = 0;
+        if (cursor === 0) {
+            // First sync: the server's records replace the local sample data
+            SYNC_TABLES.forEach(t => DB.set(t, DB.get(t).filter(r => r.id < 0)));
+            changed++;
+        }
+        const box = this.outbox();
+        while (more) {
+            const res = await fetch(`${this.url()}/api/sync?since=${cursor}`, { headers: this.headers(false) });
+            if (!res.ok) throw new Error('pull HTTP ' + res.status);
+            const feed = await res.json();
+            Object.entries(feed.tables).forEach(([table, t]) => {
+                const byId = new Map(DB.get(table).map(r => [r.id, r]));
+                t.rows.forEach(row => {
+                    const rec = this.fromServer(Object.fromEntries(t.fields.map((f, i) => [f, row[i]])));
+                    if (box[table + ':' + rec.id]) return;   // unpushed local edit wins until it is pushed
+                    byId.set(rec.id, { ...(byId.get(rec.id) || {}), ...rec });
+                });
+                t.deleted.forEach(id => byId.delete(id));
+                DB.set(table, [...byId.values()]);
+                changed += t.rows.length + t.deleted.length;
+            });
+            cursor = feed.cursor;
+            more = feed.more;
+            localStorage.setItem('tm_sync_cursor', String(cursor));
+        }
+        return changed;
+    },
+
+    // Server timestamps are UTC 'YYYY-MM-DD HH:MM:SS'; make them ISO like local ones
+    fromServer(rec) {
+        Object.keys(rec).forEach(k => {
+            if (typeof rec[k] === 'string' && /^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$/.test(rec[k])) rec[k] = rec[k].replace(' ', 'T') + 'Z';
+        });
+        return rec;
+    },
+
+    // Replace (or with null, remove) one record
+    patch(table, id, fn) {
+        const rows = DB.get(table);
+        const idx = rows.findIndex(r => r.id == id);
+        const rec = fn(idx >= 0 ? rows[idx] : null);
+        if (idx >= 0 && rec) rows[idx] = rec;
+        else if (idx >= 0) rows.splice(idx, 1);
+        else if (rec) rows.push(rec);
+        DB.set(table, rows);
+    },
+
+    drop(table, id) {
+        const box = this.outbox();
+        delete box[table + ':' + id];
+        this.saveOutbox(box);
+    },
+
+    // An offline record got its server id: update it, references to it and queued edits
+    renameId(table, from, to) {
+        this.patch(table, from, rec => rec && { ...rec, id: to });
+        Object.entries(SYNC_REFS).filter(([, t]) => t === table).forEach(([field]) => {
+            SYNC_TABLES.forEach(t => {
+                const rows = DB.get(t);
+                if (rows.some(r => r[field] == from)) DB.set(t, rows.map(r => r[field] == from ? { ...r, [field]: to } : r));
+            });
+        });
+        const box = this.outbox();
+        if (box[table + ':' + from]) {
+            box[table + ':' + to] = { ...box[table + ':' + from], id: to };
+            delete box[table + ':' + from];
+            this.saveOutbox(box);
+        }
+    },
+
+    configure() {
+        const url = prompt('CRM server URL for sync (blank turns sync off):', this.url());
+        if (url === null) return;
+        if (url.trim() && !confirm('Syncing replaces the data on this device with the CRM server\'s. Continue?')) return;
+        const token = url.trim() ? prompt('Sync token (blank if the server has none):', localStorage.getItem('tm_sync_token') || '') : '';
+        localStorage.setItem('tm_sync_url', url.trim());
+        localStorage.setItem('tm_sync_token', (token || '').trim());
+        ['tm_sync_cursor', 'tm_sync_outbox', 'tm_sync_pending'].forEach(k => localStorage.removeItem(k));
+        this.showStatus();
+        this.run();
+    },
+
+    showStatus(state) {
+        const el = $('nav-sync-status');
+        if (!el) return;
+        const queued = Object.keys(this.outbox()).length;
+        el.textContent = !this.enabled() ? 'off' : state === 'syncing' ? '\u2026' : state === 'offline' ? '!' : queued || '\u2713';
+        el.className = 'badge' + (state === 'offline' ? ' red' : '');
+    },
+
+    start() {
+        this.showStatus();
+        window.addEventListener('online', () => this.run());
+        document.addEventListener('visibilitychange', () => { if (!document.hidden) this.run(); });
+        this.run();
+    }
+};
+
 // ===== INIT =====
 seedData();
 showPage('dashboard');
+Bundles.load().then(changed => {
+    const pages = { stores: ['stores'], neighborhoods: ['territories'], zipcodes: ['territories'],
+                    competitors: ['competitors', 'competitor-detail'] };
+    if (changed.some(name => (pages[name] || []).includes(currentPage))) showPage(currentPage, currentOpts);
+});
+Sync.start();
@@ -0,0 +1,50 @@
+"""
+Keys, endpoints and timeouts for every external API the scripts call.
+
+GOOGLE_API_KEY comes from the environment only; the Google-calling scripts
+stop with an error when it is missing. TIGER_API_BASE points every endpoint
+at one local server (see fake_apis.py), which needs no key, for offline runs
+and benchmarks:
+
+    python fake_apis.py --port 8799 &
+    TIGER_API_BASE=http://127.0.0.1:8799 python pull_businesses.py --stream --refresh
+"""
+
+import os
+
+GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY', '')
+DB_CONN_STR = os.environ.get('TIGER_DB_CONN_STR',
+                             'DRIVER={SQL Server};SERVER=localhost;DATABASE=TIGER_MARKETING;Trusted_Connection=yes;')
+
+API_BASE = os.environ.get('TIGER_API_BASE', '').rstrip('/')
+
+OVERPASS_URL = f"{API_BASE}/api/interpreter" if API_BASE else "https://overpass-api.de/api/interpreter"
+PLACES_SEARCH_URL = f"{API_BASE or 'https://places.googleapis.com'}/v1/places:searchText"
+PLACES_PHOTO_URL = f"{API_BASE or 'https://places.googleapis.com'}/v1/{{name}}/media"
+STREETVIEW_URL = f"{API_BASE or 'https://maps.googleapis.com'}/maps/api/streetview"
+
+# Read timeouts in seconds per service (the connect timeout is CONNECT_TIMEOUT)
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+TIMEOUTS = {
+    'overpass': 90,
+    'overpass_stream': 600,
+    'places': 10,
+    'places_photo': 15,
+    'streetview_meta': 10,
+    'streetview': 15,
+    'default': 30,
+}
+POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '16'))   # keep-alive connections per host
+
+
+def require_google_key():
+    """GOOGLE_API_KEY; exits with instructions when it isn't set (unless TIGER_API_BASE is)."""
+    if not GOOGLE_API_KEY and not API_BASE:
+        raise SystemExit("GOOGLE_API_KEY is not set. Export a Google Maps Platform key with the Places "
+                         "and Street View Static APIs enabled, e.g. GOOGLE_API_KEY=... python <script>.py")
+    return GOOGLE_API_KEY
+
+
+def timeout(service):
+    """(connect, read) timeout tuple for a TIMEOUTS service name."""
+    return CONNECT_TIMEOUT, TIMEOUTS.get(service, TIMEOUTS['default'])
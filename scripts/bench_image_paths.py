@@ -0,0 +1,94 @@
+"""
+Benchmark: setting BUSINESSES.IMAGE_PATH for downloaded Street View images.
+
+Builds a scratch SQLite database with the web CRM schema, N businesses and a
+Street View BUSINESS_IMAGES row for each, then times
+    images    - download_streetview.set_image_paths(): one join against BUSINESS_IMAGES
+    legacy    - the old per-file UPDATE ... LIKE '%<first 20 chars>%' (a full
+                scan per file), run on a sample and extrapolated to N
+
+Usage:
+    python bench_image_paths.py                 # 50,000 images, 500-file legacy sample
+    python bench_image_paths.py -n 10000 --legacy-sample 2000
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web_crm'))
+import init_db
+from download_streetview import SOURCE, set_image_paths
+
+CATEGORIES = ['Restaurant', 'Cafe', 'Bar', 'Salon', 'Auto Repair', 'Dentist', 'Church', 'Clothing Store']
+WORDS = ['Tiger', 'Auburn', 'Plains', 'Magnolia', 'Toomer', 'Samford', 'Opelika', 'Eagle', 'Village',
+         'Corner', 'Southern', 'Main', 'Street', 'Grill', 'House', 'Market', 'Studio', 'Depot']
+
+
+def blob_path(i):
+    sha = f"{i:064x}"
+    return os.path.join('images', 'blobs', sha[:2], f'{sha}.jpg')
+
+
+def build_db(path, n):
+    init_db.DB_PATH = path
+    init_db.create_tables(verbose=False)
+    rng = random.Random(42)
+    rows = []
+    for i in range(n):
+        name = f"{' '.join(rng.sample(WORDS, 3))} {i}"
+        rows.append((name, CATEGORIES[i % len(CATEGORIES)], 32.6 + rng.random() / 10, -85.5 + rng.random() / 10))
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO BUSINESSES (NAME, CATEGORY, LATITUDE, LONGITUDE) VALUES (?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO BUSINESS_IMAGES (BUSINESS_ID, SOURCE, SHA256, PATH, BYTES) VALUES (?, ?, ?, ?, ?)",
+                     [(i + 1, SOURCE, f"{i:064x}", blob_path(i), 40000) for i in range(n)])
+    conn.commit()
+    return conn, rows
+
+
+def bench_images(conn):
+    start = time.perf_counter()
+    updated = set_image_paths(conn, sqlite=True)
+    conn.commit()
+    return updated, time.perf_counter() - start
+
+
+def bench_legacy(conn, rows, sample):
+    cur = conn.cursor()
+    updated = 0
+    start = time.perf_counter()
+    for i, (name, _, _, _) in enumerate(rows[:sample]):
+        biz_name = name   # the old file stem (sanitized name) with '_' turned back into ' '
+        cur.execute("UPDATE BUSINESSES SET IMAGE_PATH = ?, UPDATED_DATE = datetime('now') WHERE IMAGE_PATH IS NULL "
+                    "AND REPLACE(REPLACE(NAME, ' ', '_'), '''', '') LIKE ?",
+                    (blob_path(i), f'%{biz_name[:20]}%'))
+        updated += 1 if cur.rowcount > 0 else 0
+    conn.commit()
+    return updated, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the BUSINESS_IMAGES join vs legacy LIKE matching '
+                                                 'for IMAGE_PATH')
+    parser.add_argument('-n', type=int, default=50000, help='Businesses / images (default 50,000)')
+    parser.add_argument('--legacy-sample', type=int, default=500, help='Files to time with the legacy LIKE update')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, rows = build_db(os.path.join(tmp, 'bench.db'), args.n)
+        updated, secs = bench_images(conn)
+        print(f"images join:   {updated:>7} rows updated in {secs:8.2f}s")
+
+        conn.execute("UPDATE BUSINESSES SET IMAGE_PATH = NULL")
+        conn.commit()
+        sample = min(args.legacy_sample, args.n)
+        legacy_updated, legacy_secs = bench_legacy(conn, rows, sample)
+        projected = legacy_secs / sample * args.n
+        print(f"legacy LIKE:   {legacy_updated:>7} of {sample} sampled files in {legacy_secs:8.2f}s "
+              f"-> ~{projected:,.0f}s projected for {args.n:,}")
+        print(f"speedup: ~{projected / secs:,.0f}x")
+        conn.close()
@@ -0,0 +1,248 @@
+"""
+Build the reference data bundles the static site (docs/) loads at startup.
+
+Datasets:
+    stores, neighborhoods, zipcodes   data/static/*.json (hand-curated)
+    competitors                       data/static/competitors.json profiles, with
+                                      rating/review counts from the CRM's COMPETITORS
+                                      table and any competitors only the CRM knows
+    businesses                        data/auburn_businesses.json, only with
+                                      --businesses (app.js doesn't load it)
+
+Each dataset is split into shards by a hash of each record's key, so editing
+one record changes one shard. A shard is written as minified
+{"fields": [...], "rows": [[...]]} JSON named by its content hash
+(docs/data/<dataset>.<n>.<sha256[:12]>.json), plus precompressed .gz and,
+if the brotli package is installed, .br copies for hosts that serve those
+directly. Identical content always gives the identical file name, so the files are
+safe to cache forever. docs/data/manifest.json lists every shard's hash;
+app.js reads it and downloads only shards whose hash it doesn't have.
+Every file the new manifest doesn't reference is deleted; a client that
+fetched the old manifest just misses that update and keeps its copy.
+
+Usage:
+    python build_static_data.py --sqlite    # competitors from web_crm/tiger_crm.db
+    python build_static_data.py             # competitors from SQL Server
+    python build_static_data.py --no-db     # curated files only
+    python build_static_data.py --sqlite --businesses   # also ship the businesses dataset
+"""
+
+import os
+import sys
+import json
+import gzip
+import zlib
+import hashlib
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web_crm'))
+from log_setup import setup_logging
+
+import api_config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+STATIC_SOURCE_DIR = os.path.join(ROOT_DIR, 'data', 'static')
+BUSINESSES_JSON = os.path.join(ROOT_DIR, 'data', 'auburn_businesses.json')
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'docs', 'data')
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'manifest.json')
+MANIFEST_VERSION = 1
+SHARD_ROWS = 100          # target rows per shard; shard counts are powers of two
+CRM_ID_OFFSET = 1000      # competitors only in the CRM get id COMPETITOR_ID + this
+BUSINESS_FIELDS = ['name', 'category', 'full_address', 'city', 'state', 'zip', 'phone', 'website',
+                   'cuisine', 'hours', 'lat', 'lon']
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _name_key(name):
+    return ''.join(ch for ch in (name or '').lower() if ch.isalnum())
+
+
+def crm_competitors(sqlite=False):
+    """COMPETITORS rows in the static app's field names (same mapping as the sync feed)."""
+    import sync
+    spec = sync.TABLES['competitors']
+    if sqlite:
+        from init_db import ensure_schema, get_db
+        ensure_schema()
+        conn = get_db()
+    else:
+        import pyodbc
+        conn = pyodbc.connect(api_config.DB_CONN_STR, timeout=30)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {spec.key}, {', '.join(spec.columns)} FROM {spec.table} ORDER BY {spec.key}")
+        return [dict(zip(['id'] + list(spec.fields), [sync._value(v) for v in row])) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def merge_competitors(profiles, crm_rows):
+    """Curated profiles with live rating/review counts, then CRM-only competitors."""
+    merged = [dict(p) for p in profiles]
+    by_name = {_name_key(p['name']): p for p in merged}
+    extra = []
+    for row in crm_rows:
+        profile = by_name.get(_name_key(row.get('name')))
+        if profile is None:
+            extra.append(dict({k: v for k, v in row.items() if v not in (None, '')},
+                              id=row['id'] + CRM_ID_OFFSET))
+            continue
+        for field in ('googleRating', 'reviewCount'):
+            if row.get(field) is not None:
+                profile[field] = row[field]
+        for field in ('phone', 'website', 'address'):   # fill blanks only; curated text wins
+            if row.get(field) and not profile.get(field):
+                profile[field] = row[field]
+    return merged + extra
+
+
+def businesses():
+    """data/auburn_businesses.json trimmed to the fields the app can show, with stable ids.
+
+    The id hashes name, category and location, so branches of a chain get
+    their own ids.
+    """
+    out = []
+    for biz in _load_json(BUSINESSES_JSON):
+        if not (biz.get('name') or '').strip():
+            continue
+        key = f"{biz['name']}|{biz.get('category', '')}|{biz.get('lat')}|{biz.get('lon')}"
+        out.append(dict({f: biz.get(f) for f in BUSINESS_FIELDS},
+                        id=int(hashlib.sha1(key.encode()).hexdigest()[:12], 16)))
+    return out
+
+
+def build_datasets(db=True, sqlite=False, include_businesses=False):
+    datasets = {name: _load_json(os.path.join(STATIC_SOURCE_DIR, f"{name}.json"))
+                for name in ('stores', 'neighborhoods', 'zipcodes')}
+    profiles = _load_json(os.path.join(STATIC_SOURCE_DIR, 'competitors.json'))
+    datasets['competitors'] = merge_competitors(profiles, crm_competitors(sqlite) if db else [])
+    if include_businesses:
+        datasets['businesses'] = businesses()
+    return datasets
+
+
+def shard(records, shard_rows=SHARD_ROWS):
+    """Split records into a power-of-two number of shards by a hash of their id."""
+    count = 1
+    while count * shard_rows < len(records):
+        count *= 2
+    shards = [[] for _ in range(count)]
+    for rec in records:
+        shards[zlib.crc32(str(rec.get('id')).encode()) % count].append(rec)
+    for part in shards:
+        part.sort(key=lambda r: str(r.get('id')))
+    return shards
+
+
+def encode(records):
+    """Minified {"fields", "rows"} JSON bytes; fields are the union of keys in first-seen order."""
+    fields = []
+    for rec in records:
+        fields.extend(k for k in rec if k not in fields)
+    payload = {'fields': fields, 'rows': [[rec.get(f) for f in fields] for rec in records]}
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _write(path, data):
+    if os.path.exists(path):
+        return
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_shard(name, index, records):
+    """Write one shard (+ .gz/.br) under its content hash. Returns its manifest entry."""
+    body = encode(records)
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    filename = f"{name}.{index}.{digest}.json"
+    path = os.path.join(OUTPUT_DIR, filename)
+    packed = gzip.compress(body, compresslevel=9, mtime=0)   # mtime=0: same bytes every build
+    _write(path, body)
+    _write(path + '.gz', packed)
+    entry = {'file': filename, 'hash': digest, 'rows': len(records), 'bytes': len(body), 'gz': len(packed)}
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        _write(path + '.br', br)
+        entry['br'] = len(br)
+    return entry
+
+
+def _manifest_files(manifest):
+    files = set()
+    for ds in (manifest or {}).get('datasets', {}).values():
+        for s in ds['shards']:
+            files.update({s['file'], s['file'] + '.gz', s['file'] + '.br'})
+    return files
+
+
+def build(datasets, shard_rows=SHARD_ROWS):
+    """Write shards and the manifest. Returns (manifest, files written, files deleted)."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    before = set(os.listdir(OUTPUT_DIR))
+
+    manifest = {'v': MANIFEST_VERSION, 'datasets': {}}
+    for name, records in datasets.items():
+        shards = [write_shard(name, i, part) for i, part in enumerate(shard(records, shard_rows))]
+        manifest['datasets'][name] = {'rows': len(records), 'shards': shards}
+    manifest['hash'] = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+    written = len(set(os.listdir(OUTPUT_DIR)) - before)
+    _write_manifest(manifest)
+    keep = _manifest_files(manifest) | {'manifest.json'}
+    deleted = 0
+    for filename in os.listdir(OUTPUT_DIR):
+        if filename not in keep:
+            os.remove(os.path.join(OUTPUT_DIR, filename))
+            deleted += 1
+    return manifest, written, deleted
+
+
+def _write_manifest(manifest):
+    tmp = MANIFEST_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+        f.write('\n')
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Build content-hashed data shards for the static site')
+    parser.add_argument('--sqlite', action='store_true', help='Read competitors from the web CRM SQLite database')
+    parser.add_argument('--no-db', action='store_true', help='Skip the CRM database (curated files only)')
+    parser.add_argument('--businesses', action='store_true',
+                        help='Also build the businesses dataset (not loaded by app.js)')
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS, help=f'Target rows per shard (default {SHARD_ROWS})')
+    args = parser.parse_args()
+    setup_logging('build_static_data')
+
+    datasets = build_datasets(db=not args.no_db, sqlite=args.sqlite, include_businesses=args.businesses)
+    manifest, written, deleted = build(datasets, args.shard_rows)
+
+    print(f"\nManifest {manifest['hash']}: {os.path.relpath(MANIFEST_PATH, ROOT_DIR)}")
+    for name, ds in manifest['datasets'].items():
+        raw = sum(s['bytes'] for s in ds['shards'])
+        packed = sum(s['gz'] for s in ds['shards'])
+        print(f"  {name:<14} {ds['rows']:>6} rows  {len(ds['shards']):>3} shards  "
+              f"{raw / 1024:>7.1f} KB  {packed / 1024:>6.1f} KB gzip")
+    print(f"  {written} files written, {deleted} stale files deleted"
+          + ('' if brotli else "  (pip install brotli for .br copies)"))
+    logger.info(f"Static data {manifest['hash']}: {written} written, {deleted} deleted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Local stand-in for Overpass, Google Places (New) and Street View Static.
+
+Answers are deterministic (seeded from the request), so repeated runs see
+the same businesses, place ids, panoramas and image bytes, and the
+content-addressed stores dedupe the same way they would against Google.
+Latency and an error rate (429/503) can be injected to exercise the retry
+and rate-limit paths. Point the scripts at it with TIGER_API_BASE:
+
+    python fake_apis.py --port 8799 --latency 80 --error-rate 0.02
+    TIGER_API_BASE=http://127.0.0.1:8799 python enrich_businesses.py --sqlite
+
+Routes:
+    POST /api/interpreter                  Overpass JSON ("elements" per query)
+    POST /v1/places:searchText             one place per textQuery (~85% match)
+    GET  /v1/places/<id>/photos/<n>/media  JPEG-sized bytes
+    GET  /maps/api/streetview/metadata     OK / ZERO_RESULTS by location
+    GET  /maps/api/streetview              JPEG-sized bytes per pano
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8799
+ELEMENTS_PER_QUERY = 400
+AUBURN = (32.6010, -85.4876)
+AMENITIES = ['restaurant', 'fast_food', 'cafe', 'bar', 'bakery', 'dentist', 'bank', 'pharmacy']
+SHOPS = ['clothes', 'hairdresser', 'car_repair', 'convenience', 'florist', 'furniture']
+WORDS = ['Tiger', 'Plains', 'Magnolia', 'Toomer', 'Samford', 'Eagle', 'Village', 'Corner',
+         'Southern', 'Main Street', 'Loveliest', 'War Eagle', 'Orange', 'Blue', 'Gay Street']
+
+
+def _rng(*parts):
+    return random.Random(hashlib.sha256('|'.join(map(str, parts)).encode()).digest())
+
+
+def _center(query):
+    """Center of an Overpass query: around:R,lat,lon or the middle of a (s,w,n,e) bbox."""
+    m = re.search(r'around:\s*[\d.]+\s*,\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)', query)
+    if m:
+        return float(m.group(1)), float(m.group(2)), 0.02
+    m = re.search(r'\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)', query)
+    if m:
+        s, w, n, e = map(float, m.groups())
+        return (s + n) / 2, (w + e) / 2, max(n - s, e - w) / 2
+    return AUBURN[0], AUBURN[1], 0.05
+
+
+def overpass_elements(query, count=ELEMENTS_PER_QUERY):
+    lat, lon, spread = _center(query)
+    rng = _rng('overpass', query)
+    elements = []
+    for i in range(count):
+        kind = rng.random() < 0.6
+        tags = {'name': f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randint(1, 999)}",
+                'addr:street': f"{rng.choice(WORDS)} Ave", 'addr:housenumber': str(rng.randint(1, 2000)),
+                'addr:postcode': '36830'}
+        tags['amenity' if kind else 'shop'] = rng.choice(AMENITIES if kind else SHOPS)
+        if rng.random() < 0.5:
+            tags['phone'] = f"+1 334 {rng.randint(200, 999)} {rng.randint(1000, 9999)}"
+        el_lat = round(lat + rng.uniform(-spread, spread), 7)
+        el_lon = round(lon + rng.uniform(-spread, spread), 7)
+        # ids from position so neighbouring tiles that overlap share elements
+        el_id = int(hashlib.sha1(f"{tags['name']}{el_lat:.4f}{el_lon:.4f}".encode()).hexdigest()[:12], 16)
+        if rng.random() < 0.7:
+            elements.append({'type': 'node', 'id': el_id, 'lat': el_lat, 'lon': el_lon, 'tags': tags})
+        else:
+            elements.append({'type': 'way', 'id': el_id, 'center': {'lat': el_lat, 'lon': el_lon}, 'tags': tags})
+    return elements
+
+
+def image_bytes(*seed, size=12000):
+    rng = _rng('image', *seed)
+    return b'\xff\xd8\xff\xe0' + bytes(rng.getrandbits(8) for _ in range(size)) + b'\xff\xd9'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, so pooled clients reuse connections
+    latency = 0.0
+    error_rate = 0.0
+    elements = ELEMENTS_PER_QUERY
+    counts = {}
+    counts_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt % args)
+
+    def _count(self, route):
+        with self.counts_lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def _send(self, status, body, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject(self):
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if self.error_rate and random.random() < self.error_rate:
+            self._send(random.choice([429, 503]), {'error': {'message': 'injected by fake_apis'}})
+            return True
+        return False
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._body()
+        if self._inject():
+            return
+        if path.endswith('/api/interpreter'):
+            self._count('overpass')
+            form = parse_qs(body.decode('utf-8'))
+            query = (form.get('data') or [''])[0]
+            self._send(200, {'version': 0.6, 'generator': 'fake_apis',
+                             'elements': overpass_elements(query, self.elements)})
+        elif path.endswith('/v1/places:searchText'):
+            self._count('places_search')
+            text = json.loads(body or b'{}').get('textQuery', '')
+            rng = _rng('place', text)
+            if rng.random() < 0.15:
+                self._send(200, {})
+                return
+            place_id = 'ChIJ' + hashlib.sha1(text.encode()).hexdigest()[:23]
+            self._send(200, {'places': [{
+                'id': place_id,
+                'displayName': {'text': text.rsplit(' Auburn AL', 1)[0], 'languageCode': 'en'},
+                'formattedAddress': f"{rng.randint(1, 2000)} {rng.choice(WORDS)} Ave, Auburn, AL 36830, USA",
+                'rating': round(rng.uniform(3.0, 5.0), 1),
+                'userRatingCount': rng.randint(1, 2500),
+                'googleMapsUri': f"https://maps.google.com/?cid={rng.getrandbits(48)}",
+                'location': {'latitude': AUBURN[0] + rng.uniform(-0.05, 0.05),
+                             'longitude': AUBURN[1] + rng.uniform(-0.05, 0.05)},
+                # a few stock photos shared across places, like chain logos
+                'photos': [{'name': f"places/{place_id}/photos/{rng.randint(0, 40)}"}] if rng.random() < 0.8 else [],
+            }]})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if self._inject():
+            return
+        if parts.path.endswith('/media'):
+            self._count('places_photo')
+            self._send(200, image_bytes(parts.path.rsplit('/', 2)[-2]), 'image/jpeg')
+        elif parts.path.endswith('/maps/api/streetview/metadata'):
+            self._count('streetview_meta')
+            location = params.get('location', '')
+            rng = _rng('pano', location)
+            if rng.random() < 0.25:
+                self._send(200, {'status': 'ZERO_RESULTS'})
+            else:
+                self._send(200, {'status': 'OK', 'pano_id': 'pano_' + hashlib.sha1(location.encode()).hexdigest()[:16],
+                                 'date': f"20{rng.randint(12, 24)}-{rng.randint(1, 12):02d}", 'copyright': '© Google'})
+        elif parts.path.endswith('/maps/api/streetview'):
+            self._count('streetview')
+            self._send(200, image_bytes(params.get('pano') or params.get('location', '')), 'image/jpeg')
+        else:
+            self._send(404, {'error': 'not found'})
+
+
+def serve(port=DEFAULT_PORT, latency_ms=0, error_rate=0.0, elements=ELEMENTS_PER_QUERY, host='127.0.0.1'):
+    """Start the server on a background thread. Returns it; call .shutdown() to stop."""
+    Handler.latency = latency_ms / 1000.0
+    Handler.error_rate = error_rate
+    Handler.elements = elements
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Fake Overpass / Places / Street View server for offline runs')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0, help='Mean added latency per request (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered 429/503')
+    parser.add_argument('--elements', type=int, default=ELEMENTS_PER_QUERY, help='Overpass elements per query')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    server = serve(args.port, args.latency, args.error_rate, args.elements)
+    print(f"Fake APIs on http://127.0.0.1:{args.port}  (TIGER_API_BASE=http://127.0.0.1:{args.port})")
+    try:
+        while True:
+            time.sleep(10)
+            if Handler.counts:
+                logger.info(f"Requests so far: {dict(Handler.counts)}")
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served: {dict(Handler.counts)}")
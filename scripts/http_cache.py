@@ -0,0 +1,400 @@
+"""
+On-disk HTTP response cache shared by the pull/enrich/download scripts.
+
+Responses are stored in a SQLite file keyed by a SHA-256 of the normalized
+request: method, URL, query params and body with keys sorted, whitespace in
+Overpass queries collapsed, the Google field-mask header included, and the
+API key dropped (so rotating the key keeps the cache). Each endpoint has its
+own TTL. When the file grows past MAX_BYTES the least recently used entries
+are evicted. Only successful, non-error responses are stored.
+
+Google Maps Platform content is not stored. The terms allow only place IDs
+to be kept indefinitely; Places results, photos and Street View imagery may
+not be cached or pre-fetched. Those endpoints have a TTL of None and go
+straight to the network; place IDs are kept in the CRM tables instead.
+--purge-expired drops any Google responses an older version stored.
+
+    import http_cache
+    http_cache.configure(refresh=args.refresh)   # --refresh: refetch, then overwrite
+    resp = http_cache.post(PLACES_URL, headers=headers, json=body, timeout=10)
+
+A hit-ratio summary is logged and printed when the script exits.
+
+    python http_cache.py --stats | --purge-expired | --clear
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.environ.get('HTTP_CACHE_PATH',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache.db'))
+MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_MB', '500')) * 1024 * 1024
+MAX_ENTRY_BYTES = 64 * 1024 * 1024  # streamed bodies larger than this aren't cached
+STREAM_CHUNK = 64 * 1024
+DAY = 86400
+
+# (endpoint name, URL pattern, TTL seconds); first match wins. None = never cached
+ENDPOINTS = [
+    ('overpass', re.compile(r'overpass|/api/interpreter'), 7 * DAY),
+    ('places_search', re.compile(r'/v1/places:search'), None),
+    ('places_photo', re.compile(r'/v1/places/.+/media'), None),
+    ('streetview_meta', re.compile(r'/maps/api/streetview/metadata'), None),
+    ('streetview_image', re.compile(r'/maps/api/streetview'), None),
+    ('google', re.compile(r'googleapis\.com'), None),
+]
+DEFAULT_TTL = DAY
+
+SECRET_PARAMS = {'key'}
+KEY_HEADERS = {'x-goog-fieldmask'}
+# Google returns these with HTTP 200; they must not be cached
+ERROR_STATUSES = {'OVER_QUERY_LIMIT', 'REQUEST_DENIED', 'UNKNOWN_ERROR', 'INVALID_REQUEST'}
+
+
+def endpoint_for(url):
+    for name, pattern, ttl in ENDPOINTS:
+        if pattern.search(url):
+            return name, ttl
+    return 'other', DEFAULT_TTL
+
+
+def _normalize_body(data=None, json_body=None):
+    if json_body is not None:
+        return json.dumps(json_body, sort_keys=True, separators=(',', ':'))
+    if isinstance(data, dict):
+        return urlencode(sorted((k, ' '.join(str(v).split())) for k, v in data.items()))
+    if isinstance(data, (bytes, str)):
+        return data.decode('utf-8', 'replace') if isinstance(data, bytes) else data
+    return ''
+
+
+def request_key(method, url, params=None, data=None, json_body=None, headers=None):
+    """Content address of a request (API keys excluded)."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query) + list((params or {}).items())
+    query = sorted((k, str(v)) for k, v in query if k not in SECRET_PARAMS)
+    kept_headers = sorted((k.lower(), v) for k, v in (headers or {}).items() if k.lower() in KEY_HEADERS)
+    normalized = '\n'.join([
+        method.upper(),
+        f"{parts.scheme}://{parts.netloc}{parts.path}",
+        urlencode(query),
+        json.dumps(kept_headers),
+        _normalize_body(data, json_body),
+    ])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    """The parts of requests.Response the scripts use, rebuilt from the cache."""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+
+def _cacheable(endpoint, resp):
+    if resp.status_code != 200 or not resp.content:
+        return False
+    if 'json' in resp.headers.get('Content-Type', ''):
+        try:
+            body = resp.json()
+        except ValueError:
+            return False
+        if isinstance(body, dict):
+            if body.get('status') in ERROR_STATUSES or 'error' in body:
+                return False
+            if endpoint == 'overpass' and 'runtime error' in body.get('remark', '').lower():
+                return False
+    return True
+
+
+class HttpCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, refresh=False, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.enabled = enabled
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS RESPONSES (
+                    KEY TEXT PRIMARY KEY,
+                    ENDPOINT TEXT NOT NULL,
+                    URL TEXT,
+                    STATUS INTEGER NOT NULL,
+                    HEADERS TEXT,
+                    BODY BLOB,
+                    SIZE INTEGER NOT NULL,
+                    CREATED REAL NOT NULL,
+                    LAST_ACCESS REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS IX_RESPONSES_LAST_ACCESS ON RESPONSES(LAST_ACCESS);
+            """)
+            self._size = self._conn.execute("SELECT COALESCE(SUM(SIZE), 0) FROM RESPONSES").fetchone()[0]
+        return self._conn
+
+    def _count(self, endpoint, outcome):
+        counts = self.stats.setdefault(endpoint, {'hit': 0, 'miss': 0, 'expired': 0, 'stored': 0})
+        counts[outcome] += 1
+
+    def _lookup(self, key, ttl):
+        """Cached response for key, or None with the reason ('miss'/'expired')."""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT URL, STATUS, HEADERS, BODY, CREATED FROM RESPONSES WHERE KEY = ?",
+                             (key,)).fetchone()
+            if row is None:
+                return None, 'miss'
+            if time.time() - row[4] > ttl:
+                return None, 'expired'
+            db.execute("UPDATE RESPONSES SET LAST_ACCESS = ? WHERE KEY = ?", (time.time(), key))
+        return CachedResponse(row[0], row[1], json.loads(row[2] or '{}'), row[3]), 'hit'
+
+    def _store(self, key, endpoint, resp, body=None):
+        body = resp.content if body is None else body
+        # Drop the API key from the stored URL
+        parts = urlsplit(resp.url)
+        url = parts._replace(query=urlencode([(k, v) for k, v in parse_qsl(parts.query)
+                                              if k not in SECRET_PARAMS])).geturl()
+        headers = {'Content-Type': resp.headers.get('Content-Type', '')}
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            old = db.execute("SELECT SIZE FROM RESPONSES WHERE KEY = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO RESPONSES VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (key, endpoint, url, resp.status_code, json.dumps(headers), body, len(body), now, now))
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(db)
+
+    def _evict(self, db):
+        """Drop least recently used entries until 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in db.execute("SELECT KEY, SIZE FROM RESPONSES ORDER BY LAST_ACCESS").fetchall():
+            if self._size <= target:
+                break
+            db.execute("DELETE FROM RESPONSES WHERE KEY = ?", (key,))
+            self._size -= size
+            evicted += 1
+        logger.info(f"HTTP cache over {self.max_bytes // (1024 * 1024)} MB; evicted {evicted} entries")
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, session=None,
+                limiter=None, **kwargs):
+        """requests.request() that answers from / fills the cache.
+
+        `limiter` (anything with .acquire()) is charged only when the request
+        actually goes out, so cache hits don't spend rate limit or quota.
+        """
+        endpoint, ttl = endpoint_for(url)
+        enabled = self.enabled and ttl is not None
+        key = request_key(method, url, params, data, json, headers)
+        if enabled and not self.refresh:
+            cached, outcome = self._lookup(key, ttl)
+            self._count(endpoint, outcome)
+            if cached is not None:
+                return cached
+        elif enabled:
+            self._count(endpoint, 'miss')
+
+        if limiter:
+            limiter.acquire()
+        resp = (session or requests).request(method, url, params=params, data=data, json=json,
+                                             headers=headers, **kwargs)
+        resp.from_cache = False
+        if enabled and _cacheable(endpoint, resp):
+            self._store(key, endpoint, resp)
+            self._count(endpoint, 'stored')
+        return resp
+
+    @contextmanager
+    def stream(self, method, url, params=None, data=None, json=None, headers=None, session=None,
+               limiter=None, chunk_size=STREAM_CHUNK, **kwargs):
+        """Yield the response body as an iterator of byte chunks.
+
+        Misses are streamed from the network and spooled to a temp file as
+        they are read; the body is cached only if the with-block finishes
+        without an exception and it is under MAX_ENTRY_BYTES.
+        """
+        endpoint, ttl = endpoint_for(url)
+        enabled = self.enabled and ttl is not None
+        key = request_key(method, url, params, data, json, headers)
+        if enabled and not self.refresh:
+            cached, outcome = self._lookup(key, ttl)
+            self._count(endpoint, outcome)
+            if cached is not None:
+                body = cached.content
+                yield (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+                return
+        elif enabled:
+            self._count(endpoint, 'miss')
+
+        if limiter:
+            limiter.acquire()
+        resp = (session or requests).request(method, url, params=params, data=data, json=json,
+                                             headers=headers, stream=True, **kwargs)
+        with resp, tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            resp.raise_for_status()
+            state = {'size': 0, 'done': False}
+
+            def chunks():
+                for chunk in resp.iter_content(chunk_size):
+                    state['size'] += len(chunk)
+                    if state['size'] <= MAX_ENTRY_BYTES:
+                        spool.write(chunk)
+                    yield chunk
+                state['done'] = True
+
+            yield chunks()
+            if enabled and state['done'] and state['size'] <= MAX_ENTRY_BYTES and resp.status_code == 200:
+                spool.seek(0)
+                self._store(key, endpoint, resp, body=spool.read())
+                self._count(endpoint, 'stored')
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def report(self):
+        """One line per endpoint: hits/lookups and hit ratio."""
+        lines = []
+        for endpoint, c in sorted(self.stats.items()):
+            lookups = c['hit'] + c['miss'] + c['expired']
+            ratio = c['hit'] / lookups * 100 if lookups else 0
+            lines.append(f"{endpoint:<17} {c['hit']:>6}/{lookups:<6} hits ({ratio:5.1f}%)  "
+                         f"expired={c['expired']} stored={c['stored']}")
+        return lines
+
+    def purge_expired(self):
+        with self._lock:
+            db = self._db()
+            removed = 0
+            now = time.time()
+            for name, _, ttl in ENDPOINTS + [('other', None, DEFAULT_TTL)]:
+                # Uncacheable endpoints: drop anything an older version stored
+                cutoff = now if ttl is None else now - ttl
+                removed += db.execute("DELETE FROM RESPONSES WHERE ENDPOINT = ? AND CREATED < ?",
+                                      (name, cutoff)).rowcount
+            self._size = db.execute("SELECT COALESCE(SUM(SIZE), 0) FROM RESPONSES").fetchone()[0]
+            db.execute("VACUUM")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM RESPONSES")
+            db.execute("VACUUM")
+            self._size = 0
+
+
+_cache = HttpCache()
+
+
+def configure(**options):
+    """Replace the shared cache's settings (refresh, enabled, path, max_bytes)."""
+    global _cache
+    _cache = HttpCache(**{**{'path': _cache.path, 'max_bytes': _cache.max_bytes,
+                             'refresh': _cache.refresh, 'enabled': _cache.enabled}, **options})
+    return _cache
+
+
+def cache():
+    return _cache
+
+
+def request(method, url, **kwargs):
+    return _cache.request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return _cache.get(url, **kwargs)
+
+
+def stream(method, url, **kwargs):
+    return _cache.stream(method, url, **kwargs)
+
+
+def post(url, **kwargs):
+    return _cache.post(url, **kwargs)
+
+
+@atexit.register
+def _report_at_exit():
+    lines = _cache.report()
+    if not lines:
+        return
+    print(f"\nHTTP cache{' (refresh)' if _cache.refresh else ''}: {_cache.path}")
+    for line in lines:
+        print(f"  {line}")
+        logger.info(f"HTTP cache {line}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Inspect or trim the HTTP response cache')
+    parser.add_argument('--stats', action='store_true', help='Entries and bytes per endpoint')
+    parser.add_argument('--purge-expired', action='store_true', help='Delete entries past their TTL')
+    parser.add_argument('--clear', action='store_true', help='Delete everything')
+    args = parser.parse_args()
+
+    if args.clear:
+        _cache.clear()
+        print(f"Cleared {_cache.path}")
+    elif args.purge_expired:
+        print(f"Removed {_cache.purge_expired()} expired entries")
+    elif args.stats:
+        rows = _cache._db().execute("""
+            SELECT ENDPOINT, COUNT(*), SUM(SIZE), MIN(CREATED) FROM RESPONSES GROUP BY ENDPOINT ORDER BY ENDPOINT
+        """).fetchall()
+        for endpoint, n, size, oldest in rows:
+            age = (time.time() - oldest) / DAY
+            print(f"  {endpoint:<17} {n:>7} entries {size / 1024 / 1024:8.1f} MB  oldest {age:.1f} days")
+        print(f"  total {_cache._size / 1024 / 1024:.1f} MB of {_cache.max_bytes / 1024 / 1024:.0f} MB")
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,90 @@
+"""
+Shared HTTP client for the scripts.
+
+One pooled requests.Session per host (keep-alive, POOL_SIZE connections, so a
+thread pool reuses TLS connections instead of opening one per call), default
+timeouts per service from api_config, 429/5xx retry with jittered backoff via
+rate_limit.call_with_retries, and the on-disk response cache (http_cache)
+in front of it all.
+
+    import http_client
+    resp = http_client.post(api_config.PLACES_SEARCH_URL, service='places', limiter=bucket,
+                            headers=headers, json=body)
+    with http_client.stream('POST', api_config.OVERPASS_URL, service='overpass_stream',
+                            data={'data': query}) as chunks:
+        ...
+"""
+
+import atexit
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import api_config
+import http_cache
+from rate_limit import call_with_retries, MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def session_for(url):
+    """The shared Session for url's scheme + host, created on first use."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            # Connection-level retries only; HTTP status retries go through
+            # call_with_retries so each attempt takes a rate-limit token
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=api_config.POOL_SIZE,
+                                  max_retries=Retry(total=3, connect=3, read=0, status=0,
+                                                    backoff_factor=0.5, raise_on_status=False))
+            session.mount(origin, adapter)
+            _sessions[origin] = session
+    return session
+
+
+@atexit.register
+def close_all():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def request(method, url, service='default', limiter=None, retries=MAX_RETRIES, cache=True, **kwargs):
+    """HTTP request through the pooled session, the response cache and the retry policy.
+
+    `service` picks the default timeout (api_config.TIMEOUTS); `limiter` is an
+    optional rate_limit.TokenBucket or quota.QuotaLimiter charged once per
+    attempt that goes to the network (cache hits are free).
+    """
+    kwargs.setdefault('timeout', api_config.timeout(service))
+    session = session_for(url)
+    if cache:
+        send = lambda: http_cache.request(method, url, session=session, limiter=limiter, **kwargs)
+        return call_with_retries(send, retries=retries, label=f"{method} {service}")
+    send = lambda: session.request(method, url, **kwargs)
+    return call_with_retries(send, limiter=limiter, retries=retries, label=f"{method} {service}")
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def stream(method, url, service='default', limiter=None, **kwargs):
+    """http_cache.stream() over the pooled session. One attempt; raises on HTTP errors."""
+    kwargs.setdefault('timeout', api_config.timeout(service))
+    return http_cache.stream(method, url, session=session_for(url), limiter=limiter, **kwargs)
@@ -0,0 +1,233 @@
+"""
+Content-addressed image store for business photos.
+
+Downloads are streamed to disk in chunks while being hashed and kept as
+images/blobs/<first 2 hex chars>/<sha256>.jpg, so a file name never depends
+on a business name (no collisions) and identical images are stored once.
+BUSINESS_IMAGES is the manifest mapping each business and image source
+('google_places') to its blob. The SQLite and SQL Server manifests share
+BLOB_DIR, so --prune reads both and deletes only blobs neither references.
+
+SQL Server DDL (created on first use):
+    CREATE TABLE BUSINESS_IMAGES (BUSINESS_ID INT NOT NULL, SOURCE VARCHAR(20) NOT NULL,
+        SHA256 CHAR(64) NOT NULL, PATH NVARCHAR(400) NOT NULL, BYTES INT NOT NULL,
+        SOURCE_REF NVARCHAR(400), CREATED_DATE DATETIME DEFAULT GETDATE(),
+        PRIMARY KEY (BUSINESS_ID, SOURCE));
+
+Usage:
+    python image_store.py --stats [--sqlite]   # blobs, bytes, manifest rows, dedupe savings
+    python image_store.py --prune              # delete blobs neither manifest points at
+    python image_store.py --prune --sqlite --single-backend   # only SQLite ever writes here
+"""
+
+import os
+import time
+import hashlib
+import logging
+import tempfile
+
+import requests
+
+import api_config
+import http_client
+from rate_limit import RETRY_STATUSES, MAX_RETRIES, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+BLOB_DIR = os.path.join(ROOT_DIR, 'images', 'blobs')
+CHUNK_SIZE = 64 * 1024
+MIN_BYTES = 5000          # smaller responses are Google's "no image" placeholders
+
+SQLSERVER_MANIFEST_DDL = """
+    IF OBJECT_ID('BUSINESS_IMAGES') IS NULL
+        CREATE TABLE BUSINESS_IMAGES (
+            BUSINESS_ID INT NOT NULL, SOURCE VARCHAR(20) NOT NULL, SHA256 CHAR(64) NOT NULL,
+            PATH NVARCHAR(400) NOT NULL, BYTES INT NOT NULL, SOURCE_REF NVARCHAR(400),
+            CREATED_DATE DATETIME DEFAULT GETDATE(), PRIMARY KEY (BUSINESS_ID, SOURCE)
+        )
+"""
+
+
+class Blob:
+    """A stored image: content hash, absolute path, size and whether this call wrote it."""
+
+    __slots__ = ('sha256', 'path', 'size', 'created')
+
+    def __init__(self, sha256, path, size, created):
+        self.sha256, self.path, self.size, self.created = sha256, path, size, created
+
+    @property
+    def relpath(self):
+        """Path relative to the repo root, as stored in BUSINESSES.IMAGE_PATH."""
+        return os.path.relpath(self.path, ROOT_DIR)
+
+
+def blob_path(sha256, ext='.jpg'):
+    return os.path.join(BLOB_DIR, sha256[:2], sha256 + ext)
+
+
+def save_chunks(chunks, ext='.jpg', min_bytes=MIN_BYTES):
+    """Stream byte chunks into the store. Returns a Blob, or None if under min_bytes."""
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=BLOB_DIR, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        if size < min_bytes:
+            return None
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256, ext)
+        if os.path.exists(path):
+            return Blob(sha256, path, size, False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp, path)  # atomic; a concurrent writer of the same bytes is harmless
+        tmp = None
+        return Blob(sha256, path, size, True)
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def download(url, params=None, headers=None, limiter=None, session=None, timeout=30,
+             retries=MAX_RETRIES, ext='.jpg', min_bytes=MIN_BYTES):
+    """Stream one image from url into the store, retrying 429/5xx.
+
+    Returns a Blob, or None if the server has no image (non-200 or a placeholder).
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            resp = (session or http_client.session_for(url)).get(url, params=params, headers=headers,
+                                                                 timeout=timeout, stream=True)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"Image download: {e}; retry {attempt + 1}/{retries}")
+            time.sleep(backoff_delay(attempt))
+            continue
+        with resp:
+            if resp.status_code in RETRY_STATUSES and attempt < retries:
+                logger.warning(f"Image download: HTTP {resp.status_code}; retry {attempt + 1}/{retries}")
+                time.sleep(backoff_delay(attempt))
+                continue
+            if resp.status_code != 200:
+                logger.warning(f"Image download failed: HTTP {resp.status_code}")
+                return None
+            return save_chunks(resp.iter_content(CHUNK_SIZE), ext=ext, min_bytes=min_bytes)
+
+
+def ensure_manifest(conn, sqlite=False):
+    """Create BUSINESS_IMAGES on SQL Server (SQLite gets it from init_db)."""
+    if not sqlite:
+        conn.cursor().execute(SQLSERVER_MANIFEST_DDL)
+        conn.commit()
+
+
+def businesses_with_images(cursor, source):
+    cursor.execute("SELECT BUSINESS_ID FROM BUSINESS_IMAGES WHERE SOURCE = ?", (source,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def record(cursor, source, entries):
+    """Upsert manifest rows for [(business_id, Blob, source_ref)]. The caller commits."""
+    if not entries:
+        return
+    cursor.executemany("DELETE FROM BUSINESS_IMAGES WHERE BUSINESS_ID = ? AND SOURCE = ?",
+                       [(biz_id, source) for biz_id, _, _ in entries])
+    cursor.executemany("""
+        INSERT INTO BUSINESS_IMAGES (BUSINESS_ID, SOURCE, SHA256, PATH, BYTES, SOURCE_REF)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(biz_id, source, blob.sha256, blob.relpath, blob.size, ref) for biz_id, blob, ref in entries])
+
+
+def _blob_files():
+    if not os.path.isdir(BLOB_DIR):
+        return
+    for dirpath, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            if not name.endswith('.part'):
+                yield os.path.join(dirpath, name)
+
+
+def stats(cursor):
+    files = list(_blob_files())
+    disk = sum(os.path.getsize(f) for f in files)
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT SHA256), COALESCE(SUM(BYTES), 0) FROM BUSINESS_IMAGES")
+    rows, distinct, referenced = cursor.fetchone()
+    return {'blobs': len(files), 'disk_bytes': disk, 'manifest_rows': rows,
+            'distinct_blobs': distinct, 'saved_bytes': referenced - disk if referenced > disk else 0}
+
+
+def prune(cursors):
+    """Delete blob files that no manifest row references. Returns the count removed.
+
+    Pass a cursor for every database whose BUSINESS_IMAGES points into BLOB_DIR.
+    """
+    keep = set()
+    for cursor in cursors:
+        cursor.execute("SELECT DISTINCT SHA256 FROM BUSINESS_IMAGES")
+        keep.update(row[0] for row in cursor.fetchall())
+    removed = 0
+    for path in _blob_files():
+        if os.path.splitext(os.path.basename(path))[0] not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def connect(sqlite=False):
+    """A connection to one backend with BUSINESS_IMAGES in place."""
+    if sqlite:
+        from init_db import ensure_schema, get_db
+        ensure_schema()
+        return get_db()
+    import pyodbc
+    conn = pyodbc.connect(api_config.DB_CONN_STR, timeout=30)
+    ensure_manifest(conn)
+    return conn
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'web_crm'))
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='Inspect or prune the content-addressed image store')
+    parser.add_argument('--stats', action='store_true', help='Blob count, disk use and dedupe savings')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete blobs that neither the SQLite nor the SQL Server manifest references')
+    parser.add_argument('--sqlite', action='store_true', help='Use the web CRM SQLite database')
+    parser.add_argument('--single-backend', action='store_true',
+                        help='Prune against only the --sqlite/SQL Server manifest; use only when the other '
+                             'database never writes to this image store')
+    args = parser.parse_args()
+    setup_logging('image_store')
+
+    conns = []
+    try:
+        if args.prune:
+            backends = [args.sqlite] if args.single_backend else [True, False]
+            try:
+                for sqlite in backends:
+                    conns.append(connect(sqlite))
+            except Exception as e:
+                sys.exit(f"Refusing to prune: could not read both manifests ({e}). Pass --single-backend "
+                         f"if only one database ever writes to {BLOB_DIR}")
+            print(f"Removed {prune([c.cursor() for c in conns])} unreferenced blobs")
+        if args.stats or not args.prune:
+            conns.append(connect(args.sqlite))
+            s = stats(conns[-1].cursor())
+            print(f"Blobs: {s['blobs']} ({s['disk_bytes'] / 1e6:.1f} MB on disk)")
+            print(f"Manifest rows: {s['manifest_rows']} -> {s['distinct_blobs']} distinct images")
+            print(f"Saved by dedupe: {s['saved_bytes'] / 1e6:.1f} MB")
+    finally:
+        for conn in conns:
+            conn.close()
@@ -1,109 +1,192 @@
 """
 Load Auburn businesses from JSON into TIGER_MARKETING database
+
+Rows are staged into a temp table in bulk (pyodbc fast_executemany on SQL
+Server, executemany on SQLite), then inserted with one set-based
+INSERT ... SELECT that drops duplicates within the files (by NAME + CATEGORY)
+and rows already in BUSINESSES. Several JSON files (e.g. one per city) can be
+loaded in one run.
+
+Usage:
+    python load_businesses.py                          # newest OpenClaw pull -> SQL Server
+    python load_businesses.py auburn.json opelika.json
+    python load_businesses.py --sqlite data/auburn_businesses.json   # web_crm/tiger_crm.db
 """
 import json
 import os
 import sys
-import pyodbc
+import time
 import logging
-from datetime import datetime
-
-LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, f'load_businesses_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
 
-DB_CONN_STR = 'DRIVER={SQL Server};SERVER=localhost;DATABASE=TIGER_MARKETING;Trusted_Connection=yes;'
+import api_config
 
-def load_businesses(json_file):
-    """Load businesses from JSON into TIGER_MARKETING.BUSINESSES"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        businesses = json.load(f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web_crm'))
+from log_setup import setup_logging
+from density import refresh_density
 
-    logger.info(f"Loaded {len(businesses)} businesses from {json_file}")
+setup_logging('load_businesses')
+logger = logging.getLogger(__name__)
 
-    conn = pyodbc.connect(DB_CONN_STR, timeout=30)
-    cursor = conn.cursor()
+DB_CONN_STR = api_config.DB_CONN_STR
+STAGE_CHUNK = 10000  # rows per executemany batch
 
-    # Check existing count
-    cursor.execute("SELECT COUNT(*) FROM BUSINESSES")
-    existing = cursor.fetchone()[0]
-    logger.info(f"Existing rows in BUSINESSES: {existing}")
+STAGE_COLUMNS = ['ROW_ID', 'NAME', 'CATEGORY', 'ADDRESS', 'CITY', 'STATE', 'ZIP',
+                 'LATITUDE', 'LONGITUDE', 'PHONE', 'WEBSITE']
+
+SQLSERVER_STAGE_DDL = """
+    CREATE TABLE #STAGE_BUSINESSES (
+        ROW_ID INT NOT NULL, NAME NVARCHAR(255) NOT NULL, CATEGORY NVARCHAR(100),
+        ADDRESS NVARCHAR(400), CITY NVARCHAR(100), STATE NVARCHAR(20), ZIP NVARCHAR(20),
+        LATITUDE FLOAT, LONGITUDE FLOAT, PHONE NVARCHAR(50), WEBSITE NVARCHAR(400)
+    )
+"""
+SQLITE_STAGE_DDL = """
+    CREATE TEMP TABLE STAGE_BUSINESSES (
+        ROW_ID INTEGER NOT NULL, NAME TEXT NOT NULL, CATEGORY TEXT, ADDRESS TEXT, CITY TEXT,
+        STATE TEXT, ZIP TEXT, LATITUDE REAL, LONGITUDE REAL, PHONE TEXT, WEBSITE TEXT
+    )
+"""
+# Lets NOT EXISTS seek instead of scanning BUSINESSES once per staged row
+SQLSERVER_DEDUPE_INDEX = """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_BUSINESSES_NAME_CATEGORY'
+                   AND object_id = OBJECT_ID('BUSINESSES'))
+        CREATE INDEX IX_BUSINESSES_NAME_CATEGORY ON BUSINESSES(NAME, CATEGORY)
+"""
 
-    inserted = 0
-    skipped = 0
 
+def business_rows(businesses, start_id=0):
+    """Map pull_businesses.py JSON records to staging tuples (skips nameless ones)."""
+    rows = []
     for biz in businesses:
-        name = biz.get('name', '').strip()
+        name = (biz.get('name') or '').strip()
         if not name:
             continue
+        lat = biz.get('lat')
+        lon = biz.get('lon')
+        rows.append((
+            start_id + len(rows),
+            name,
+            biz.get('category', ''),
+            biz.get('full_address', ''),
+            biz.get('city') or 'Auburn',
+            biz.get('state') or 'AL',
+            biz.get('zip', ''),
+            None if lat in ('', None) else float(lat),
+            None if lon in ('', None) else float(lon),
+            biz.get('phone', ''),
+            biz.get('website', ''),
+        ))
+    return rows
+
+
+def connect(sqlite=False):
+    if sqlite:
+        from init_db import ensure_schema, get_db
+        ensure_schema()
+        return get_db()
+    import pyodbc
+    return pyodbc.connect(DB_CONN_STR, timeout=30)
+
+
+def stage_and_merge(conn, rows, sqlite=False):
+    """Bulk-stage rows and insert the new ones. Returns rows inserted."""
+    stage = 'STAGE_BUSINESSES' if sqlite else '#STAGE_BUSINESSES'
+    now = "datetime('now')" if sqlite else "GETDATE()"
+    cursor = conn.cursor()
+    cursor.execute(SQLITE_STAGE_DDL if sqlite else SQLSERVER_STAGE_DDL)
+    if not sqlite:
+        cursor.fast_executemany = True
+        try:
+            cursor.execute(SQLSERVER_DEDUPE_INDEX)
+        except Exception as e:
+            logger.warning(f"Could not create IX_BUSINESSES_NAME_CATEGORY: {e}")
+
+    insert_stage = (f"INSERT INTO {stage} ({', '.join(STAGE_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(STAGE_COLUMNS))})")
+    for i in range(0, len(rows), STAGE_CHUNK):
+        cursor.executemany(insert_stage, rows[i:i + STAGE_CHUNK])
+
+    # First row per NAME + CATEGORY across all files, minus what's already loaded
+    cursor.execute(f"""
+        INSERT INTO BUSINESSES (NAME, CATEGORY, ADDRESS, CITY, STATE, ZIP,
+                                LATITUDE, LONGITUDE, PHONE, WEBSITE, SOURCE, CREATED_DATE)
+        SELECT s.NAME, s.CATEGORY, s.ADDRESS, s.CITY, s.STATE, s.ZIP,
+               s.LATITUDE, s.LONGITUDE, s.PHONE, s.WEBSITE, 'OpenStreetMap', {now}
+        FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY NAME, CATEGORY ORDER BY ROW_ID) AS RN
+              FROM {stage}) s
+        WHERE s.RN = 1
+          AND NOT EXISTS (SELECT 1 FROM BUSINESSES b
+                          WHERE b.NAME = s.NAME AND b.CATEGORY = s.CATEGORY)
+    """)
+    inserted = max(cursor.rowcount, 0)
+    cursor.execute(f"DROP TABLE {stage}")
+    return inserted
 
-        # Check for duplicate by name + category
-        cursor.execute("SELECT COUNT(*) FROM BUSINESSES WHERE NAME = ? AND CATEGORY = ?",
-                       name, biz.get('category', ''))
-        if cursor.fetchone()[0] > 0:
-            skipped += 1
-            continue
 
-        lat = biz.get('lat', None)
-        lon = biz.get('lon', None)
+def load_businesses(json_files, sqlite=False):
+    """Load one or more business JSON files into BUSINESSES"""
+    if isinstance(json_files, str):
+        json_files = [json_files]
 
-        # Convert empty strings to None
-        if lat == '':
-            lat = None
-        if lon == '':
-            lon = None
+    rows = []
+    for json_file in json_files:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            businesses = json.load(f)
+        logger.info(f"Loaded {len(businesses)} businesses from {json_file}")
+        rows.extend(business_rows(businesses, start_id=len(rows)))
 
-        try:
-            cursor.execute("""
-                INSERT INTO BUSINESSES (NAME, CATEGORY, ADDRESS, CITY, STATE, ZIP,
-                                       LATITUDE, LONGITUDE, PHONE, WEBSITE, SOURCE, CREATED_DATE)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'OpenStreetMap', GETDATE())
-            """,
-                name,
-                biz.get('category', ''),
-                biz.get('full_address', ''),
-                biz.get('city', 'Auburn'),
-                biz.get('state', 'AL'),
-                biz.get('zip', ''),
-                lat,
-                lon,
-                biz.get('phone', ''),
-                biz.get('website', '')
-            )
-            inserted += 1
-        except Exception as e:
-            logger.error(f"Failed to insert {name}: {e}")
+    start = time.perf_counter()
+    conn = connect(sqlite)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COUNT(*) FROM BUSINESSES")
+    existing = cursor.fetchone()[0]
+    logger.info(f"Existing rows in BUSINESSES: {existing}")
 
-    conn.commit()
+    try:
+        inserted = stage_and_merge(conn, rows, sqlite=sqlite)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    skipped = len(rows) - inserted
+
+    # Fold the new rows into the heatmap grid (GEO_DENSITY)
+    try:
+        refresh_density(conn, sqlite=sqlite, sources=['BUSINESSES'])
+    except Exception as e:
+        logger.warning(f"Density refresh skipped: {e}")
     conn.close()
 
-    logger.info(f"Done! Inserted: {inserted}, Skipped (duplicates): {skipped}")
-    print(f"\nLoaded into TIGER_MARKETING.BUSINESSES:")
+    elapsed = time.perf_counter() - start
+    logger.info(f"Done! Inserted: {inserted}, Skipped (duplicates): {skipped} in {elapsed:.1f}s")
+    print(f"\nLoaded into {'SQLite' if sqlite else 'TIGER_MARKETING'}.BUSINESSES:")
+    print(f"  Staged:   {len(rows)}")
     print(f"  Inserted: {inserted}")
     print(f"  Skipped:  {skipped}")
     print(f"  Total in DB: {inserted + existing}")
+    print(f"  Time: {elapsed:.1f}s")
 
     return inserted
 
 
 if __name__ == '__main__':
-    # Find the JSON file
-    json_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'OpenClaw', 'auburn_businesses')
-    json_files = [f for f in os.listdir(json_dir) if f.endswith('.json')]
-    if not json_files:
-        print("No JSON file found in auburn_businesses/")
-        sys.exit(1)
-
-    json_file = os.path.join(json_dir, sorted(json_files)[-1])
-    print(f"Using: {json_file}")
-    load_businesses(json_file)
+    import argparse
+    parser = argparse.ArgumentParser(description='Bulk-load business JSON files into BUSINESSES')
+    parser.add_argument('files', nargs='*', help='JSON files from pull_businesses.py (default: newest OpenClaw pull)')
+    parser.add_argument('--sqlite', action='store_true', help='Load into the web CRM SQLite database')
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        # Find the JSON file
+        json_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'OpenClaw', 'auburn_businesses')
+        json_files = [f for f in os.listdir(json_dir) if f.endswith('.json')] if os.path.isdir(json_dir) else []
+        if not json_files:
+            print("No JSON file found in auburn_businesses/")
+            sys.exit(1)
+        files = [os.path.join(json_dir, sorted(json_files)[-1])]
+
+    print(f"Using: {', '.join(files)}")
+    load_businesses(files, sqlite=args.sqlite)
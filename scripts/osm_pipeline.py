@@ -0,0 +1,206 @@
+"""
+Single-pass streaming pipeline for Overpass results.
+
+    chunks (bytes) -> iter_elements() -> businesses generator -> fan_out(sinks)
+
+iter_elements() decodes the "elements" array one object at a time with
+json.JSONDecoder.raw_decode, keeping only the unparsed tail of the text in
+memory, so a county-sized extract never exists as a whole in memory. Sinks
+receive each business as it is produced:
+
+    CsvSink    - same columns as pull_businesses.save_csv
+    JsonSink   - a JSON array (what load_businesses.py / download_streetview.py read)
+    JsonlSink  - one JSON object per line
+    DbSink     - batches through load_businesses.stage_and_merge (SQL Server or SQLite)
+    CountSink  - per-category counts for the summary
+"""
+
+import csv
+import json
+import codecs
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ['name', 'category', 'full_address', 'city', 'state', 'zip',
+              'phone', 'website', 'cuisine', 'hours', 'lat', 'lon']
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_elements(chunks, key='elements'):
+    """Yield each object of the top-level `key` array from a stream of byte chunks.
+
+    Raises RuntimeError if the response ends with an Overpass runtime-error remark.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    chunks = iter(chunks)
+    marker = f'"{key}"'
+
+    def more():
+        nonlocal buf, pos
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    # Skip the header up to the opening bracket of the array
+    while True:
+        start = buf.find(marker)
+        if start >= 0:
+            bracket = buf.find('[', start + len(marker))
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+            pos = start
+        else:
+            pos = max(0, len(buf) - len(marker))
+        if not more():
+            return
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE + ',':
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise ValueError(f"Stream ended inside the {key} array")
+            continue
+        if buf[pos] == ']':
+            pos += 1
+            break
+        try:
+            element, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if not more():
+                raise
+            continue
+        pos = end
+        yield element
+
+    # The tail after the array is small; it may carry a "remark" on timeouts
+    tail = buf[pos:]
+    while more():
+        tail = buf
+    if 'runtime error' in tail.lower():
+        raise RuntimeError(f"Overpass: {tail.strip()[:200]}")
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, biz):
+        self.writer.writerow(biz)
+
+    def close(self):
+        self.file.close()
+        logger.info(f"CSV saved: {self.path}")
+
+
+class JsonSink:
+    """Streams a JSON array; the file is valid JSON only after close()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('[')
+        self.first = True
+
+    def write(self, biz):
+        self.file.write('\n  ' if self.first else ',\n  ')
+        self.file.write(json.dumps(biz, ensure_ascii=False))
+        self.first = False
+
+    def close(self):
+        self.file.write('\n]\n')
+        self.file.close()
+        logger.info(f"JSON saved: {self.path}")
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, biz):
+        self.file.write(json.dumps(biz, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+        logger.info(f"JSON lines saved: {self.path}")
+
+
+class DbSink:
+    """Stages every `batch` businesses into BUSINESSES via load_businesses.stage_and_merge."""
+
+    def __init__(self, sqlite=False, batch=5000):
+        import load_businesses  # deferred: its import configures the 'load_businesses' log
+        self.loader = load_businesses
+        self.sqlite = sqlite
+        self.batch = batch
+        self.conn = load_businesses.connect(sqlite)
+        self.pending = []
+        self.staged = self.inserted = 0
+
+    def write(self, biz):
+        self.pending.append(biz)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = self.loader.business_rows(self.pending, start_id=self.staged)
+        self.inserted += self.loader.stage_and_merge(self.conn, rows, sqlite=self.sqlite)
+        self.conn.commit()
+        self.staged += len(rows)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        try:
+            from density import refresh_density
+            refresh_density(self.conn, sqlite=self.sqlite, sources=['BUSINESSES'])
+        except Exception as e:
+            logger.warning(f"Density refresh skipped: {e}")
+        self.conn.close()
+        logger.info(f"DB sink: staged {self.staged}, inserted {self.inserted}, "
+                    f"skipped {self.staged - self.inserted}")
+
+
+class CountSink:
+    def __init__(self):
+        self.total = 0
+        self.categories = Counter()
+        self.sample = []
+
+    def write(self, biz):
+        self.total += 1
+        self.categories[biz['category']] += 1
+        if len(self.sample) < 20:
+            self.sample.append(biz)
+
+    def close(self):
+        pass
+
+
+def fan_out(businesses, sinks):
+    """Feed each business to every sink in one pass, then close them. Returns the count."""
+    count = 0
+    try:
+        for biz in businesses:
+            for sink in sinks:
+                sink.write(biz)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
@@ -0,0 +1,207 @@
+"""
+Tiling engine for large-area Overpass pulls.
+
+Splits a bounding box or a set of (center, radius) areas into grid tiles,
+runs one query per tile on a small thread pool with retry/backoff, and merges
+the results, dropping OSM elements that show up in more than one tile
+(ways crossing a tile border). Finished tiles are appended to a JSONL
+checkpoint, so a rerun after a failure only fetches the missing tiles.
+
+Tiles sit on a fixed grid (tile index = floor(coordinate / tile step)), so
+overlapping areas such as Auburn + Opelika share tiles instead of querying
+the same ground twice.
+"""
+
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEG_LAT = 111320.0
+DEFAULT_TILE_M = 4000
+DEFAULT_WORKERS = 2        # public Overpass instances allow ~2 concurrent slots per IP
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0         # seconds; doubled per retry, plus jitter
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints')
+
+
+class Tile:
+    """One grid cell: index (i, j), bounds and the label of the area it serves."""
+
+    __slots__ = ('i', 'j', 'south', 'west', 'north', 'east', 'label')
+
+    def __init__(self, i, j, south, west, north, east, label=''):
+        self.i, self.j = i, j
+        self.south, self.west, self.north, self.east = south, west, north, east
+        self.label = label
+
+    @property
+    def key(self):
+        return f"{self.i}:{self.j}"
+
+    @property
+    def bbox(self):
+        """Overpass bbox string: south,west,north,east."""
+        return f"{self.south:.6f},{self.west:.6f},{self.north:.6f},{self.east:.6f}"
+
+
+def _steps(tile_m, ref_lat):
+    lat_step = tile_m / METERS_PER_DEG_LAT
+    lon_step = lat_step / max(math.cos(math.radians(ref_lat)), 0.01)
+    return lat_step, lon_step
+
+
+def _grid(south, west, north, east, lat_step, lon_step, label, keep=None):
+    tiles = []
+    for i in range(math.floor(south / lat_step), math.floor(north / lat_step) + 1):
+        for j in range(math.floor(west / lon_step), math.floor(east / lon_step) + 1):
+            tile = Tile(i, j, i * lat_step, j * lon_step, (i + 1) * lat_step, (j + 1) * lon_step, label)
+            if keep is None or keep(tile):
+                tiles.append(tile)
+    return tiles
+
+
+def tiles_for_bbox(south, west, north, east, tile_m=DEFAULT_TILE_M, label=''):
+    """Grid tiles covering a bounding box."""
+    lat_step, lon_step = _steps(tile_m, (south + north) / 2)
+    return _grid(south, west, north, east, lat_step, lon_step, label)
+
+
+def tiles_for_centers(centers, radius_m, tile_m=DEFAULT_TILE_M):
+    """Grid tiles touching any circle in centers [(label, lat, lon)].
+
+    All centers share one grid (stepped at their mean latitude); a tile shared
+    by two circles is kept once, labeled with the first center listed.
+    """
+    ref_lat = sum(c[1] for c in centers) / len(centers)
+    lat_step, lon_step = _steps(tile_m, ref_lat)
+    dlat = radius_m / METERS_PER_DEG_LAT
+    tiles = {}
+    for label, lat, lon in centers:
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+
+        def touches_circle(tile, lat=lat, lon=lon):
+            # Distance from the center to the nearest point of the tile
+            near_lat = min(max(lat, tile.south), tile.north)
+            near_lon = min(max(lon, tile.west), tile.east)
+            dy = (near_lat - lat) * METERS_PER_DEG_LAT
+            dx = (near_lon - lon) * METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+            return dx * dx + dy * dy <= radius_m * radius_m
+
+        for tile in _grid(lat - dlat, lon - dlon, lat + dlat, lon + dlon, lat_step, lon_step, label, touches_circle):
+            tiles.setdefault(tile.key, tile)
+    return list(tiles.values())
+
+
+def within_circles(elements, centers, radius_m):
+    """Elements whose point (node lat/lon or way center) lies within radius_m of any center.
+
+    Each kept element's '_tile_label' becomes the label of the first circle containing it.
+    """
+    kept = []
+    for el in elements:
+        point = el if 'lat' in el else el.get('center') or {}
+        lat, lon = point.get('lat'), point.get('lon')
+        if lat is None or lon is None:
+            continue
+        for label, c_lat, c_lon in centers:
+            dy = (lat - c_lat) * METERS_PER_DEG_LAT
+            dx = (lon - c_lon) * METERS_PER_DEG_LAT * math.cos(math.radians(c_lat))
+            if dx * dx + dy * dy <= radius_m * radius_m:
+                el['_tile_label'] = label
+                kept.append(el)
+                break
+    return kept
+
+
+def checkpoint_path(tiles, tag=''):
+    """Stable checkpoint file for a tile plan (same plan -> same file)."""
+    digest = hashlib.sha1(','.join(sorted(t.key + t.bbox for t in tiles)).encode() + tag.encode()).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_DIR, f'overpass_{digest}.jsonl')
+
+
+def _load_checkpoint(path):
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # partial line from an interrupted write
+                done[entry['tile']] = entry['elements']
+    return done
+
+
+def _with_retries(fetch, tile, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            return fetch(tile)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Tile {tile.key} failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def run_tiles(tiles, fetch, workers=DEFAULT_WORKERS, checkpoint=None,
+              retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+    """Fetch every tile and merge the elements.
+
+    fetch(tile) returns a list of Overpass elements and raises on failure.
+    Returns (elements, failed_tile_keys). Each element gets a '_tile_label'
+    with the label of the tile it came from. Duplicates by (type, id) are
+    dropped. The checkpoint is removed once every tile has succeeded.
+    """
+    done = _load_checkpoint(checkpoint)
+    pending = [t for t in tiles if t.key not in done]
+    if done:
+        logger.info(f"Resuming: {len(done)} tiles from checkpoint, {len(pending)} to fetch")
+    labels = {t.key: t.label for t in tiles}
+
+    failed = []
+    write_lock = threading.Lock()
+    out = None
+    if checkpoint and pending:
+        os.makedirs(os.path.dirname(checkpoint), exist_ok=True)
+        out = open(checkpoint, 'a', encoding='utf-8')
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(_with_retries, fetch, t, retries, backoff): t for t in pending}
+            for n, future in enumerate(as_completed(futures), 1):
+                tile = futures[future]
+                try:
+                    elements = future.result()
+                except Exception as e:
+                    logger.error(f"Tile {tile.key} ({tile.bbox}) gave up: {e}")
+                    failed.append(tile.key)
+                    continue
+                done[tile.key] = elements
+                if out:
+                    with write_lock:
+                        out.write(json.dumps({'tile': tile.key, 'elements': elements}) + '\n')
+                        out.flush()
+                logger.info(f"Tile {n}/{len(pending)} {tile.key}: {len(elements)} elements")
+    finally:
+        if out:
+            out.close()
+
+    merged = {}
+    for key, elements in done.items():
+        for el in elements:
+            ident = (el.get('type'), el.get('id'))
+            if ident not in merged:
+                el['_tile_label'] = labels.get(key, '')
+                merged[ident] = el
+
+    if checkpoint and not failed and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return list(merged.values()), failed
@@ -2,6 +2,13 @@
 Auburn University Area Business Puller
 Uses OpenStreetMap Overpass API (FREE, no API key needed)
 Pulls all businesses within a configurable radius of Auburn University
+
+Large radii, several cities (--city) or a bounding box (--bbox) are split
+into grid tiles and pulled concurrently (see overpass_tiles.py); a failed
+run resumes from its tile checkpoint when rerun with the same arguments.
+
+--county / --stream parse the response incrementally and write CSV, JSON,
+JSON lines and the database in one pass (see osm_pipeline.py).
 """
 
 import requests
@@ -13,24 +20,31 @@ import sys
 from datetime import datetime
 from collections import defaultdict
 
+import api_config
+
 # --- Config ---
 AUBURN_LAT = 32.6010
 AUBURN_LON = -85.4876
 DEFAULT_RADIUS_METERS = 3000  # ~1.86 miles from campus center
-OVERPASS_URL = "https://overpass-api.de/api/interpreter"
-
-LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, f'auburn_businesses_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+OVERPASS_URL = api_config.OVERPASS_URL
+SINGLE_QUERY_MAX_RADIUS = 5000  # beyond this, split into tiles
+
+# --city presets: key -> (city, state, lat, lon)
+CITIES = {
+    'auburn': ('Auburn', 'AL', AUBURN_LAT, AUBURN_LON),
+    'opelika': ('Opelika', 'AL', 32.6454, -85.3783),
+    'columbus': ('Columbus', 'GA', 32.4610, -84.9877),
+    'phenix-city': ('Phenix City', 'AL', 32.4710, -85.0008),
+}
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web_crm'))
+from log_setup import setup_logging
+import http_cache
+import http_client
+import osm_pipeline
+import overpass_tiles
+
+setup_logging('auburn_businesses')
 logger = logging.getLogger(__name__)
 
 # --- Category Mapping ---
@@ -138,13 +152,40 @@ out center;
 """
 
 
+def build_bbox_query(bbox):
+    """Build Overpass QL query for businesses inside a south,west,north,east box"""
+    clauses = '\n'.join(f'  {kind}["name"]["{key}"]({bbox});'
+                         for key in ('amenity', 'shop', 'tourism', 'leisure', 'office')
+                         for kind in ('node', 'way'))
+    return f"""
+[out:json][timeout:60];
+(
+{clauses}
+);
+out center;
+"""
+
+
+def fetch_tile(tile):
+    """Run one tile query; raises on HTTP errors and Overpass runtime errors so the tile is retried"""
+    # No HTTP-level retries here: run_tiles retries the whole tile
+    resp = http_client.post(OVERPASS_URL, service='overpass', retries=0,
+                            data={'data': build_bbox_query(tile.bbox)})
+    resp.raise_for_status()
+    data = resp.json()
+    remark = data.get('remark', '')
+    if 'runtime error' in remark.lower():
+        raise RuntimeError(remark[:200])
+    return data.get('elements', [])
+
+
 def pull_businesses(lat=AUBURN_LAT, lon=AUBURN_LON, radius=DEFAULT_RADIUS_METERS):
     """Pull all businesses from OpenStreetMap around given coordinates"""
     query = build_query(lat, lon, radius)
     logger.info(f"Querying Overpass API: {radius}m radius around ({lat}, {lon})")
 
     try:
-        resp = requests.post(OVERPASS_URL, data={'data': query}, timeout=90)
+        resp = http_client.post(OVERPASS_URL, service='overpass', data={'data': query})
         resp.raise_for_status()
         data = resp.json()
     except requests.RequestException as e:
@@ -153,51 +194,103 @@ def pull_businesses(lat=AUBURN_LAT, lon=AUBURN_LON, radius=DEFAULT_RADIUS_METERS
 
     elements = data.get('elements', [])
     logger.info(f"Raw results: {len(elements)} elements")
+    return parse_elements(elements, by_name=True)
 
-    businesses = []
-    seen_names = set()
 
+def pull_tiled(centers=None, radius=DEFAULT_RADIUS_METERS, bbox=None, tile_m=overpass_tiles.DEFAULT_TILE_M,
+               workers=overpass_tiles.DEFAULT_WORKERS, fresh=False):
+    """Pull businesses tile by tile for city centers [(city_key, lat, lon)] or a bbox (s, w, n, e).
+
+    Returns (businesses, failed_tile_keys).
+    """
+    if bbox:
+        tiles = overpass_tiles.tiles_for_bbox(*bbox, tile_m=tile_m)
+    else:
+        tiles = overpass_tiles.tiles_for_centers(centers, radius, tile_m=tile_m)
+    checkpoint = overpass_tiles.checkpoint_path(tiles)
+    if fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    logger.info(f"Pulling {len(tiles)} tiles of {tile_m}m with {workers} workers (checkpoint: {checkpoint})")
+
+    elements, failed = overpass_tiles.run_tiles(tiles, fetch_tile, workers=workers, checkpoint=checkpoint)
+    logger.info(f"Raw results: {len(elements)} unique elements from {len(tiles) - len(failed)}/{len(tiles)} tiles")
+    if not bbox:
+        # Tiles only have to touch a circle, so their far corners reach past the radius
+        elements = overpass_tiles.within_circles(elements, centers, radius)
+        logger.info(f"Within {radius}m of a center: {len(elements)} elements")
+    if failed:
+        logger.warning(f"{len(failed)} tiles failed; rerun the same command to resume")
+    return parse_elements(elements), failed
+
+
+def to_business(el):
+    """Business dict for one Overpass element, or None if it has no name"""
+    tags = el.get('tags', {})
+    name = tags.get('name', '').strip()
+    if not name:
+        return None
+
+    biz_lat = el.get('lat') or el.get('center', {}).get('lat', '')
+    biz_lon = el.get('lon') or el.get('center', {}).get('lon', '')
+
+    # Tiled pulls label each element with the city preset it was pulled for
+    default_city, default_state = CITIES.get(el.get('_tile_label'), CITIES['auburn'])[:2]
+
+    biz = {
+        'name': name,
+        'category': classify_business(tags),
+        'address': tags.get('addr:street', ''),
+        'house_number': tags.get('addr:housenumber', ''),
+        'city': tags.get('addr:city', default_city),
+        'state': tags.get('addr:state', default_state),
+        'zip': tags.get('addr:postcode', ''),
+        'phone': tags.get('phone', tags.get('contact:phone', '')),
+        'website': tags.get('website', tags.get('contact:website', '')),
+        'cuisine': tags.get('cuisine', ''),
+        'hours': tags.get('opening_hours', ''),
+        'lat': biz_lat,
+        'lon': biz_lon,
+    }
+
+    # Build full address
+    if biz['house_number'] and biz['address']:
+        biz['full_address'] = f"{biz['house_number']} {biz['address']}"
+    elif biz['address']:
+        biz['full_address'] = biz['address']
+    else:
+        biz['full_address'] = ''
+    return biz
+
+
+def iter_businesses(elements, by_name=False):
+    """Yield businesses from Overpass elements, de-duplicated by OSM (type, id)
+
+    Tiled and streamed pulls see the same element in overlapping tiles but keep
+    chain branches, which share a name and category. by_name (the single-query
+    pull) also drops repeats of name + category, e.g. a shop mapped as both a
+    node and a way.
+    """
+    seen = set()
+    seen_names = set()
     for el in elements:
-        tags = el.get('tags', {})
-        name = tags.get('name', '').strip()
-        if not name:
+        ident = (el.get('type'), el.get('id'))
+        if ident in seen:
+            continue
+        seen.add(ident)
+        biz = to_business(el)
+        if biz is None:
             continue
+        if by_name:
+            dedup_key = f"{biz['name'].lower()}|{biz['category'].lower()}"
+            if dedup_key in seen_names:
+                continue
+            seen_names.add(dedup_key)
+        yield biz
 
-        # De-duplicate by name + type
-        biz_lat = el.get('lat') or el.get('center', {}).get('lat', '')
-        biz_lon = el.get('lon') or el.get('center', {}).get('lon', '')
-        category = classify_business(tags)
 
-        dedup_key = f"{name.lower()}|{category.lower()}"
-        if dedup_key in seen_names:
-            continue
-        seen_names.add(dedup_key)
-
-        biz = {
-            'name': name,
-            'category': category,
-            'address': tags.get('addr:street', ''),
-            'house_number': tags.get('addr:housenumber', ''),
-            'city': tags.get('addr:city', 'Auburn'),
-            'state': tags.get('addr:state', 'AL'),
-            'zip': tags.get('addr:postcode', ''),
-            'phone': tags.get('phone', tags.get('contact:phone', '')),
-            'website': tags.get('website', tags.get('contact:website', '')),
-            'cuisine': tags.get('cuisine', ''),
-            'hours': tags.get('opening_hours', ''),
-            'lat': biz_lat,
-            'lon': biz_lon,
-        }
-
-        # Build full address
-        if biz['house_number'] and biz['address']:
-            biz['full_address'] = f"{biz['house_number']} {biz['address']}"
-        elif biz['address']:
-            biz['full_address'] = biz['address']
-        else:
-            biz['full_address'] = ''
-
-        businesses.append(biz)
+def parse_elements(elements, by_name=False):
+    """Turn Overpass elements into business dicts, de-duplicated as in iter_businesses()"""
+    businesses = list(iter_businesses(elements, by_name=by_name))
 
     # Sort by category then name
     businesses.sort(key=lambda x: (x['category'], x['name']))
@@ -205,6 +298,39 @@ def pull_businesses(lat=AUBURN_LAT, lon=AUBURN_LON, radius=DEFAULT_RADIUS_METERS
     return businesses
 
 
+def build_area_query(area_name, state='AL', admin_level=6):
+    """Build Overpass QL query for businesses inside a named area of one US state (admin_level 6 = county)
+
+    County names repeat across states (there is a Lee County in AL, GA, FL, IL, ...), so the
+    boundary is looked up inside the state's ISO 3166-2 area rather than by name alone.
+    """
+    clauses = '\n'.join(f'  {kind}["name"]["{key}"](area.a);'
+                         for key in ('amenity', 'shop', 'tourism', 'leisure', 'office')
+                         for kind in ('node', 'way'))
+    return f"""
+[out:json][timeout:300];
+area["ISO3166-2"="US-{state.upper()}"]->.s;
+rel(area.s)["boundary"="administrative"]["admin_level"="{admin_level}"]["name"="{area_name}"];
+map_to_area->.a;
+(
+{clauses}
+);
+out center;
+"""
+
+
+def stream_businesses(query, sinks):
+    """Run one Overpass query and stream its businesses into sinks in a single pass.
+
+    Nothing is sorted or held as a full list; returns the number of businesses written.
+    """
+    logger.info("Streaming Overpass query")
+    with http_client.stream('POST', OVERPASS_URL, service='overpass_stream', data={'data': query}) as chunks:
+        count = osm_pipeline.fan_out(iter_businesses(osm_pipeline.iter_elements(chunks)), sinks)
+    logger.info(f"Unique businesses streamed: {count}")
+    return count
+
+
 def save_csv(businesses, filename=None):
     """Save businesses to CSV"""
     if not filename:
@@ -272,11 +398,40 @@ def main():
     parser.add_argument('--json', action='store_true', help='Also save JSON')
     parser.add_argument('--email', action='store_true', help='Email results to boss')
     parser.add_argument('--no-csv', action='store_true', help='Skip CSV output')
+    parser.add_argument('--city', action='append', choices=sorted(CITIES),
+                        help='Pull around this city center (repeatable); implies tiling')
+    parser.add_argument('--bbox', type=lambda v: tuple(float(x) for x in v.split(',')),
+                        help='Pull a south,west,north,east box; implies tiling')
+    parser.add_argument('--tile-size', type=int, default=overpass_tiles.DEFAULT_TILE_M,
+                        help=f'Tile edge in meters (default: {overpass_tiles.DEFAULT_TILE_M})')
+    parser.add_argument('--workers', type=int, default=overpass_tiles.DEFAULT_WORKERS,
+                        help=f'Concurrent tile queries (default: {overpass_tiles.DEFAULT_WORKERS})')
+    parser.add_argument('--fresh', action='store_true', help='Ignore any tile checkpoint and start over')
+    parser.add_argument('--refresh', action='store_true', help='Bypass the HTTP cache and refetch everything')
+    parser.add_argument('--county', help='Pull a whole county by name, e.g. "Lee County"; implies --stream')
+    parser.add_argument('--state', default='AL',
+                        help='Two-letter state the --county is in (default: AL)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Single pass: parse, dedupe and write outputs as elements arrive (unsorted)')
+    parser.add_argument('--jsonl', action='store_true', help='Also save JSON lines (streaming mode)')
+    parser.add_argument('--db', choices=['sqlserver', 'sqlite'],
+                        help='Also load into BUSINESSES as results stream in (streaming mode)')
     args = parser.parse_args()
-
-    logger.info(f"Starting Auburn business pull - radius: {args.radius}m")
-
-    businesses = pull_businesses(radius=args.radius)
+    http_cache.configure(refresh=args.refresh)
+
+    if args.county or args.stream:
+        return stream_main(args)
+
+    if args.bbox or args.city or args.radius > SINGLE_QUERY_MAX_RADIUS:
+        centers = [(key, CITIES[key][2], CITIES[key][3]) for key in (args.city or ['auburn'])]
+        logger.info(f"Starting tiled business pull - {args.bbox or [c[0] for c in centers]}, radius: {args.radius}m")
+        businesses, failed = pull_tiled(centers, radius=args.radius, bbox=args.bbox, tile_m=args.tile_size,
+                                        workers=args.workers, fresh=args.fresh)
+        if failed:
+            print(f"WARNING: {len(failed)} tiles failed - rerun the same command to resume")
+    else:
+        logger.info(f"Starting Auburn business pull - radius: {args.radius}m")
+        businesses = pull_businesses(radius=args.radius)
 
     if not businesses:
         logger.warning("No businesses found!")
@@ -300,6 +455,42 @@ def main():
     return businesses
 
 
+def stream_main(args):
+    """--stream / --county: one pass from the HTTP response to every output"""
+    if args.county:
+        query = build_area_query(args.county, state=args.state)
+        logger.info(f"Starting streamed business pull - {args.county}, {args.state.upper()}")
+    else:
+        query = build_query(AUBURN_LAT, AUBURN_LON, args.radius)
+        logger.info(f"Starting streamed business pull - radius: {args.radius}m")
+
+    out_base = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            f'auburn_businesses_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+    counts = osm_pipeline.CountSink()
+    sinks = [counts]
+    if args.csv and not args.no_csv:
+        sinks.append(osm_pipeline.CsvSink(out_base + '.csv'))
+    if args.json:
+        sinks.append(osm_pipeline.JsonSink(out_base + '.json'))
+    if args.jsonl:
+        sinks.append(osm_pipeline.JsonlSink(out_base + '.jsonl'))
+    if args.db:
+        sinks.append(osm_pipeline.DbSink(sqlite=args.db == 'sqlite'))
+    if args.email:
+        logger.warning("--email needs the full list; skipped in streaming mode")
+
+    stream_businesses(query, sinks)
+
+    print(f"\n{'='*60}")
+    print(f"  STREAMED {counts.total} unique businesses ({args.county or f'{args.radius}m radius'})")
+    print(f"{'='*60}")
+    for cat, count in counts.categories.most_common():
+        print(f"  {cat:<30} {count:>6}")
+    for sink in sinks[1:]:
+        print(f"  -> {getattr(sink, 'path', None) or ('BUSINESSES (' + args.db + ')')}")
+    return counts.total
+
+
 def email_results(businesses, csv_file=None):
     """Email business list to boss"""
     cats = defaultdict(list)
@@ -0,0 +1,272 @@
+"""
+Shared Google API quota ledger for the enrich, Street View and competitor scripts.
+
+Every billable call goes through a QuotaLimiter (a drop-in for
+rate_limit.TokenBucket: call .acquire() before each request). The limiter
+records the call in a local SQLite ledger (.quota.db) and enforces, across
+every process using the same file:
+
+  * a daily cap per API (calls per Pacific-time day, PST or PDT, matching
+    Google's midnight reset);
+    QuotaExceeded is raised once it is spent
+  * a QPS limit per quota group; each call reserves the next free slot in
+    the group, so two scripts hitting Places at once share 8/s between them
+    instead of sending 16/s
+
+http_cache never stores Google responses, so every planned call is billed;
+only the Street View metadata cache trims the plan (spots known to have no
+pano need no image call).
+
+Before a run, plan() sizes the work to the budget left today and
+print_plan() reports the projected calls, runtime and cost per API:
+
+    p = quota.plan(len(businesses), {'places_search': 1, 'places_photo': 0.8})
+    quota.print_plan(p)
+    businesses = businesses[:p.units]
+
+Caps and rates can be overridden per API with TIGER_QUOTA_<API>_DAILY and
+TIGER_QUOTA_<API>_QPS (e.g. TIGER_QUOTA_PLACES_SEARCH_DAILY=2000). Runs
+against a TIGER_API_BASE test server use .quota_local.db so they never spend
+the real budget.
+
+Usage:
+    python quota.py                # today's usage per API
+    python quota.py --days 7       # daily history
+"""
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import api_config
+
+logger = logging.getLogger(__name__)
+
+_default_ledger = '.quota_local.db' if api_config.API_BASE else '.quota.db'
+LEDGER_PATH = os.environ.get('TIGER_QUOTA_DB',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), _default_ledger))
+PACIFIC = ZoneInfo('America/Los_Angeles')   # Google resets daily quotas at midnight Pacific (tzdata on Windows)
+
+
+class Quota:
+    """Limits and price for one API. APIs in the same `group` share the QPS."""
+
+    def __init__(self, api, qps, daily, usd_per_1000=0.0, group=None):
+        self.api = api
+        self.group = group or api
+        env = f"TIGER_QUOTA_{api.upper()}"
+        self.qps = float(os.environ.get(f"{env}_QPS", qps))
+        daily = os.environ.get(f"{env}_DAILY", daily)
+        self.daily = int(daily) if daily not in (None, '') else None
+        self.usd_per_1000 = usd_per_1000
+
+
+# Places API (New) allows 600/min per method; Street View Static 30,000/min
+# (metadata requests share it but are free). Prices are list prices per 1,000.
+QUOTAS = {q.api: q for q in [
+    Quota('places_search', qps=8, daily=5000, usd_per_1000=32.0),
+    Quota('places_photo', qps=8, daily=5000, usd_per_1000=7.0),
+    Quota('streetview_meta', qps=20, daily=None, usd_per_1000=0.0, group='streetview'),
+    Quota('streetview', qps=20, daily=10000, usd_per_1000=7.0, group='streetview'),
+]}
+
+
+class QuotaExceeded(RuntimeError):
+    """The API's daily cap is spent."""
+
+
+def quota_day(now=None):
+    return datetime.fromtimestamp(now or time.time(), PACIFIC).strftime('%Y-%m-%d')
+
+
+class Ledger:
+    """The SQLite file holding per-day call counts and per-group QPS slots."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS QUOTA_USAGE (
+                    API TEXT NOT NULL,
+                    DAY TEXT NOT NULL,
+                    CALLS INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (API, DAY)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS QUOTA_SLOTS (
+                    QPS_GROUP TEXT PRIMARY KEY,
+                    NEXT_AT REAL NOT NULL
+                );
+            """)
+        return self._conn
+
+    def reserve(self, quota):
+        """Count one call against quota and return the wall-clock time it may be sent at.
+
+        One IMMEDIATE transaction, so concurrent processes serialize on the
+        ledger and each gets its own slot. Raises QuotaExceeded at the cap.
+        """
+        now = time.time()
+        day = quota_day(now)
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT CALLS FROM QUOTA_USAGE WHERE API = ? AND DAY = ?",
+                                 (quota.api, day)).fetchone()
+                calls = row[0] if row else 0
+                if quota.daily is not None and calls >= quota.daily:
+                    raise QuotaExceeded(f"{quota.api}: daily cap of {quota.daily} calls reached ({day})")
+                row = db.execute("SELECT NEXT_AT FROM QUOTA_SLOTS WHERE QPS_GROUP = ?", (quota.group,)).fetchone()
+                slot = max(now, row[0] if row else 0.0)
+                db.execute("INSERT OR REPLACE INTO QUOTA_SLOTS (QPS_GROUP, NEXT_AT) VALUES (?, ?)",
+                           (quota.group, slot + 1.0 / quota.qps))
+                db.execute("""
+                    INSERT INTO QUOTA_USAGE (API, DAY, CALLS) VALUES (?, ?, 1)
+                    ON CONFLICT (API, DAY) DO UPDATE SET CALLS = CALLS + 1
+                """, (quota.api, day))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return slot
+
+    def used(self, api, day=None):
+        row = self._db().execute("SELECT CALLS FROM QUOTA_USAGE WHERE API = ? AND DAY = ?",
+                                 (api, day or quota_day())).fetchone()
+        return row[0] if row else 0
+
+    def history(self, days=1):
+        """[(day, api, calls)] for the last `days` quota days, newest first."""
+        since = quota_day(time.time() - (days - 1) * 86400)
+        return self._db().execute("SELECT DAY, API, CALLS FROM QUOTA_USAGE WHERE DAY >= ? ORDER BY DAY DESC, API",
+                                  (since,)).fetchall()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = Ledger()
+    return _ledger
+
+
+class QuotaLimiter:
+    """rate_limit.TokenBucket stand-in backed by the shared ledger."""
+
+    def __init__(self, api):
+        self.quota = QUOTAS[api]
+
+    def acquire(self, tokens=1):
+        """Reserve `tokens` calls and sleep until the first slot. Returns seconds waited."""
+        waited = 0.0
+        for _ in range(tokens):
+            delay = ledger().reserve(self.quota) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+                waited += delay
+        return waited
+
+
+def limiter(api):
+    return QuotaLimiter(api)
+
+
+def remaining(api):
+    """Calls left today under the cap (None when uncapped)."""
+    quota = QUOTAS[api]
+    if quota.daily is None:
+        return None
+    return max(0, quota.daily - ledger().used(api))
+
+
+class Plan:
+    """How many work units fit today's budget, and what they are projected to cost."""
+
+    def __init__(self, label, requested, units, calls, seconds, usd):
+        self.label = label
+        self.requested = requested
+        self.units = units
+        self.calls = calls        # {api: projected calls for `units`}
+        self.seconds = seconds
+        self.usd = usd
+
+    @property
+    def deferred(self):
+        return self.requested - self.units
+
+
+def plan(units, calls_per_unit, label='run'):
+    """Fit `units` of work into today's caps.
+
+    calls_per_unit is {api: expected calls} for every unit, or a list of
+    such dicts, one per unit in the order they will run (callers put the
+    cheapest units first so the budget covers as many as possible). The
+    longest prefix that fits is planned. Runtime assumes each QPS group runs
+    flat out in parallel with the others, so the slowest group sets the pace.
+    """
+    costs = calls_per_unit if isinstance(calls_per_unit, list) else [calls_per_unit] * units
+    left = {api: remaining(api) for c in costs for api in c}
+    calls = dict.fromkeys(left, 0.0)
+    fit = 0
+    for cost in costs[:units]:
+        if any(left[api] is not None and calls[api] + n > left[api] for api, n in cost.items()):
+            break
+        for api, n in cost.items():
+            calls[api] += n
+        fit += 1
+    calls = {api: math.ceil(n) for api, n in calls.items()}
+    by_group = {}
+    for api, n in calls.items():
+        q = QUOTAS[api]
+        by_group[q.group] = by_group.get(q.group, 0.0) + n / q.qps
+    usd = sum(n * QUOTAS[api].usd_per_1000 / 1000 for api, n in calls.items())
+    return Plan(label, units, fit, calls, max(by_group.values(), default=0.0), usd)
+
+
+def print_plan(p):
+    print(f"\nQuota plan ({p.label}): {p.units}/{p.requested} units fit today's budget")
+    for api, n in p.calls.items():
+        q = QUOTAS[api]
+        left = remaining(api)
+        cap = f"{ledger().used(api)}/{q.daily} used today" if q.daily is not None else 'no daily cap'
+        print(f"  {api:<16} {n:>7} calls  {q.qps:>5.1f}/s  ${n * q.usd_per_1000 / 1000:>8.2f}  ({cap}"
+              f"{', ' + str(left) + ' left' if left is not None else ''})")
+    print(f"  Projected: {p.seconds / 60:.1f} min, ${p.usd:.2f} (upper bound: failed calls are not billed)")
+    if p.deferred:
+        print(f"  Deferred to the next quota day: {p.deferred} units")
+    logger.info(f"Quota plan {p.label}: {p.units}/{p.requested} units, calls={p.calls}, "
+                f"~{p.seconds:.0f}s, ${p.usd:.2f}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Show Google API usage from the quota ledger')
+    parser.add_argument('--days', type=int, default=1, help='Days of history to show (default: today)')
+    args = parser.parse_args()
+
+    print(f"Ledger: {ledger().path}  (quota day {quota_day()}, Pacific)")
+    rows = ledger().history(args.days)
+    if not rows:
+        print("  no calls recorded")
+    for day, api, calls in rows:
+        q = QUOTAS.get(api)
+        cap = f"/{q.daily}" if q and q.daily is not None else ''
+        usd = calls * q.usd_per_1000 / 1000 if q else 0.0
+        print(f"  {day}  {api:<16} {calls:>7}{cap:<7}  ${usd:.2f}")
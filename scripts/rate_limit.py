@@ -0,0 +1,89 @@
+"""
+Rate limiting and retry helpers for the Google-calling scripts.
+
+TokenBucket spaces calls so a thread pool stays inside an API's per-second
+quota (Places API (New) allows 600 requests/minute per method by default),
+while still letting a short burst through after an idle spell.
+call_with_retries() retries 429/5xx responses and connection errors with
+full-jitter exponential backoff, honoring Retry-After when the server sends it.
+"""
+
+import time
+import random
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0   # seconds; the cap doubles per retry, the sleep is uniform below it
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retry_after(resp):
+    try:
+        return max(0.0, float(resp.headers.get('Retry-After', '')))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter delay for a 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retries(fn, limiter=None, retries=MAX_RETRIES, backoff=BACKOFF_BASE, label=''):
+    """Call fn() -> requests.Response, retrying throttling/server errors.
+
+    Each attempt first takes a token from `limiter`, if given. The last
+    response is returned as-is (even a 429) once retries run out; connection
+    errors are re-raised.
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            resp = fn()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, backoff)
+            logger.warning(f"{label or 'request'}: {e}; retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        if resp.status_code not in RETRY_STATUSES or attempt == retries:
+            return resp
+        delay = _retry_after(resp)
+        if delay is None:
+            delay = backoff_delay(attempt, backoff)
+        logger.warning(f"{label or 'request'}: HTTP {resp.status_code}; retry {attempt + 1}/{retries} in {delay:.1f}s")
+        time.sleep(delay)
@@ -0,0 +1,305 @@
+"""
+Run the business ingestion scripts as one dependency graph:
+
+    pull ──> load ──┬──> enrich       (Places lookups + photos)
+                    └──> streetview   (Street View images + IMAGE_PATH)
+
+Each stage declares its input files, output files and upstream stages, and
+gets a fingerprint: a hash of its parameters, the contents of its inputs and
+the output digests of its upstream stages. pipeline/.state.json records the
+fingerprint of every successful run; a stage whose fingerprint is unchanged
+and whose outputs still exist is skipped. A pull that returns the same
+businesses therefore skips the load. enrich and streetview are never
+skipped: they read their pending businesses from the database, and a run cut
+short by the daily quota, a deferred plan or --limit leaves work for the next
+one (with nothing pending they finish after one query). Stages whose
+dependencies are done run concurrently (enrich and streetview share nothing
+but the database), and a per-stage timing report is printed at the end.
+
+The pull writes pipeline/businesses.json explicitly, so later stages never
+guess the "latest" file by name. It reruns only when its arguments change or
+its output is older than --pull-max-age hours.
+
+Usage:
+    python run_pipeline.py --sqlite                          # pull around Auburn -> SQLite
+    python run_pipeline.py --city auburn --city opelika
+    python run_pipeline.py --json ../data/auburn_businesses.json --sqlite   # skip the pull
+    python run_pipeline.py --sqlite --force enrich           # rerun a stage even if up to date
+    python run_pipeline.py --sqlite --dry-run                # show what would run
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web_crm'))
+from log_setup import setup_logging
+
+setup_logging('pipeline')
+logger = logging.getLogger(__name__)
+
+import http_cache
+import pull_businesses
+import load_businesses
+import enrich_businesses
+import download_streetview
+
+PIPELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline')
+STATE_PATH = os.path.join(PIPELINE_DIR, '.state.json')
+BUSINESSES_PATH = os.path.join(PIPELINE_DIR, 'businesses.json')
+PULL_MAX_AGE_HOURS = 24
+HASH_CHUNK = 1024 * 1024
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Stage:
+    """One step of the graph. `run()` returns a short detail string for the report."""
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), params=None, max_age=None, cacheable=True):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.max_age = max_age  # seconds an output stays current regardless of inputs
+        self.cacheable = cacheable  # False: the stage tracks its own progress and always runs
+
+    def fingerprint(self, upstream):
+        """Hash of params, input contents and upstream output digests."""
+        digest = hashlib.sha256(json.dumps([self.name, self.params], sort_keys=True, default=str).encode())
+        for path in self.inputs:
+            digest.update(f"{os.path.basename(path)}={file_hash(path) if os.path.exists(path) else '-'}".encode())
+        for dep in self.deps:
+            digest.update(f"{dep}={upstream[dep]}".encode())
+        return digest.hexdigest()
+
+    def output_digest(self, fingerprint):
+        """What downstream stages see: output contents if any, else this stage's fingerprint."""
+        if not self.outputs:
+            return fingerprint
+        digest = hashlib.sha256()
+        for path in self.outputs:
+            digest.update(file_hash(path).encode())
+        return digest.hexdigest()
+
+    def is_current(self, fingerprint, saved):
+        if not self.cacheable or not saved or saved.get('fingerprint') != fingerprint:
+            return False
+        if not all(os.path.exists(p) for p in self.outputs):
+            return False
+        if self.max_age is not None and time.time() - saved.get('finished', 0) > self.max_age:
+            return False
+        return True
+
+
+class Pipeline:
+    def __init__(self, stages, state_path=STATE_PATH, workers=4):
+        self.stages = {s.name: s for s in stages}
+        self.state_path = state_path
+        self.workers = workers
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def run(self, force=(), dry_run=False):
+        """Run every stage whose fingerprint changed. Returns [(name, status, seconds, detail)]."""
+        force = set(self.stages) if 'all' in force else set(force)
+        digests = {}   # stage -> output digest, once finished or skipped
+        report = {}
+        remaining = dict(self.stages)
+        running = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while remaining or running:
+                progressed = True
+                while progressed:   # skipped stages finish instantly and may unblock others
+                    progressed = False
+                    for name, stage in list(remaining.items()):
+                        if any(report.get(d, ('',))[0] in ('failed', 'blocked') for d in stage.deps):
+                            report[name] = ('blocked', 0.0, 'upstream failed')
+                            del remaining[name]
+                            progressed = True
+                            continue
+                        if not all(d in digests for d in stage.deps):
+                            continue
+                        del remaining[name]
+                        progressed = True
+                        fingerprint = stage.fingerprint(digests)
+                        saved = self.state.get(name)
+                        if name not in force and stage.is_current(fingerprint, saved):
+                            digests[name] = saved['digest']
+                            report[name] = ('skipped', 0.0, 'up to date')
+                            logger.info(f"[{name}] up to date, skipped")
+                        elif dry_run:
+                            digests[name] = f"dry-run:{fingerprint}"
+                            reason = ('forced' if name in force else
+                                      'inputs changed' if stage.cacheable else 'always runs')
+                            report[name] = ('would run', 0.0, reason)
+                        else:
+                            logger.info(f"[{name}] starting")
+                            running[pool.submit(self._run_stage, stage)] = (stage, fingerprint)
+
+                if not running:
+                    for name in remaining:  # a dependency names an unknown stage
+                        report[name] = ('blocked', 0.0, 'unknown dependency')
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, fingerprint = running.pop(future)
+                    seconds, detail, error = future.result()
+                    if error:
+                        report[stage.name] = ('failed', seconds, error)
+                        logger.error(f"[{stage.name}] failed after {seconds:.1f}s: {error}")
+                        continue
+                    digests[stage.name] = stage.output_digest(fingerprint)
+                    report[stage.name] = ('ran', seconds, detail)
+                    logger.info(f"[{stage.name}] done in {seconds:.1f}s {detail}")
+                    with self._state_lock:
+                        self.state[stage.name] = {'fingerprint': fingerprint, 'digest': digests[stage.name],
+                                                  'finished': time.time(), 'seconds': round(seconds, 2),
+                                                  'detail': detail}
+                        self._save_state()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        return [(name,) + report.get(name, ('not run', 0.0, '')) for name in self.stages]
+
+    @staticmethod
+    def _run_stage(stage):
+        start = time.perf_counter()
+        try:
+            detail = stage.run() or ''
+            return time.perf_counter() - start, detail, None
+        except BaseException as e:  # SystemExit from a script's sys.exit() counts as a failure too
+            logger.exception(f"[{stage.name}] error")
+            return time.perf_counter() - start, '', f"{type(e).__name__}: {e}"
+
+
+def build_stages(args):
+    """The pull -> load -> (enrich | streetview) graph for the parsed CLI args."""
+    source = os.path.abspath(args.json) if args.json else BUSINESSES_PATH
+    stages = []
+
+    if not args.json:
+        def pull():
+            pb = pull_businesses
+            if args.city or args.radius > pb.SINGLE_QUERY_MAX_RADIUS:
+                centers = [(key, pb.CITIES[key][2], pb.CITIES[key][3]) for key in (args.city or ['auburn'])]
+                businesses, failed = pb.pull_tiled(centers, radius=args.radius)
+                if failed:
+                    raise RuntimeError(f"{len(failed)} tiles failed; rerun to resume")
+            else:
+                businesses = pb.pull_businesses(radius=args.radius)
+            if not businesses:
+                raise RuntimeError("pull returned no businesses")
+            os.makedirs(PIPELINE_DIR, exist_ok=True)
+            tmp = BUSINESSES_PATH + '.tmp'
+            pb.save_json(businesses, filename=tmp)
+            os.replace(tmp, BUSINESSES_PATH)
+            return f"{len(businesses)} businesses"
+
+        stages.append(Stage('pull', pull, outputs=[BUSINESSES_PATH],
+                            params={'radius': args.radius, 'city': sorted(args.city or [])},
+                            max_age=args.pull_max_age * 3600))
+
+    deps = [] if args.json else ['pull']
+    target = {'sqlite': args.sqlite}
+
+    def load():
+        return f"{load_businesses.load_businesses([source], sqlite=args.sqlite)} inserted"
+
+    def enrich():
+        counts = enrich_businesses.enrich_all(limit=args.limit, sqlite=args.sqlite)
+        detail = f"{counts['enriched']} enriched, {counts['not_found']} not found, {counts['photos']} photos"
+        return detail + (f", {counts['deferred']} deferred" if counts['deferred'] else '')
+
+    def streetview():
+        result = download_streetview.download_all(sqlite=args.sqlite, limit=args.limit)
+        detail = f"{result['success']}/{result['total']} images"
+        return detail + (f", {result['deferred']} deferred" if result['deferred'] else '')
+
+    stages.append(Stage('load', load, deps=deps, inputs=[source], params=target))
+    # Both read their pending work from the database, so they run every time
+    stages.append(Stage('enrich', enrich, deps=['load'], params=dict(target, limit=args.limit), cacheable=False))
+    stages.append(Stage('streetview', streetview, deps=['load'], params=dict(target, limit=args.limit),
+                        cacheable=False))
+    return stages
+
+
+def print_report(report, total):
+    print(f"\n{'='*72}")
+    print(f"  {'STAGE':<12} {'STATUS':<10} {'SECONDS':>8}  DETAIL")
+    print(f"  {'-'*68}")
+    for name, status, seconds, detail in report:
+        print(f"  {name:<12} {status:<10} {seconds:>8.1f}  {detail}")
+    print(f"  {'-'*68}")
+    print(f"  {'wall clock':<23} {total:>8.1f}")
+    print(f"{'='*72}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pull, load, enrich and photograph businesses in one run')
+    parser.add_argument('--sqlite', action='store_true', help='Use the web CRM SQLite database')
+    parser.add_argument('--json', help='Use this business JSON instead of pulling from Overpass')
+    parser.add_argument('--radius', type=int, default=pull_businesses.DEFAULT_RADIUS_METERS,
+                        help=f'Pull radius in meters (default: {pull_businesses.DEFAULT_RADIUS_METERS})')
+    parser.add_argument('--city', action='append', choices=sorted(pull_businesses.CITIES),
+                        help='Pull around this city preset (repeatable)')
+    parser.add_argument('--limit', type=int, default=0, help='Cap enrich/streetview at N businesses (0=all)')
+    parser.add_argument('--pull-max-age', type=float, default=PULL_MAX_AGE_HOURS,
+                        help=f'Re-pull when the last pull is older than this many hours (default {PULL_MAX_AGE_HOURS})')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help="Rerun STAGE even if up to date ('all' for every stage); later stages "
+                             "rerun only if its output changes")
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-pull from Overpass instead of the HTTP cache (implies --force pull; '
+                             'Google responses are never cached)')
+    parser.add_argument('--dry-run', action='store_true', help='Print which stages would run, then stop')
+    args = parser.parse_args()
+
+    http_cache.configure(refresh=args.refresh)
+    force = args.force + (['pull'] if args.refresh and not args.json else [])
+
+    pipeline = Pipeline(build_stages(args))
+    unknown = set(force) - set(pipeline.stages) - {'all'}
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}; choose from {', '.join(pipeline.stages)}")
+
+    start = time.perf_counter()
+    report = pipeline.run(force=force, dry_run=args.dry_run)
+    print_report(report, time.perf_counter() - start)
+    if any(status in ('failed', 'blocked') for _, status, _, _ in report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
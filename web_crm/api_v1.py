@@ -0,0 +1,308 @@
+"""
+JSON API for integrations: GET /api/v1/<resource>, /api/v1/<resource>/<id>
+and POST /api/v1/batch.
+
+Resources use the same field names as the sync feed (sync.TABLES), plus `id`.
+
+    ?fields=id,firstName,phone   only these columns are SELECTed (id is always included)
+    ?stage=Won&stage=Lost        equality filters, repeatable (OR); only on indexed columns
+    ?limit=50&after=<next>       keyset pages in id order: WHERE id > after, never OFFSET
+    ?order=desc                  newest first (after then means id < after)
+    ?format=rows                 {"fields": [...], "rows": [[...]]} instead of one object per row
+
+A page is {"data": [...], "next": <cursor or null>}; pass `next` back as
+`after` for the following page. Each filter column has an index whose
+entries are ordered by the primary key within each value (SQLite rowid /
+SQL Server clustered key), so a filtered page is one index seek plus
+`limit` rows, however deep the page.
+
+POST /api/v1/batch (refused unless the server has SYNC_TOKEN set) takes
+{"ops": [...]} (at most MAX_BATCH_OPS) and runs them in order on one
+connection, in one transaction:
+
+    {"op": "create", "resource": "interactions", "data": {"contactId": 7, "type": "Call"}, "ref": "call"}
+    {"op": "update", "resource": "tasks", "id": 12, "data": {"status": "Completed"}}
+    {"op": "delete", "resource": "deals", "id": 3}
+
+An id, contactId or dealId may be {"ref": "<name>"} to use the id an earlier
+create in the same batch returned. Either every op commits, or the first
+failing op is reported and nothing is kept:
+{"committed": bool, "results": [{"status": "ok"|"error"|"rolled_back"|"skipped", "id"?, "error"?}]}.
+
+SQL Server DDL: see SQLSERVER_DDL below (run once by ensure_sqlserver()).
+"""
+
+import logging
+
+import sync
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+RESERVED_PARAMS = {'fields', 'limit', 'after', 'order', 'format'}
+MAX_BATCH_OPS = 100
+
+
+class QueryError(ValueError):
+    """A bad query string; the message lists what is allowed."""
+
+
+class BatchError(ValueError):
+    """A malformed batch; nothing was applied."""
+
+
+class Resource:
+    """An API collection: a synced table plus the indexed fields it can be filtered on."""
+
+    def __init__(self, name, filters=()):
+        spec = sync.TABLES[name]
+        self.spec = spec
+        self.name = name
+        self.table = spec.table
+        self.key = spec.key
+        self.fields = {'id': spec.key, **spec.fields}   # field -> column
+        self.filters = {f: self.fields[f] for f in filters}
+
+
+# Every filter column is indexed (init_db.py on SQLite, SQLSERVER_DDL below)
+RESOURCES = {r.name: r for r in [
+    Resource('contacts', ['leadStatus', 'contactType', 'assignedTo']),
+    Resource('deals', ['contactId', 'stage']),
+    Resource('tasks', ['contactId', 'dealId', 'status']),
+    Resource('interactions', ['contactId']),
+    Resource('campaigns', ['status']),
+    Resource('competitors', ['category']),
+]}
+
+INT_FIELDS = {'id', 'contactId', 'dealId'}
+
+SQLSERVER_INDEXES = [
+    ('IX_CONTACTS_LEAD_STATUS', 'CONTACTS', 'LEAD_STATUS'),
+    ('IX_CONTACTS_TYPE', 'CONTACTS', 'CONTACT_TYPE'),
+    ('IX_CONTACTS_ASSIGNED', 'CONTACTS', 'ASSIGNED_TO'),
+    ('IX_DEALS_CONTACT', 'DEALS', 'CONTACT_ID'),
+    ('IX_DEALS_STAGE', 'DEALS', 'STAGE'),
+    ('IX_TASKS_CONTACT', 'TASKS', 'CONTACT_ID'),
+    ('IX_TASKS_DEAL', 'TASKS', 'DEAL_ID'),
+    ('IX_TASKS_STATUS', 'TASKS', 'STATUS'),
+    ('IX_INTERACTIONS_CONTACT', 'INTERACTIONS', 'CONTACT_ID'),
+    ('IX_CAMPAIGNS_STATUS', 'CAMPAIGNS', 'STATUS'),
+    ('IX_COMPETITORS_CATEGORY', 'COMPETITORS', 'CATEGORY'),
+]
+SQLSERVER_DDL = [f"""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+        CREATE INDEX {name} ON {table}({column})
+""" for name, table, column in SQLSERVER_INDEXES]
+
+_sqlserver_ready = False
+
+
+def ensure_sqlserver(conn):
+    """Create the filter indexes on SQL Server (SQLite gets them from init_db). Once per process."""
+    global _sqlserver_ready
+    if _sqlserver_ready:
+        return
+    cur = conn.cursor()
+    for ddl in SQLSERVER_DDL:
+        cur.execute(ddl)
+    conn.commit()
+    _sqlserver_ready = True
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"{name} must be an integer") from None
+
+
+def parse_fields(resource, value):
+    """The requested field list (all fields when blank), id first."""
+    if not value:
+        return list(resource.fields)
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in resource.fields]
+    if unknown:
+        raise QueryError(f"unknown field(s) {', '.join(unknown)}; {resource.name} has {', '.join(resource.fields)}")
+    return ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+
+
+def parse_query(resource, args):
+    """Turn request.args into keyword arguments for select(). Raises QueryError."""
+    filters = {}
+    for name in args:
+        if name in RESERVED_PARAMS:
+            continue
+        if name not in resource.filters:
+            raise QueryError(f"cannot filter {resource.name} on '{name}'; "
+                             f"filters: {', '.join(resource.filters) or 'none'}")
+        values = args.getlist(name)
+        filters[name] = [_int(v, name) for v in values] if name in INT_FIELDS else values
+
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise QueryError("order must be 'asc' or 'desc'")
+    if args.get('format', 'objects') not in ('objects', 'rows'):
+        raise QueryError("format must be 'objects' or 'rows'")
+    limit = _int(args.get('limit', DEFAULT_LIMIT), 'limit')
+    return {
+        'fields': parse_fields(resource, args.get('fields')),
+        'filters': filters,
+        'after': _int(args['after'], 'after') if args.get('after') else None,
+        'limit': min(max(limit, 1), MAX_LIMIT),
+        'descending': order == 'desc',
+    }
+
+
+def select(cur, resource, fields, filters=None, after=None, limit=DEFAULT_LIMIT, descending=False, sqlite=True):
+    """One keyset page. Returns (rows as lists in `fields` order, next cursor or None)."""
+    columns = [resource.fields[f] for f in fields]
+    where, params = [], []
+    for field, values in (filters or {}).items():
+        column = resource.filters[field]
+        if len(values) == 1:
+            where.append(f"{column} = ?")
+        else:
+            where.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    if after is not None:
+        where.append(f"{resource.key} {'<' if descending else '>'} ?")
+        params.append(after)
+
+    # One extra row tells us whether there is a next page
+    sql = (f"SELECT {'' if sqlite else f'TOP {limit + 1} '}{', '.join(columns)} FROM {resource.table}"
+           f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+           f" ORDER BY {resource.key}{' DESC' if descending else ''}{f' LIMIT {limit + 1}' if sqlite else ''}")
+    cur.execute(sql, params)
+    rows = [[sync._value(v) for v in row] for row in cur.fetchall()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1][0] if more else None)
+
+
+def list_page(cur, resource, args, sqlite=True):
+    """GET /api/v1/<resource> response body for request.args."""
+    query = parse_query(resource, args)
+    rows, next_cursor = select(cur, resource, sqlite=sqlite, **query)
+    if args.get('format') == 'rows':
+        return {'fields': query['fields'], 'rows': rows, 'next': next_cursor}
+    return {'data': [dict(zip(query['fields'], row)) for row in rows], 'next': next_cursor}
+
+
+def get_one(cur, resource, record_id, args):
+    """GET /api/v1/<resource>/<id> response body, or None if there is no such record."""
+    fields = parse_fields(resource, args.get('fields'))
+    cur.execute(f"SELECT {', '.join(resource.fields[f] for f in fields)} FROM {resource.table} "
+                f"WHERE {resource.key} = ?", (record_id,))
+    row = cur.fetchone()
+    return dict(zip(fields, [sync._value(v) for v in row])) if row else None
+
+
+def _is_ref(value):
+    return isinstance(value, dict) and set(value) == {'ref'}
+
+
+def _validate_batch(ops):
+    if not isinstance(ops, list) or not ops:
+        raise BatchError("ops must be a non-empty list")
+    if len(ops) > MAX_BATCH_OPS:
+        raise BatchError(f"at most {MAX_BATCH_OPS} ops per batch")
+    refs = set()
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise BatchError(f"op {i}: not an object")
+        resource = RESOURCES.get(op.get('resource'))
+        if resource is None or not resource.spec.writable:
+            raise BatchError(f"op {i}: resource must be one of "
+                             f"{', '.join(n for n, r in RESOURCES.items() if r.spec.writable)}")
+        kind = op.get('op')
+        if kind not in ('create', 'update', 'delete'):
+            raise BatchError(f"op {i}: op must be 'create', 'update' or 'delete'")
+        if kind != 'delete' and (not isinstance(op.get('data'), dict) or (kind == 'update' and not op['data'])):
+            raise BatchError(f"op {i}: {kind} needs a data object")
+        data = op.get('data') or {}
+        unknown = [f for f in data if f not in resource.spec.fields]
+        if unknown:
+            raise BatchError(f"op {i}: unknown field(s) {', '.join(unknown)} for {resource.name}")
+        targets = ([op.get('id')] if kind != 'create' else []) + [data[f] for f in sync.REFERENCES if f in data]
+        for value in targets:
+            if _is_ref(value):
+                if value['ref'] not in refs:
+                    raise BatchError(f"op {i}: ref '{value['ref']}' is not created by an earlier op")
+            elif value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                raise BatchError(f'op {i}: ids must be positive integers or {{"ref": name}}')
+        if kind != 'create' and op.get('id') is None:
+            raise BatchError(f"op {i}: {kind} needs an id")
+        if kind == 'create' and op.get('ref') is not None:
+            if not isinstance(op['ref'], str) or op['ref'] in refs:
+                raise BatchError(f"op {i}: ref must be a string not used by an earlier op")
+            refs.add(op['ref'])
+
+
+def _run_op(cur, op, refs, sqlite):
+    """Apply one validated op. Returns its result; raises LookupError when the record is missing."""
+    resource = RESOURCES[op['resource']]
+    spec = resource.spec
+    data = {f: refs[v['ref']] if _is_ref(v) else v for f, v in (op.get('data') or {}).items()}
+    values = sync._columns(spec, data, {})
+    if op['op'] == 'create':
+        new_id = sync._insert(cur, spec, values, sqlite)
+        if op.get('ref'):
+            refs[op['ref']] = new_id
+        return {'status': 'ok', 'id': new_id}
+
+    row_id = refs[op['id']['ref']] if _is_ref(op['id']) else op['id']
+    if op['op'] == 'delete':
+        cur.execute(f"SELECT 1 FROM {spec.table} WHERE {spec.key} = ?", (row_id,))
+        if cur.fetchone() is None:
+            raise LookupError(f"{resource.name} {row_id} not found")
+        for sql in spec.on_delete:
+            cur.execute(sql, (row_id,))
+        cur.execute(f"DELETE FROM {spec.table} WHERE {spec.key} = ?", (row_id,))
+        return {'status': 'ok', 'id': row_id}
+
+    # Same side effects as the web forms: edits touch UPDATED_DATE, completing a task stamps it
+    now = "datetime('now')" if sqlite else "GETDATE()"
+    sets = [f"{c} = ?" for c in values]
+    if 'UPDATED_DATE' in spec.columns and 'UPDATED_DATE' not in values:
+        sets.append(f"UPDATED_DATE = {now}")
+    if spec.name == 'tasks' and values.get('STATUS') == 'Completed' and 'COMPLETED_DATE' not in values:
+        sets.append(f"COMPLETED_DATE = COALESCE(COMPLETED_DATE, {now})")
+    cur.execute(f"UPDATE {spec.table} SET {', '.join(sets)} WHERE {spec.key} = ?", list(values.values()) + [row_id])
+    if cur.rowcount == 0:
+        raise LookupError(f"{resource.name} {row_id} not found")
+    return {'status': 'ok', 'id': row_id}
+
+
+def apply_batch(conn, ops, sqlite=True):
+    """Run ops in order in one transaction; commit only if every op succeeds.
+
+    Returns {"committed": bool, "results": [...]}, one result per op. Raises
+    BatchError (nothing applied) for a malformed batch.
+    """
+    _validate_batch(ops)
+    cur = conn.cursor()
+    refs, results = {}, []
+    try:
+        for i, op in enumerate(ops):
+            try:
+                results.append(_run_op(cur, op, refs, sqlite))
+            except Exception as e:   # LookupError (missing record) or a database error
+                logger.warning(f"Batch op {i} ({op['op']} {op['resource']}) failed: {e}")
+                results.append({'status': 'error', 'error': str(e)})
+                break
+        committed = len(results) == len(ops) and results[-1]['status'] == 'ok'
+        if committed:
+            conn.commit()
+        else:
+            conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if not committed:
+        results = ([{'status': 'rolled_back'}] * (len(results) - 1) + results[-1:]
+                   + [{'status': 'skipped'}] * (len(ops) - len(results)))
+    logger.info(f"API batch: {len(ops)} ops, {'committed' if committed else 'rolled back'}")
+    return {'committed': committed, 'results': results}
@@ -8,37 +8,47 @@ Set environment variable USE_SQLITE=1 for SQLite mode.
 """
 
 import os
+import gzip
+import json
 import sqlite3
 import logging
+import importlib.util
 from datetime import datetime, date
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 from decimal import Decimal
 
+import api_v1
+import competitor_trends
+import dedupe
+import density
+import fragment_cache
+import geo
+import prospects
+import renewals
+import sync
+from fragment_cache import LazyRows
+
 # --- Detect database mode ---
 USE_SQLITE = os.environ.get('USE_SQLITE', '0') == '1'
 
-# Auto-detect: if pyodbc not available, force SQLite
-if not USE_SQLITE:
-    try:
-        import pyodbc
-    except ImportError:
-        USE_SQLITE = True
-
-# --- Logging Setup ---
-log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, f'web_crm_{datetime.now():%Y%m%d}.log')),
-        logging.StreamHandler()
-    ]
-)
+# Auto-detect: if pyodbc not installed, force SQLite (find_spec doesn't import it)
+if not USE_SQLITE and importlib.util.find_spec('pyodbc') is None:
+    USE_SQLITE = True
+
+# --- Logging Setup (deferred until the first request or __main__) ---
 logger = logging.getLogger(__name__)
 
+
+def init_logging():
+    """Start queued, size-rotated logging (logs/web_crm.log, or web_crm.<pid>.log under wsgi.py). No-op after the first call."""
+    from log_setup import setup_logging
+    setup_logging('web_crm')
+
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'tiger-marketing-crm-2026')
+fragment_cache.init_app(app)
+app.before_request(init_logging)
 
 # --- Database connections ---
 SQLSERVER_CONN_STR = 'DRIVER={SQL Server};SERVER=localhost;DATABASE=TIGER_MARKETING;Trusted_Connection=yes;'
@@ -52,8 +62,10 @@ def get_db():
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA journal_mode=WAL")
         conn.execute("PRAGMA foreign_keys=ON")
+        geo.register_functions(conn)
         return conn
     else:
+        import pyodbc
         return pyodbc.connect(SQLSERVER_CONN_STR, timeout=30)
 
 
@@ -111,6 +123,23 @@ def COALESCE_SUM(col, default=0):
     return f"COALESCE(SUM({col}), {default})"
 
 
+def data_versions(cur):
+    """Return {table: version} from DATA_VERSIONS, or {} if it doesn't exist."""
+    try:
+        cur.execute("SELECT TABLE_NAME, VERSION FROM DATA_VERSIONS")
+        return {r[0]: r[1] for r in cur.fetchall()}
+    except Exception:
+        return {}
+
+
+def lazy_query(cur, sql, params=()):
+    """Defer a query until a template actually iterates over its rows."""
+    def load():
+        cur.execute(sql, params)
+        return rows_to_list(cur, cur.fetchall())
+    return LazyRows(load)
+
+
 # ============================================================
 # DASHBOARD
 # ============================================================
@@ -153,27 +182,21 @@ def dashboard():
         cur.execute("SELECT COUNT(*) FROM INTERACTIONS")
         total_interactions = cur.fetchone()[0]
 
-        # Recent contacts
-        cur.execute(TOP_N(5, "* FROM CONTACTS ORDER BY CREATED_DATE DESC"))
-        recent_contacts = rows_to_list(cur, cur.fetchall())
+        # Widgets below are lazy: they only query on a fragment cache miss
+        recent_contacts = lazy_query(cur, TOP_N(5, "* FROM CONTACTS ORDER BY CREATED_DATE DESC"))
 
-        # Recent deals
-        cur.execute(TOP_N(5, f"""d.*, {CONCAT_NAME('c')} AS CONTACT_NAME
+        recent_deals = lazy_query(cur, TOP_N(5, f"""d.*, {CONCAT_NAME('c')} AS CONTACT_NAME
             FROM DEALS d
             LEFT JOIN CONTACTS c ON d.CONTACT_ID = c.CONTACT_ID
             ORDER BY d.CREATED_DATE DESC"""))
-        recent_deals = rows_to_list(cur, cur.fetchall())
 
-        # Upcoming tasks
-        cur.execute(TOP_N(5, f"""{'' if USE_SQLITE else ''}t.*, {CONCAT_NAME('c')} AS CONTACT_NAME
+        upcoming_tasks = lazy_query(cur, TOP_N(5, f"""t.*, {CONCAT_NAME('c')} AS CONTACT_NAME
             FROM TASKS t
             LEFT JOIN CONTACTS c ON t.CONTACT_ID = c.CONTACT_ID
             WHERE t.STATUS != 'Completed'
             ORDER BY t.DUE_DATE ASC"""))
-        upcoming_tasks = rows_to_list(cur, cur.fetchall())
 
-        # Pipeline by stage
-        cur.execute(f"""
+        pipeline_stages = lazy_query(cur, f"""
             SELECT STAGE, COUNT(*) AS CNT, {COALESCE_SUM('AMOUNT')} AS TOTAL
             FROM DEALS
             WHERE STAGE NOT IN ('Won', 'Lost')
@@ -186,16 +209,13 @@ def dashboard():
                 ELSE 5
             END
         """)
-        pipeline_stages = rows_to_list(cur, cur.fetchall())
 
-        # Contacts by lead status
-        cur.execute("""
+        leads_by_status = lazy_query(cur, """
             SELECT LEAD_STATUS, COUNT(*) AS CNT
             FROM CONTACTS
             GROUP BY LEAD_STATUS
             ORDER BY CNT DESC
         """)
-        leads_by_status = rows_to_list(cur, cur.fetchall())
 
         return render_template('dashboard.html',
             total_contacts=total_contacts,
@@ -213,7 +233,9 @@ def dashboard():
             recent_deals=recent_deals,
             upcoming_tasks=upcoming_tasks,
             pipeline_stages=pipeline_stages,
-            leads_by_status=leads_by_status
+            leads_by_status=leads_by_status,
+            versions=data_versions(cur),
+            today=date.today().isoformat()
         )
     except Exception as e:
         logger.error(f"Dashboard error: {e}")
@@ -250,8 +272,8 @@ def contacts_list():
             params.extend([s, s, s, s, s])
 
         query += " ORDER BY CREATED_DATE DESC"
-        cur.execute(query, params)
-        contacts = rows_to_list(cur, cur.fetchall())
+        versions = data_versions(cur)
+        contacts = lazy_query(cur, query, params)
 
         cur.execute("SELECT DISTINCT LEAD_STATUS FROM CONTACTS WHERE LEAD_STATUS IS NOT NULL ORDER BY LEAD_STATUS")
         statuses = [r[0] for r in cur.fetchall()]
@@ -259,7 +281,8 @@ def contacts_list():
         types = [r[0] for r in cur.fetchall()]
 
         return render_template('contacts.html', contacts=contacts, statuses=statuses,
-                             types=types, status_filter=status_filter, type_filter=type_filter, search=search)
+                             types=types, status_filter=status_filter, type_filter=type_filter, search=search,
+                             versions=versions)
     except Exception as e:
         logger.error(f"Contacts list error: {e}")
         return render_template('contacts.html', contacts=[], error=str(e))
@@ -326,17 +349,13 @@ def contact_detail(contact_id):
             flash('Contact not found', 'error')
             return redirect(url_for('contacts_list'))
 
-        cur.execute("SELECT * FROM DEALS WHERE CONTACT_ID = ? ORDER BY CREATED_DATE DESC", (contact_id,))
-        deals = rows_to_list(cur, cur.fetchall())
-
-        cur.execute("SELECT * FROM INTERACTIONS WHERE CONTACT_ID = ? ORDER BY CREATED_DATE DESC", (contact_id,))
-        interactions = rows_to_list(cur, cur.fetchall())
-
-        cur.execute("SELECT * FROM TASKS WHERE CONTACT_ID = ? ORDER BY DUE_DATE ASC", (contact_id,))
-        tasks = rows_to_list(cur, cur.fetchall())
+        versions = data_versions(cur)
+        deals = lazy_query(cur, "SELECT * FROM DEALS WHERE CONTACT_ID = ? ORDER BY CREATED_DATE DESC", (contact_id,))
+        interactions = lazy_query(cur, "SELECT * FROM INTERACTIONS WHERE CONTACT_ID = ? ORDER BY CREATED_DATE DESC", (contact_id,))
+        tasks = lazy_query(cur, "SELECT * FROM TASKS WHERE CONTACT_ID = ? ORDER BY DUE_DATE ASC", (contact_id,))
 
         return render_template('contact_detail.html', contact=contact, deals=deals,
-                             interactions=interactions, tasks=tasks)
+                             interactions=interactions, tasks=tasks, versions=versions)
     except Exception as e:
         logger.error(f"Contact detail error: {e}")
         flash(f'Error: {e}', 'error')
@@ -420,6 +439,51 @@ def contact_delete(contact_id):
     return redirect(url_for('contacts_list'))
 
 
+@app.route('/contacts/duplicates')
+def contact_duplicates():
+    """Review likely duplicate contacts found by blocking on phone/email/address."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        threshold = request.args.get('threshold', dedupe.DEFAULT_THRESHOLD, type=float)
+        cur.execute("""SELECT CONTACT_ID, FIRST_NAME, LAST_NAME, COMPANY, EMAIL, PHONE,
+                ADDRESS, CITY, LEAD_STATUS, CREATED_DATE FROM CONTACTS""")
+        contacts = rows_to_list(cur, cur.fetchall())
+        pairs = dedupe.find_duplicates(contacts, threshold=threshold)
+        return render_template('contact_duplicates.html', pairs=pairs, threshold=threshold)
+    except Exception as e:
+        logger.error(f"Duplicate scan error: {e}")
+        return render_template('contact_duplicates.html', pairs=[], threshold=dedupe.DEFAULT_THRESHOLD, error=str(e))
+    finally:
+        conn.close()
+
+
+@app.route('/contacts/merge', methods=['POST'])
+def contact_merge():
+    """Merge one contact into another, moving all related records."""
+    keep_id = request.form.get('keep_id', type=int)
+    merge_id = request.form.get('merge_id', type=int)
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT * FROM CONTACTS WHERE CONTACT_ID = ?", (keep_id,))
+        keep = row_to_dict(cur, cur.fetchone())
+        cur.execute("SELECT * FROM CONTACTS WHERE CONTACT_ID = ?", (merge_id,))
+        duplicate = row_to_dict(cur, cur.fetchone())
+        if not keep or not duplicate:
+            flash('Contact not found (already merged?)', 'error')
+        else:
+            dedupe.merge_contacts(conn, keep, duplicate, now_sql=NOW())
+            flash(f"Merged {duplicate['FIRST_NAME']} {duplicate['LAST_NAME']} into "
+                  f"{keep['FIRST_NAME']} {keep['LAST_NAME']}.", 'success')
+    except Exception as e:
+        logger.error(f"Merge contact error: {e}")
+        flash(f'Error: {e}', 'error')
+    finally:
+        conn.close()
+    return redirect(request.referrer or url_for('contact_duplicates'))
+
+
 # ============================================================
 # DEALS
 # ============================================================
@@ -562,6 +626,21 @@ def deal_delete(deal_id):
     return redirect(url_for('deals_list'))
 
 
+@app.route('/deals/renewals', methods=['POST'])
+def deal_renewals_run():
+    """Generate renewal deals and follow-up tasks for recurring Won deals that are due."""
+    conn = get_db()
+    try:
+        result = renewals.run_renewals(conn, sqlite=USE_SQLITE)
+        flash(f"Renewals: {result['renewals']} deals and {result['tasks']} tasks created.", 'success')
+    except Exception as e:
+        logger.error(f"Renewal run error: {e}")
+        flash(f'Error: {e}', 'error')
+    finally:
+        conn.close()
+    return redirect(url_for('deals_list'))
+
+
 # ============================================================
 # INTERACTIONS
 # ============================================================
@@ -837,7 +916,16 @@ def competitors_list():
     try:
         cur.execute("SELECT * FROM COMPETITORS ORDER BY RATING DESC")
         competitors = rows_to_list(cur, cur.fetchall())
-        return render_template('competitors.html', competitors=competitors)
+        # Precomputed by pull_competitors; absent until its first run on SQL Server
+        try:
+            trends = competitor_trends.place_trends(cur)
+            category_trends = competitor_trends.category_trends(cur)
+        except Exception as e:
+            logger.warning(f"Competitor trends unavailable: {e}")
+            trends, category_trends = {}, []
+        for c in competitors:
+            c['TREND'] = trends.get(c.get('GOOGLE_PLACE_ID'))
+        return render_template('competitors.html', competitors=competitors, category_trends=category_trends)
     except Exception as e:
         logger.error(f"Competitors error: {e}")
         return render_template('competitors.html', competitors=[], error=str(e))
@@ -845,6 +933,57 @@ def competitors_list():
         conn.close()
 
 
+# ============================================================
+# PROSPECTS (BUSINESSES)
+# ============================================================
+@app.route('/prospects')
+def prospects_list():
+    """Browse businesses by category, distance, phone and rating, one keyset page at a time."""
+    filters = {
+        'category': request.args.get('category', ''),
+        'radius': request.args.get('radius', type=float),
+        'lat': request.args.get('lat', prospects.AUBURN_CENTER[0], type=float),
+        'lon': request.args.get('lon', prospects.AUBURN_CENTER[1], type=float),
+        'has_phone': request.args.get('has_phone') == '1',
+        'min_rating': request.args.get('min_rating', type=float),
+    }
+    after = request.args.get('after', 0, type=int)
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        rows, next_after = prospects.search_prospects(
+            cur, sqlite=USE_SQLITE, category=filters['category'],
+            lat=filters['lat'], lon=filters['lon'],
+            radius_m=filters['radius'] * prospects.METERS_PER_MILE if filters['radius'] else None,
+            has_phone=filters['has_phone'], min_rating=filters['min_rating'],
+            after_id=after, row_to_dict=row_to_dict)
+        categories = prospects.category_counts(cur)
+        return render_template('prospects.html', businesses=rows, categories=categories,
+                               filters=filters, after=after, next_after=next_after)
+    except Exception as e:
+        logger.error(f"Prospects error: {e}")
+        return render_template('prospects.html', businesses=[], categories=[], filters=filters,
+                               after=after, next_after=None, error=str(e))
+    finally:
+        conn.close()
+
+
+@app.route('/prospects/<int:business_id>/convert', methods=['POST'])
+def prospect_convert(business_id):
+    """Create a contact from a business and open it."""
+    conn = get_db()
+    try:
+        contact_id, created = prospects.convert_to_contact(conn, business_id, sqlite=USE_SQLITE)
+        flash('Prospect converted to contact!' if created else 'Prospect was already a contact.', 'success')
+        return redirect(url_for('contact_detail', contact_id=contact_id))
+    except Exception as e:
+        logger.error(f"Convert prospect error: {e}")
+        flash(f'Error converting prospect: {e}', 'error')
+        return redirect(request.referrer or url_for('prospects_list'))
+    finally:
+        conn.close()
+
+
 # ============================================================
 # API ENDPOINTS (for AJAX/JS)
 # ============================================================
@@ -890,16 +1029,252 @@ def api_dashboard_stats():
         conn.close()
 
 
+@app.route('/api/competitors/near')
+def api_competitors_near():
+    """Nearest competitors to a point: ?lat=&lon=[&radius=meters][&k=10]."""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = request.args.get('radius', type=float)
+        k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (radius is not None and radius <= 0):
+        return jsonify({'error': 'lat/lon out of range or radius not positive'}), 400
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        rows = geo.nearest(cur, 'COMPETITORS', lat, lon, k=k, radius_m=radius,
+                           sqlite=USE_SQLITE, row_to_dict=row_to_dict)
+        return jsonify(rows)
+    except Exception as e:
+        logger.error(f"Competitors near error: {e}")
+        return jsonify({'error': 'nearest competitor search failed'}), 500
+    finally:
+        conn.close()
+
+
+@app.route('/api/density')
+def api_density():
+    """Geohash heatmap: ?source=businesses|competitors&precision=5|6|7[&category=][&prefix=].
+
+    Read-only: GEO_DENSITY is refreshed by the scripts that load BUSINESSES and
+    COMPETITORS (and python density.py).
+    """
+    table = request.args.get('source', 'competitors').upper()
+    precision = request.args.get('precision', 6, type=int)
+    if table not in geo.POINT_TABLES or precision not in density.PRECISIONS:
+        return jsonify({'error': f"source must be one of {sorted(t.lower() for t in geo.POINT_TABLES)}, "
+                                 f"precision one of {list(density.PRECISIONS)}"}), 400
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cells = density.heatmap(cur, table, precision, category=request.args.get('category'),
+                                prefix=request.args.get('prefix', ''))
+        return jsonify({'source': table.lower(), 'precision': precision,
+                        'fields': ['geohash', 'lat', 'lon', 'count'], 'cells': cells})
+    finally:
+        conn.close()
+
+
+# --- Delta sync for the offline static app (docs/app.js); see sync.py ---
+SYNC_TOKEN = os.environ.get('SYNC_TOKEN', '')          # if set, /api/sync and /api/v1 need "Authorization: Bearer <token>"
+# Origins (e.g. https://<user>.github.io) allowed to call the API from a browser. Empty: same-origin
+# only. Cross-origin calls are refused unless SYNC_TOKEN is set too, so a page the user happens
+# to visit can't read or change the CRM through their browser.
+SYNC_ORIGINS = [o.strip() for o in os.environ.get('SYNC_ORIGINS', '').split(',') if o.strip()]
+GZIP_MIN_BYTES = 1024
+
+
+def cross_origin():
+    """The request's Origin header when it isn't this server's own origin, else None."""
+    origin = request.headers.get('Origin', '')
+    return origin if origin and origin != request.host_url.rstrip('/') else None
+
+
+def allowed_origin():
+    """The cross-origin caller to grant CORS to, or None."""
+    origin = cross_origin()
+    if not origin or not SYNC_TOKEN:
+        return None
+    # The batch endpoint can delete contacts with cascades: only explicitly listed origins
+    if origin in SYNC_ORIGINS or ('*' in SYNC_ORIGINS and request.path != '/api/v1/batch'):
+        return origin
+    return None
+
+
+@app.after_request
+def sync_cors(response):
+    """Let the GitHub Pages app call /api/sync and /api/v1 from an origin listed in SYNC_ORIGINS."""
+    if request.path.startswith(('/api/sync', '/api/v1')):
+        origin = allowed_origin()
+        if origin:
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Headers'] = 'Authorization, Content-Type'
+            response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+            response.headers['Access-Control-Max-Age'] = '86400'
+        response.vary.add('Origin')
+    return response
+
+
+def sync_denied():
+    """A 403/401 response for a disallowed origin or a missing/wrong SYNC_TOKEN, else None."""
+    if cross_origin() and not allowed_origin():
+        return jsonify({'error': 'cross-origin API calls need SYNC_TOKEN and an origin in SYNC_ORIGINS'}), 403
+    if SYNC_TOKEN and request.headers.get('Authorization', '') != f"Bearer {SYNC_TOKEN}":
+        return jsonify({'error': 'missing or wrong API token'}), 401
+    return None
+
+
+def compact_json(payload):
+    """Minified JSON, gzipped when the client accepts it and it's worth it."""
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    response = app.response_class(body, mimetype='application/json')
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.route('/api/sync')
+def api_sync_pull():
+    """Records changed after ?since=<cursor> [&tables=contacts,deals][&limit=]; fetch again while "more"."""
+    denied = sync_denied()
+    if denied:
+        return denied
+    tables = [t for t in request.args.get('tables', '').split(',') if t] or None
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', sync.DEFAULT_LIMIT, type=int), 1), sync.MAX_LIMIT)
+    unknown = set(tables or ()) - set(sync.TABLES)
+    if unknown or since < 0:
+        return jsonify({'error': f"since must be a cursor >= 0, tables among {sorted(sync.TABLES)}"}), 400
+    conn = get_db()
+    try:
+        if not USE_SQLITE:
+            sync.ensure_sqlserver(conn)
+        return compact_json(sync.changes(conn, since, tables, limit, sqlite=USE_SQLITE))
+    finally:
+        conn.close()
+
+
+@app.route('/api/sync/push', methods=['POST'])
+def api_sync_push():
+    """Apply a batch of offline edits: {"batch": id, "ops": [{"t", "op", "id", "base", "data"}]}."""
+    denied = sync_denied()
+    if denied:
+        return denied
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'expected a JSON object with "ops"'}), 400
+    batch_id = str(body['batch'])[:64] if body.get('batch') else None
+    conn = get_db()
+    try:
+        if not USE_SQLITE:
+            sync.ensure_sqlserver(conn)
+        return compact_json(sync.apply_push(conn, body.get('ops'), batch_id=batch_id, sqlite=USE_SQLITE))
+    except sync.PushError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Sync push error: {e}")
+        return jsonify({'error': 'push failed, nothing was applied'}), 500
+    finally:
+        conn.close()
+
+
+# --- Read API for integrations; see api_v1.py ---
+@app.route('/api/v1/<resource>')
+def api_v1_list(resource):
+    """Keyset-paginated records: ?fields=&limit=&after=&order=&format= plus indexed filters."""
+    denied = sync_denied()
+    if denied:
+        return denied
+    spec = api_v1.RESOURCES.get(resource)
+    if spec is None:
+        return jsonify({'error': f"unknown resource; choose from {', '.join(api_v1.RESOURCES)}"}), 404
+    conn = get_db()
+    try:
+        if not USE_SQLITE:
+            api_v1.ensure_sqlserver(conn)
+        return compact_json(api_v1.list_page(conn.cursor(), spec, request.args, sqlite=USE_SQLITE))
+    except api_v1.QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+
+
+@app.route('/api/v1/<resource>/<int:record_id>')
+def api_v1_get(resource, record_id):
+    """One record, ?fields= projected."""
+    denied = sync_denied()
+    if denied:
+        return denied
+    spec = api_v1.RESOURCES.get(resource)
+    if spec is None:
+        return jsonify({'error': f"unknown resource; choose from {', '.join(api_v1.RESOURCES)}"}), 404
+    conn = get_db()
+    try:
+        record = api_v1.get_one(conn.cursor(), spec, record_id, request.args)
+    except api_v1.QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    if record is None:
+        return jsonify({'error': f"{resource} {record_id} not found"}), 404
+    return compact_json(record)
+
+
+@app.route('/api/v1/batch', methods=['POST'])
+def api_v1_batch():
+    """Ordered create/update/delete ops in one transaction: {"ops": [...]}; 409 if any op failed."""
+    if not SYNC_TOKEN:
+        return jsonify({'error': 'set SYNC_TOKEN on the server to enable /api/v1/batch'}), 403
+    denied = sync_denied()
+    if denied:
+        return denied
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'expected a JSON object with "ops"'}), 400
+    conn = get_db()
+    try:
+        result = api_v1.apply_batch(conn, body.get('ops'), sqlite=USE_SQLITE)
+    except api_v1.BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"API batch error: {e}")
+        return jsonify({'error': 'batch failed, nothing was applied'}), 500
+    finally:
+        conn.close()
+    response = compact_json(result)
+    if not result['committed']:
+        response.status_code = 409
+    return response
+
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Per-template render timings and fragment cache hit counts."""
+    return jsonify(fragment_cache.metrics_snapshot())
+
+
+@app.cli.command('warm-templates')
+def warm_templates_command():
+    """Precompile all templates into the Jinja bytecode cache."""
+    count = fragment_cache.warm_templates(app)
+    print(f"Compiled {count} templates into {fragment_cache.JINJA_CACHE_DIR}")
+
+
 # ============================================================
 # RUN
 # ============================================================
 if __name__ == '__main__':
+    init_logging()
     db_mode = "SQLite" if USE_SQLITE else "SQL Server"
     logger.info(f"Starting Tiger Marketing CRM on http://localhost:5000 [{db_mode} mode]")
 
-    # Auto-create SQLite tables if needed
+    # Create/upgrade SQLite tables only if the schema stamp is behind
     if USE_SQLITE:
-        from init_db import create_tables
-        create_tables()
+        from init_db import ensure_schema
+        ensure_schema()
 
     app.run(debug=True, host='0.0.0.0', port=5000)
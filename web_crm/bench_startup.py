@@ -0,0 +1,103 @@
+"""
+Cold-start benchmark for the CRM worker.
+
+Spawns fresh interpreters that import wsgi.py the same way PythonAnywhere
+does, and reports:
+  - worker-ready time: process spawn -> first dashboard response served
+  - the slowest imports, from `python -X importtime`
+
+Usage:
+    python bench_startup.py                 # 5 runs, top 15 imports
+    python bench_startup.py --runs 10 --record startup_history.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+READY_SNIPPET = (
+    "import wsgi\n"
+    "client = wsgi.application.test_client()\n"
+    "assert client.get('/').status_code == 200\n"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    env['USE_SQLITE'] = '1'
+    return env
+
+
+def worker_ready_ms(runs):
+    """Wall-clock ms from spawning an interpreter to serving the first request."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', READY_SNIPPET], cwd=PROJECT_DIR,
+                       env=_env(), check=True, capture_output=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def import_profile(top):
+    """Run `python -X importtime -c 'import wsgi'` and return the slowest imports."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+                            cwd=PROJECT_DIR, env=_env(), check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # Nested imports are indented two spaces per level after the first space
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({'module': name.strip(), 'self_us': int(self_us),
+                     'cumulative_us': int(cumulative_us), 'depth': depth})
+    total_us = sum(r['cumulative_us'] for r in rows if r['depth'] == 0)
+    rows.sort(key=lambda r: -r['cumulative_us'])
+    return total_us, rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CRM worker cold start')
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to time (default: 5)')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list (default: 15)')
+    parser.add_argument('--record', help='Append the result as a JSON line to this file')
+    args = parser.parse_args()
+
+    samples = worker_ready_ms(args.runs)
+    total_us, slowest = import_profile(args.top)
+
+    print(f"\n{'='*60}")
+    print(f"  WORKER READY TIME ({args.runs} cold starts)")
+    print(f"  median: {statistics.median(samples):8.1f} ms")
+    print(f"  min:    {min(samples):8.1f} ms")
+    print(f"  max:    {max(samples):8.1f} ms")
+    print(f"  import wsgi (importtime total): {total_us / 1000:.1f} ms")
+    print(f"{'='*60}")
+    print(f"{'Module':<45} {'cumulative ms':>14} {'self ms':>9}")
+    print("-" * 70)
+    for r in slowest:
+        print(f"{r['module'][:44]:<45} {r['cumulative_us'] / 1000:>14.1f} {r['self_us'] / 1000:>9.1f}")
+
+    if args.record:
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'runs': args.runs,
+                'ready_median_ms': round(statistics.median(samples), 1),
+                'ready_min_ms': round(min(samples), 1),
+                'import_total_ms': round(total_us / 1000, 1),
+            }) + '\n')
+        print(f"\nRecorded to {args.record}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Competitor rating / review-count history and trend rollups.
+
+COMPETITOR_SNAPSHOTS is delta-encoded per place: the first observation of a
+place is a base row with absolute values (IS_BASE = 1), and later rows hold
+only the change since the previous one (rating in tenths of a star). A row is
+written only when something changed, and at most one row per place per day,
+so a daily refresh of an unchanged market writes nothing.
+
+COMPETITOR_TRENDS (one row per place) keeps the last seen values and the
+review velocity over the last 30/90 days; CATEGORY_TRENDS sums them per
+category. Both are recomputed after each refresh, reading only the last 90
+days of snapshots, and the /competitors page reads them directly.
+
+SQL Server DDL: see SQLSERVER_DDL below (pull_competitors.py runs it).
+
+Usage:
+    python competitor_trends.py   # recompute rollups (slides the 30/90-day windows)
+"""
+
+import logging
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (30, 90)  # days
+
+SQLSERVER_DDL = [
+    """
+    IF OBJECT_ID('COMPETITOR_SNAPSHOTS') IS NULL
+        CREATE TABLE COMPETITOR_SNAPSHOTS (
+            GOOGLE_PLACE_ID NVARCHAR(200) NOT NULL, SNAPSHOT_DATE DATE NOT NULL,
+            RATING_X10_DELTA SMALLINT NOT NULL DEFAULT 0, REVIEW_DELTA INT NOT NULL DEFAULT 0,
+            IS_BASE BIT NOT NULL DEFAULT 0,
+            PRIMARY KEY (GOOGLE_PLACE_ID, SNAPSHOT_DATE)
+        )
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_COMPETITOR_SNAPSHOTS_DATE')
+        CREATE INDEX IX_COMPETITOR_SNAPSHOTS_DATE ON COMPETITOR_SNAPSHOTS(SNAPSHOT_DATE)
+    """,
+    """
+    IF OBJECT_ID('COMPETITOR_TRENDS') IS NULL
+        CREATE TABLE COMPETITOR_TRENDS (
+            GOOGLE_PLACE_ID NVARCHAR(200) PRIMARY KEY, CATEGORY NVARCHAR(100),
+            FIRST_SEEN DATE NOT NULL, LAST_SEEN DATE NOT NULL, LAST_RATING FLOAT, LAST_REVIEW_COUNT INT,
+            REVIEWS_30D INT NOT NULL DEFAULT 0, REVIEWS_90D INT NOT NULL DEFAULT 0,
+            RATING_CHANGE_90D FLOAT NOT NULL DEFAULT 0, REVIEWS_PER_MONTH FLOAT NOT NULL DEFAULT 0
+        )
+    """,
+    """
+    IF OBJECT_ID('CATEGORY_TRENDS') IS NULL
+        CREATE TABLE CATEGORY_TRENDS (
+            CATEGORY NVARCHAR(100) PRIMARY KEY, COMPETITORS INT NOT NULL, AVG_RATING FLOAT,
+            REVIEWS_30D INT NOT NULL DEFAULT 0, REVIEWS_90D INT NOT NULL DEFAULT 0,
+            REVIEWS_PER_MONTH FLOAT NOT NULL DEFAULT 0
+        )
+    """,
+]
+
+TREND_COLUMNS = ['GOOGLE_PLACE_ID', 'CATEGORY', 'FIRST_SEEN', 'LAST_SEEN', 'LAST_RATING', 'LAST_REVIEW_COUNT',
+                 'REVIEWS_30D', 'REVIEWS_90D', 'RATING_CHANGE_90D', 'REVIEWS_PER_MONTH']
+CATEGORY_COLUMNS = ['CATEGORY', 'COMPETITORS', 'AVG_RATING', 'REVIEWS_30D', 'REVIEWS_90D', 'REVIEWS_PER_MONTH']
+
+
+def _x10(rating):
+    return int(round(rating * 10)) if rating is not None else 0
+
+
+def _snapshot_sql(sqlite):
+    if sqlite:
+        return """
+            INSERT INTO COMPETITOR_SNAPSHOTS (GOOGLE_PLACE_ID, SNAPSHOT_DATE, RATING_X10_DELTA, REVIEW_DELTA, IS_BASE)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (GOOGLE_PLACE_ID, SNAPSHOT_DATE) DO UPDATE SET
+                RATING_X10_DELTA = RATING_X10_DELTA + excluded.RATING_X10_DELTA,
+                REVIEW_DELTA = REVIEW_DELTA + excluded.REVIEW_DELTA,
+                IS_BASE = MAX(IS_BASE, excluded.IS_BASE)
+        """
+    return """
+        MERGE COMPETITOR_SNAPSHOTS AS t
+        USING (SELECT ? AS GOOGLE_PLACE_ID, ? AS SNAPSHOT_DATE, ? AS RATING_X10_DELTA,
+                      ? AS REVIEW_DELTA, ? AS IS_BASE) AS s
+        ON t.GOOGLE_PLACE_ID = s.GOOGLE_PLACE_ID AND t.SNAPSHOT_DATE = s.SNAPSHOT_DATE
+        WHEN MATCHED THEN UPDATE SET RATING_X10_DELTA = t.RATING_X10_DELTA + s.RATING_X10_DELTA,
+            REVIEW_DELTA = t.REVIEW_DELTA + s.REVIEW_DELTA,
+            IS_BASE = CASE WHEN t.IS_BASE = 1 OR s.IS_BASE = 1 THEN 1 ELSE 0 END
+        WHEN NOT MATCHED THEN INSERT (GOOGLE_PLACE_ID, SNAPSHOT_DATE, RATING_X10_DELTA, REVIEW_DELTA, IS_BASE)
+            VALUES (s.GOOGLE_PLACE_ID, s.SNAPSHOT_DATE, s.RATING_X10_DELTA, s.REVIEW_DELTA, s.IS_BASE);
+    """
+
+
+def _load_state(cur):
+    cur.execute(f"SELECT {', '.join(TREND_COLUMNS)} FROM COMPETITOR_TRENDS")
+    return {row[0]: dict(zip(TREND_COLUMNS, row)) for row in cur.fetchall()}
+
+
+def record_snapshots(conn, observations, sqlite=True, today=None):
+    """Write delta rows for {place_id: (category, rating, review_count)} and refresh the rollups.
+
+    A rating or review count of None (Places omitted it) is not a change: no
+    delta is recorded for it and the last known value is kept.
+    The caller commits. Returns the number of snapshot rows written.
+    """
+    today = (today or date.today()).isoformat()
+    cur = conn.cursor()
+    state = _load_state(cur)
+
+    rows = []
+    for pid, (category, rating, reviews) in observations.items():
+        prev = state.get(pid)
+        if prev is None:
+            rows.append((pid, today, _x10(rating), reviews or 0, 1))
+            state[pid] = {'GOOGLE_PLACE_ID': pid, 'FIRST_SEEN': today}
+        else:
+            d_rating = d_reviews = 0
+            if rating is not None and prev['LAST_RATING'] is not None:
+                d_rating = _x10(rating) - _x10(prev['LAST_RATING'])
+            if reviews is not None and prev['LAST_REVIEW_COUNT'] is not None:
+                d_reviews = reviews - prev['LAST_REVIEW_COUNT']
+            if d_rating or d_reviews:
+                rows.append((pid, today, d_rating, d_reviews, 0))
+        s = state[pid]
+        s.update(CATEGORY=category, LAST_SEEN=today,
+                 LAST_RATING=s.get('LAST_RATING') if rating is None else rating,
+                 LAST_REVIEW_COUNT=s.get('LAST_REVIEW_COUNT') if reviews is None else reviews)
+
+    if rows:
+        cur.executemany(_snapshot_sql(sqlite), rows)
+    refresh_rollups(conn, sqlite=sqlite, state=state, today=today)
+    logger.info(f"Competitor snapshots: {len(rows)} changed of {len(observations)} observed")
+    return len(rows)
+
+
+def refresh_rollups(conn, sqlite=True, state=None, today=None):
+    """Recompute COMPETITOR_TRENDS and CATEGORY_TRENDS from the last 90 days of snapshots. The caller commits."""
+    today = today or date.today().isoformat()
+    cur = conn.cursor()
+    if state is None:
+        state = _load_state(cur)
+    day = date.fromisoformat(str(today)[:10])
+    cutoff = {w: (day - timedelta(days=w)).isoformat() for w in WINDOWS}
+
+    # Base rows are absolute values, not growth
+    cur.execute("""
+        SELECT GOOGLE_PLACE_ID, SNAPSHOT_DATE, RATING_X10_DELTA, REVIEW_DELTA FROM COMPETITOR_SNAPSHOTS
+        WHERE SNAPSHOT_DATE > ? AND IS_BASE = 0
+    """, (cutoff[max(WINDOWS)],))
+    growth = {}
+    for pid, snap_date, d_rating, d_reviews in cur.fetchall():
+        g = growth.setdefault(pid, {'r30': 0, 'r90': 0, 'rating90': 0})
+        g['r90'] += d_reviews
+        g['rating90'] += d_rating
+        if str(snap_date)[:10] > cutoff[30]:
+            g['r30'] += d_reviews
+
+    trends = []
+    categories = {}
+    for pid, s in state.items():
+        g = growth.get(pid, {'r30': 0, 'r90': 0, 'rating90': 0})
+        first_seen = str(s.get('FIRST_SEEN') or today)[:10]
+        observed_days = min(max(WINDOWS), max(1, (day - date.fromisoformat(first_seen)).days))
+        per_month = round(g['r90'] / observed_days * 30, 2)
+        trends.append((pid, s.get('CATEGORY'), first_seen, str(s.get('LAST_SEEN') or today)[:10],
+                       s.get('LAST_RATING'), s.get('LAST_REVIEW_COUNT'),
+                       g['r30'], g['r90'], g['rating90'] / 10.0, per_month))
+
+        c = categories.setdefault(s.get('CATEGORY') or '', {'n': 0, 'ratings': [], 'r30': 0, 'r90': 0, 'pm': 0.0})
+        c['n'] += 1
+        if s.get('LAST_RATING') is not None:
+            c['ratings'].append(s['LAST_RATING'])
+        c['r30'] += g['r30']
+        c['r90'] += g['r90']
+        c['pm'] += per_month
+
+    cur.execute("DELETE FROM COMPETITOR_TRENDS")
+    cur.execute("DELETE FROM CATEGORY_TRENDS")
+    if trends:
+        cur.executemany(f"INSERT INTO COMPETITOR_TRENDS ({', '.join(TREND_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(TREND_COLUMNS))})", trends)
+    if categories:
+        cur.executemany(f"INSERT INTO CATEGORY_TRENDS ({', '.join(CATEGORY_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(CATEGORY_COLUMNS))})",
+                        [(cat, c['n'], round(sum(c['ratings']) / len(c['ratings']), 2) if c['ratings'] else None,
+                          c['r30'], c['r90'], round(c['pm'], 2)) for cat, c in categories.items()])
+    return len(trends)
+
+
+def place_trends(cur):
+    """{place_id: {REVIEWS_30D, REVIEWS_90D, RATING_CHANGE_90D, REVIEWS_PER_MONTH}} for the list page."""
+    cur.execute("SELECT GOOGLE_PLACE_ID, REVIEWS_30D, REVIEWS_90D, RATING_CHANGE_90D, REVIEWS_PER_MONTH "
+                "FROM COMPETITOR_TRENDS")
+    return {row[0]: {'REVIEWS_30D': row[1], 'REVIEWS_90D': row[2], 'RATING_CHANGE_90D': row[3],
+                     'REVIEWS_PER_MONTH': row[4]} for row in cur.fetchall()}
+
+
+def category_trends(cur):
+    cur.execute(f"SELECT {', '.join(CATEGORY_COLUMNS)} FROM CATEGORY_TRENDS ORDER BY REVIEWS_PER_MONTH DESC")
+    return [dict(zip(CATEGORY_COLUMNS, row)) for row in cur.fetchall()]
+
+
+if __name__ == '__main__':
+    from app import get_db, init_logging, USE_SQLITE
+
+    init_logging()
+    if USE_SQLITE:
+        from init_db import ensure_schema
+        ensure_schema()
+
+    conn = get_db()
+    try:
+        n = refresh_rollups(conn, sqlite=USE_SQLITE)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Rolled up trends for {n} competitors")
@@ -0,0 +1,175 @@
+"""
+Duplicate contact detection and merging.
+
+Contacts are grouped into blocks by normalized keys:
+  - phone:   digits only (leading US '1' dropped)
+  - email:   trimmed, lowercased
+  - address: normalized COMPANY + ADDRESS (punctuation, business suffixes and
+             street-type spellings folded)
+Only contacts that share a block are compared, so the work grows with the
+block sizes instead of n^2. Each candidate pair gets a weighted similarity
+score over name, email, phone, company and address.
+
+merge_contacts() re-points DEALS, INTERACTIONS, TASKS, CAMPAIGN_CONTACTS and
+converted BUSINESSES from the duplicate to the kept contact, fills the kept
+contact's blank fields, and deletes the duplicate, all in one transaction.
+"""
+
+import re
+from difflib import SequenceMatcher
+from itertools import combinations
+
+DEFAULT_THRESHOLD = 0.75
+MAX_BLOCK_SIZE = 50  # skip junk keys shared by many rows (e.g. '0000000')
+
+# Weights for the fields both contacts have filled in
+FIELD_WEIGHTS = {
+    'name': 0.35,
+    'email': 0.25,
+    'phone': 0.20,
+    'company': 0.10,
+    'address': 0.10,
+}
+
+# Fields copied from the duplicate when the kept contact has them blank
+MERGE_FILL_FIELDS = [
+    'FIRST_NAME', 'LAST_NAME', 'COMPANY', 'JOB_TITLE', 'EMAIL', 'PHONE', 'ADDRESS',
+    'CITY', 'STATE', 'ZIP', 'NEIGHBORHOOD', 'LEAD_SOURCE', 'INTEREST_SERVICES',
+    'PROPERTY_TYPE', 'ESTIMATED_VALUE', 'RATING', 'ASSIGNED_TO',
+]
+
+CHILD_TABLES = ['DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGN_CONTACTS', 'BUSINESSES']
+
+_SUFFIXES = re.compile(r'\b(llc|inc|co|corp|corporation|company|ltd|pc|pllc)\b')
+_STREET_TYPES = {
+    'street': 'st', 'road': 'rd', 'avenue': 'ave', 'drive': 'dr', 'boulevard': 'blvd',
+    'lane': 'ln', 'court': 'ct', 'circle': 'cir', 'place': 'pl', 'parkway': 'pkwy',
+    'highway': 'hwy', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits if len(digits) >= 7 else ''
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    return email if '@' in email else ''
+
+
+def normalize_text(text):
+    text = re.sub(r'[^a-z0-9 ]', ' ', (text or '').lower())
+    text = _SUFFIXES.sub(' ', text)
+    return ' '.join(_STREET_TYPES.get(w, w) for w in text.split())
+
+
+def blocking_keys(contact):
+    """Return the block keys a contact belongs to."""
+    keys = []
+    phone = normalize_phone(contact.get('PHONE'))
+    if phone:
+        keys.append(('phone', phone))
+    email = normalize_email(contact.get('EMAIL'))
+    if email:
+        keys.append(('email', email))
+    address = normalize_text(contact.get('ADDRESS'))
+    if address:
+        keys.append(('address', f"{normalize_text(contact.get('COMPANY'))}|{address}"))
+    return keys
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return None
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score_pair(a, b):
+    """Weighted similarity (0-1) over the fields both contacts have, plus matched fields."""
+    fields = {
+        'name': (normalize_text(f"{a.get('FIRST_NAME', '')} {a.get('LAST_NAME', '')}"),
+                 normalize_text(f"{b.get('FIRST_NAME', '')} {b.get('LAST_NAME', '')}")),
+        'email': (normalize_email(a.get('EMAIL')), normalize_email(b.get('EMAIL'))),
+        'phone': (normalize_phone(a.get('PHONE')), normalize_phone(b.get('PHONE'))),
+        'company': (normalize_text(a.get('COMPANY')), normalize_text(b.get('COMPANY'))),
+        'address': (normalize_text(a.get('ADDRESS')), normalize_text(b.get('ADDRESS'))),
+    }
+    total = weight_sum = 0.0
+    matched = []
+    for field, (x, y) in fields.items():
+        if field in ('email', 'phone'):
+            sim = None if not x or not y else float(x == y)
+        else:
+            sim = _similarity(x, y)
+        if sim is None:
+            continue
+        weight = FIELD_WEIGHTS[field]
+        total += weight * sim
+        weight_sum += weight
+        if sim >= 0.9:
+            matched.append(field)
+    return (total / weight_sum if weight_sum else 0.0), matched
+
+
+def find_duplicates(contacts, threshold=DEFAULT_THRESHOLD):
+    """Return candidate pairs [{'a', 'b', 'score', 'matched'}] sorted by score."""
+    blocks = {}
+    for c in contacts:
+        for key in blocking_keys(c):
+            blocks.setdefault(key, []).append(c)
+
+    seen = set()
+    pairs = []
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for a, b in combinations(members, 2):
+            ids = (min(a['CONTACT_ID'], b['CONTACT_ID']), max(a['CONTACT_ID'], b['CONTACT_ID']))
+            if ids in seen:
+                continue
+            seen.add(ids)
+            score, matched = score_pair(a, b)
+            if score >= threshold:
+                first, second = (a, b) if a['CONTACT_ID'] == ids[0] else (b, a)
+                pairs.append({'a': first, 'b': second, 'score': round(score, 3), 'matched': matched})
+
+    pairs.sort(key=lambda p: -p['score'])
+    return pairs
+
+
+def merge_contacts(conn, keep, duplicate, now_sql="datetime('now')"):
+    """Fold contact row `duplicate` into `keep` (both dicts) in one transaction."""
+    keep_id, dup_id = keep['CONTACT_ID'], duplicate['CONTACT_ID']
+    if keep_id == dup_id:
+        raise ValueError("Cannot merge a contact into itself")
+
+    updates = {}
+    for field in MERGE_FILL_FIELDS:
+        if keep.get(field) in (None, '') and duplicate.get(field) not in (None, ''):
+            updates[field] = duplicate[field]
+    if duplicate.get('NOTES'):
+        updates['NOTES'] = '\n\n'.join(n for n in (keep.get('NOTES'), duplicate['NOTES']) if n)
+
+    cur = conn.cursor()
+    try:
+        # Avoid enrolling the kept contact in the same campaign twice
+        cur.execute("""
+            DELETE FROM CAMPAIGN_CONTACTS WHERE CONTACT_ID = ? AND CAMPAIGN_ID IN
+                (SELECT CAMPAIGN_ID FROM CAMPAIGN_CONTACTS WHERE CONTACT_ID = ?)
+        """, (dup_id, keep_id))
+        for table in CHILD_TABLES:
+            cur.execute(f"UPDATE {table} SET CONTACT_ID = ? WHERE CONTACT_ID = ?", (keep_id, dup_id))
+        assignments = ''.join(f"{col} = ?, " for col in updates)
+        cur.execute(f"UPDATE CONTACTS SET {assignments}UPDATED_DATE = {now_sql} WHERE CONTACT_ID = ?",
+                    list(updates.values()) + [keep_id])
+        cur.execute("DELETE FROM CONTACTS WHERE CONTACT_ID = ?", (dup_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return updates
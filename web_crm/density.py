@@ -0,0 +1,190 @@
+"""
+Geohash density grid for BUSINESSES and COMPETITORS (canvassing heatmaps).
+
+GEO_DENSITY holds row counts per (source table, geohash length, geohash,
+category) at each length in PRECISIONS. Each point is encoded once at the
+longest length and its prefixes give the coarser cells, so one pass over new
+rows updates every level. DENSITY_STATE keeps the highest id aggregated per
+source; refresh_density() only reads rows above it, so reruns after a pull
+touch just the new rows. Edits/deletes of existing rows need --rebuild.
+The loaders (load_businesses.py, osm_pipeline.py, pull_competitors.py) refresh
+after each write; /api/density only reads the grid.
+
+SQL Server DDL:
+    CREATE TABLE GEO_DENSITY (SOURCE_TABLE VARCHAR(30) NOT NULL, GEOHASH_LEN TINYINT NOT NULL,
+        GEOHASH VARCHAR(12) NOT NULL, CATEGORY NVARCHAR(100) NOT NULL, CNT INT NOT NULL,
+        PRIMARY KEY (SOURCE_TABLE, GEOHASH_LEN, GEOHASH, CATEGORY));
+    CREATE TABLE DENSITY_STATE (SOURCE_TABLE VARCHAR(30) PRIMARY KEY, LAST_ID INT NOT NULL);
+
+Usage:
+    python density.py            # incremental refresh
+    python density.py --rebuild  # recount everything
+"""
+
+import logging
+from collections import Counter
+
+import geo
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = (5, 6, 7)  # cells of roughly 4.9 km, 1.2 km and 150 m
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+
+def encode(lat, lon, precision=max(PRECISIONS)):
+    """Standard geohash of (lat, lon)."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            bit = lon >= mid
+            lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            bit = lat >= mid
+            lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+        value = (value << 1) | bit
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def decode(geohash):
+    """Center (lat, lon) of a geohash cell."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def aggregate(points):
+    """Counter of (geohash_len, geohash, category) for (lat, lon, category) points."""
+    longest = max(PRECISIONS)
+    counts = Counter()
+    for lat, lon, category in points:
+        full = encode(lat, lon, longest)
+        for length in PRECISIONS:
+            counts[(length, full[:length], category or '')] += 1
+    return counts
+
+
+def _upsert_sql(sqlite):
+    if sqlite:
+        return ("""
+            INSERT INTO GEO_DENSITY (SOURCE_TABLE, GEOHASH_LEN, GEOHASH, CATEGORY, CNT) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (SOURCE_TABLE, GEOHASH_LEN, GEOHASH, CATEGORY) DO UPDATE SET CNT = CNT + excluded.CNT
+        """, """
+            INSERT INTO DENSITY_STATE (SOURCE_TABLE, LAST_ID) VALUES (?, ?)
+            ON CONFLICT (SOURCE_TABLE) DO UPDATE SET LAST_ID = excluded.LAST_ID
+        """)
+    return ("""
+        MERGE GEO_DENSITY AS t
+        USING (SELECT ? AS SOURCE_TABLE, ? AS GEOHASH_LEN, ? AS GEOHASH, ? AS CATEGORY, ? AS CNT) AS s
+        ON t.SOURCE_TABLE = s.SOURCE_TABLE AND t.GEOHASH_LEN = s.GEOHASH_LEN
+           AND t.GEOHASH = s.GEOHASH AND t.CATEGORY = s.CATEGORY
+        WHEN MATCHED THEN UPDATE SET CNT = t.CNT + s.CNT
+        WHEN NOT MATCHED THEN INSERT (SOURCE_TABLE, GEOHASH_LEN, GEOHASH, CATEGORY, CNT)
+            VALUES (s.SOURCE_TABLE, s.GEOHASH_LEN, s.GEOHASH, s.CATEGORY, s.CNT);
+    """, """
+        MERGE DENSITY_STATE AS t
+        USING (SELECT ? AS SOURCE_TABLE, ? AS LAST_ID) AS s ON t.SOURCE_TABLE = s.SOURCE_TABLE
+        WHEN MATCHED THEN UPDATE SET LAST_ID = s.LAST_ID
+        WHEN NOT MATCHED THEN INSERT (SOURCE_TABLE, LAST_ID) VALUES (s.SOURCE_TABLE, s.LAST_ID);
+    """)
+
+
+def refresh_density(conn, sqlite=True, sources=None, rebuild=False):
+    """Fold rows added since the last refresh into GEO_DENSITY. Returns {source: rows read}."""
+    upsert_cell, upsert_state = _upsert_sql(sqlite)
+    cur = conn.cursor()
+    summary = {}
+    try:
+        for table in sources or geo.POINT_TABLES:
+            id_col = geo.POINT_TABLES[table]
+            if rebuild:
+                cur.execute("DELETE FROM GEO_DENSITY WHERE SOURCE_TABLE = ?", (table,))
+                last_id = 0
+            else:
+                cur.execute("SELECT LAST_ID FROM DENSITY_STATE WHERE SOURCE_TABLE = ?", (table,))
+                row = cur.fetchone()
+                last_id = row[0] if row else 0
+
+            cur.execute(f"""
+                SELECT {id_col}, LATITUDE, LONGITUDE, CATEGORY FROM {table}
+                WHERE {id_col} > ? ORDER BY {id_col}
+            """, (last_id,))
+            rows = cur.fetchall()
+            summary[table] = len(rows)
+            if not rows:
+                continue
+
+            counts = aggregate((r[1], r[2], r[3]) for r in rows if r[1] is not None and r[2] is not None)
+            if counts:
+                cur.executemany(upsert_cell, [(table, length, gh, cat, n)
+                                              for (length, gh, cat), n in counts.items()])
+            cur.execute(upsert_state, (table, rows[-1][0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Density refresh{' (rebuild)' if rebuild else ''}: {summary}")
+    return summary
+
+
+def heatmap(cur, table, precision, category=None, prefix=''):
+    """[[geohash, lat, lon, count], ...] for one source table and geohash length."""
+    where = "SOURCE_TABLE = ? AND GEOHASH_LEN = ?"
+    params = [table, precision]
+    if category:
+        where += " AND CATEGORY = ?"
+        params.append(category)
+    if prefix:
+        # '{' sorts right after 'z', the last geohash character
+        where += " AND GEOHASH >= ? AND GEOHASH < ?"
+        params += [prefix, prefix + '{']
+    cur.execute(f"SELECT GEOHASH, SUM(CNT) FROM GEO_DENSITY WHERE {where} GROUP BY GEOHASH ORDER BY GEOHASH",
+                params)
+    cells = []
+    for geohash, count in cur.fetchall():
+        lat, lon = decode(geohash)
+        cells.append([geohash, round(lat, 5), round(lon, 5), int(count)])
+    return cells
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import get_db, init_logging, USE_SQLITE
+
+    parser = argparse.ArgumentParser(description='Refresh the geohash density grid')
+    parser.add_argument('--rebuild', action='store_true', help='Recount all rows instead of only new ones')
+    args = parser.parse_args()
+
+    init_logging()
+    if USE_SQLITE:
+        from init_db import ensure_schema
+        ensure_schema()
+
+    conn = get_db()
+    try:
+        result = refresh_density(conn, sqlite=USE_SQLITE, rebuild=args.rebuild)
+    finally:
+        conn.close()
+    print('  '.join(f"{table}: {n} rows" for table, n in result.items()))
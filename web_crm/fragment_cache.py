@@ -0,0 +1,173 @@
+"""
+Template fragment cache, bytecode cache and render timing for the CRM.
+
+Heavy widgets are wrapped in a {% cache %} block keyed by a name plus the
+data version of every table they read:
+
+    {% cache 'pipeline_by_stage', versions.DEALS %}
+        {% for s in pipeline_stages %} ... {% endfor %}
+    {% endcache %}
+
+Views pass the widget rows as LazyRows so the query only runs when the
+block actually renders (a cache miss). If any key part is missing (e.g. the
+DATA_VERSIONS table does not exist on SQL Server), the block renders
+uncached every time.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from flask import g, before_render_template, template_rendered
+from jinja2 import nodes, FileSystemBytecodeCache, Undefined
+from jinja2.ext import Extension
+
+JINJA_CACHE_DIR = os.environ.get(
+    'JINJA_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.jinja_cache'))
+FRAGMENT_CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_render_stats = {}
+_fragment_stats = {'hits': 0, 'misses': 0, 'bypassed': 0}
+
+
+class LazyRows:
+    """List-like wrapper that runs its loader on first use."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._rows = None
+
+    def _load(self):
+        if self._rows is None:
+            self._rows = self._loader()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+    def __bool__(self):
+        return bool(self._load())
+
+
+class FragmentCache:
+    """Small per-process LRU of rendered template fragments."""
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with _lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with _lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with _lock:
+            self._entries.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """Adds {% cache name, key_part, ... %}...{% endcache %} to Jinja."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        if any(p is None or isinstance(p, Undefined) for p in parts):
+            _bump('bypassed')
+            return caller()
+
+        key = tuple(str(p) for p in parts)
+        cache = self.environment.fragment_cache
+        rv = cache.get(key)
+        if rv is not None:
+            _bump('hits')
+            return rv
+
+        _bump('misses')
+        rv = caller()
+        cache.set(key, rv)
+        return rv
+
+
+def _bump(counter):
+    with _lock:
+        _fragment_stats[counter] += 1
+
+
+def _render_started(sender, template, context, **extra):
+    g.setdefault('_render_started', []).append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    starts = g.get('_render_started')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    name = template.name or '<string>'
+    with _lock:
+        stats = _render_stats.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+
+def metrics_snapshot():
+    """Return per-template render timings and fragment cache counters."""
+    with _lock:
+        templates = {
+            name: {
+                'count': s['count'],
+                'avg_ms': round(s['total_ms'] / s['count'], 3),
+                'max_ms': round(s['max_ms'], 3),
+            }
+            for name, s in _render_stats.items()
+        }
+        return {'templates': templates, 'fragment_cache': dict(_fragment_stats)}
+
+
+def init_app(app):
+    """Install the fragment cache, persistent bytecode cache and render timing."""
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+
+def warm_templates(app):
+    """Compile every template once so the bytecode cache is populated."""
+    count = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+        count += 1
+    return count
@@ -0,0 +1,167 @@
+"""
+Spatial helpers: haversine distance, R-tree point indexes and k-nearest /
+radius search over tables with LATITUDE/LONGITUDE columns.
+
+SQLite: each indexed table gets a companion `<TABLE>_RTREE` virtual table
+(SQLite rtree module) kept in sync by triggers. Searches read candidate ids
+from the R-tree bounding box, then filter/sort by exact great-circle
+distance. k-nearest without a radius starts small and doubles the box until
+it holds k points inside the searched circle (or falls back to scanning all
+points once the box passes MAX_SEARCH_M).
+
+SQL Server: falls back to geography::Point(...).STDistance() with a
+LATITUDE/LONGITUDE bounding-box prefilter. To make that indexable, add a
+geography column kept in sync with the coordinates and a spatial index on it:
+    ALTER TABLE COMPETITORS ADD GEO geography;
+    CREATE SPATIAL INDEX SIX_COMPETITORS_GEO ON COMPETITORS(GEO);
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+INITIAL_SEARCH_M = 2000        # first box for k-nearest without a radius
+MAX_SEARCH_M = 500000          # beyond ~310 miles, fall back to a full scan
+
+# table -> primary key column, for tables with a point R-tree
+POINT_TABLES = {
+    'COMPETITORS': 'COMPETITOR_ID',
+    'BUSINESSES': 'ID',
+}
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters."""
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_m):
+    """(min_lat, max_lat, min_lon, max_lon) that contains the circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    coslat = math.cos(math.radians(lat))
+    dlon = 180.0 if coslat < 1e-6 else min(180.0, dlat / coslat)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def register_functions(conn):
+    """Expose HAVERSINE_M(lat1, lon1, lat2, lon2) to SQLite queries on this connection."""
+    conn.create_function('HAVERSINE_M', 4, haversine_m, deterministic=True)
+
+
+def create_point_index(cur, table, id_col):
+    """Create <table>_RTREE, its sync triggers, and backfill it (SQLite)."""
+    rtree = f"{table}_RTREE"
+    cur.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(ID, MIN_LAT, MAX_LAT, MIN_LON, MAX_LON);
+
+        CREATE TRIGGER IF NOT EXISTS TRG_{table}_RTREE_INSERT
+        AFTER INSERT ON {table}
+        WHEN NEW.LATITUDE IS NOT NULL AND NEW.LONGITUDE IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO {rtree} VALUES
+                (NEW.{id_col}, NEW.LATITUDE, NEW.LATITUDE, NEW.LONGITUDE, NEW.LONGITUDE);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS TRG_{table}_RTREE_UPDATE
+        AFTER UPDATE OF LATITUDE, LONGITUDE ON {table}
+        BEGIN
+            DELETE FROM {rtree} WHERE ID = OLD.{id_col};
+            INSERT INTO {rtree}
+                SELECT NEW.{id_col}, NEW.LATITUDE, NEW.LATITUDE, NEW.LONGITUDE, NEW.LONGITUDE
+                WHERE NEW.LATITUDE IS NOT NULL AND NEW.LONGITUDE IS NOT NULL;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS TRG_{table}_RTREE_DELETE
+        AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {rtree} WHERE ID = OLD.{id_col};
+        END;
+
+        INSERT OR REPLACE INTO {rtree}
+            SELECT {id_col}, LATITUDE, LATITUDE, LONGITUDE, LONGITUDE FROM {table}
+            WHERE LATITUDE IS NOT NULL AND LONGITUDE IS NOT NULL
+              AND {id_col} NOT IN (SELECT ID FROM {rtree});
+    """)
+
+
+def distance_sql(alias, lat, lon, sqlite=True):
+    """SQL expression (and params) for meters from (lat, lon) to alias's row.
+
+    SQLite needs register_functions() on the connection.
+    """
+    if sqlite:
+        return f"HAVERSINE_M(?, ?, {alias}.LATITUDE, {alias}.LONGITUDE)", [lat, lon]
+    return (f"geography::Point({alias}.LATITUDE, {alias}.LONGITUDE, 4326)"
+            f".STDistance(geography::Point(?, ?, 4326))"), [lat, lon]
+
+
+def within_radius_sql(table, alias, lat, lon, radius_m, sqlite=True):
+    """WHERE fragment (and params) keeping alias's rows within radius_m of (lat, lon).
+
+    SQLite narrows to R-tree ids in the bounding box before the exact check.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+    dist, dist_params = distance_sql(alias, lat, lon, sqlite)
+    if sqlite:
+        box = (f"{alias}.{POINT_TABLES[table]} IN (SELECT ID FROM {table}_RTREE "
+               f"WHERE MAX_LAT >= ? AND MIN_LAT <= ? AND MAX_LON >= ? AND MIN_LON <= ?)")
+    else:
+        box = f"{alias}.LATITUDE BETWEEN ? AND ? AND {alias}.LONGITUDE BETWEEN ? AND ?"
+    return f"{box} AND {dist} <= ?", [min_lat, max_lat, min_lon, max_lon] + dist_params + [radius_m]
+
+
+def _rows_in_box(cur, table, box, row_to_dict):
+    """Rows whose R-tree entry intersects box (SQLite)."""
+    id_col = POINT_TABLES[table]
+    cur.execute(f"""
+        SELECT t.* FROM {table}_RTREE r
+        JOIN {table} t ON t.{id_col} = r.ID
+        WHERE r.MAX_LAT >= ? AND r.MIN_LAT <= ? AND r.MAX_LON >= ? AND r.MIN_LON <= ?
+    """, (box[0], box[1], box[2], box[3]))
+    return [row_to_dict(cur, row) for row in cur.fetchall()]
+
+
+def _nearest_sqlserver(cur, table, lat, lon, radius_m, k, row_to_dict):
+    dist, params = distance_sql('t', lat, lon, sqlite=False)
+    where = "t.LATITUDE IS NOT NULL AND t.LONGITUDE IS NOT NULL"
+    if radius_m is not None:
+        radius_where, radius_params = within_radius_sql(table, 't', lat, lon, radius_m, sqlite=False)
+        where += f" AND {radius_where}"
+        params += radius_params
+    cur.execute(f"SELECT TOP ({int(k)}) t.*, {dist} AS DISTANCE_M FROM {table} t WHERE {where} ORDER BY DISTANCE_M",
+                params)
+    return [row_to_dict(cur, row) for row in cur.fetchall()]
+
+
+def nearest(cur, table, lat, lon, k=10, radius_m=None, sqlite=True, row_to_dict=None):
+    """Up to k rows of `table` nearest to (lat, lon), optionally within radius_m.
+
+    Each row dict gets a DISTANCE_M key; results are sorted nearest first.
+    """
+    row_to_dict = row_to_dict or (lambda _cur, row: dict(row))
+    if not sqlite:
+        return _nearest_sqlserver(cur, table, lat, lon, radius_m, k, row_to_dict)
+
+    search_m = radius_m if radius_m is not None else INITIAL_SEARCH_M
+    while True:
+        # Past MAX_SEARCH_M, scan every indexed point rather than keep growing
+        box = bounding_box(lat, lon, search_m) if search_m < MAX_SEARCH_M else (-90, 90, -180, 180)
+        # A caller's radius always applies; only the unbounded k-nearest scan takes every point
+        limit_m = radius_m if radius_m is not None else (search_m if search_m < MAX_SEARCH_M else None)
+        hits = []
+        for row in _rows_in_box(cur, table, box, row_to_dict):
+            d = haversine_m(lat, lon, row.get('LATITUDE'), row.get('LONGITUDE'))
+            if d is not None and (limit_m is None or d <= limit_m):
+                row['DISTANCE_M'] = round(d, 1)
+                hits.append(row)
+        # Every point within search_m was in the box, so k hits inside the
+        # circle are guaranteed to be the true k nearest.
+        if len(hits) >= k or radius_m is not None or search_m >= MAX_SEARCH_M:
+            hits.sort(key=lambda r: r['DISTANCE_M'])
+            return hits[:k]
+        search_m = min(search_m * 2, MAX_SEARCH_M)
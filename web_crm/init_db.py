@@ -7,7 +7,37 @@ import sqlite3
 import os
 import json
 
+import density
+import geo
+import sync
+
 DB_PATH = os.path.join(os.path.dirname(__file__), 'tiger_crm.db')
+BUSINESSES_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'auburn_businesses.json')
+
+# Stored in PRAGMA user_version. Bump whenever create_tables() changes so
+# existing databases pick up the new tables/indexes on next boot.
+SCHEMA_VERSION = 12
+
+# Columns added after a table first shipped. CREATE TABLE below already has
+# them; ensure_columns() adds them to databases created before that.
+COLUMN_UPGRADES = {
+    'DEALS': [
+        ('NEXT_RENEWAL_DATE', 'TEXT'),
+        ('RENEWED_FROM_DEAL_ID', 'INTEGER'),
+        ('RENEWAL_DUE_DATE', 'TEXT'),
+    ],
+    # Columns scripts/pull_competitors.py writes (same names as on SQL Server)
+    'COMPETITORS': [
+        ('NAME', "TEXT DEFAULT ''"),
+        ('GOOGLE_MAPS_URL', "TEXT DEFAULT ''"),
+        ('SEARCH_TERM', "TEXT DEFAULT ''"),
+        ('UPDATED_DATE', 'TEXT'),
+    ],
+}
+
+# Tables whose writes bump DATA_VERSIONS (used to key cached template fragments)
+VERSIONED_TABLES = ['CONTACTS', 'DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGNS',
+                    'CAMPAIGN_CONTACTS', 'COMPETITORS']
 
 
 def get_db():
@@ -18,7 +48,7 @@ def get_db():
     return conn
 
 
-def create_tables():
+def create_tables(verbose=True):
     conn = get_db()
     cur = conn.cursor()
 
@@ -64,6 +94,9 @@ def create_tables():
             NOTES TEXT DEFAULT '',
             WON_DATE TEXT,
             LOST_REASON TEXT DEFAULT '',
+            NEXT_RENEWAL_DATE TEXT,
+            RENEWED_FROM_DEAL_ID INTEGER,
+            RENEWAL_DUE_DATE TEXT,
             CREATED_DATE TEXT DEFAULT (datetime('now')),
             UPDATED_DATE TEXT DEFAULT (datetime('now')),
             FOREIGN KEY (CONTACT_ID) REFERENCES CONTACTS(CONTACT_ID)
@@ -142,22 +175,287 @@ def create_tables():
             GOOGLE_PLACE_ID TEXT DEFAULT '',
             LATITUDE REAL,
             LONGITUDE REAL,
-            CREATED_DATE TEXT DEFAULT (datetime('now'))
+            NAME TEXT DEFAULT '',
+            GOOGLE_MAPS_URL TEXT DEFAULT '',
+            SEARCH_TERM TEXT DEFAULT '',
+            CREATED_DATE TEXT DEFAULT (datetime('now')),
+            UPDATED_DATE TEXT
+        );
+
+        -- Last run of each competitor search term (pull_competitors.py --max-age)
+        CREATE TABLE IF NOT EXISTS COMPETITOR_SEARCHES (
+            SEARCH_TERM TEXT PRIMARY KEY,
+            LAST_RUN TEXT NOT NULL,
+            RESULT_COUNT INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Delta-encoded rating/review history and trend rollups (see competitor_trends.py)
+        CREATE TABLE IF NOT EXISTS COMPETITOR_SNAPSHOTS (
+            GOOGLE_PLACE_ID TEXT NOT NULL,
+            SNAPSHOT_DATE TEXT NOT NULL,
+            RATING_X10_DELTA INTEGER NOT NULL DEFAULT 0,
+            REVIEW_DELTA INTEGER NOT NULL DEFAULT 0,
+            IS_BASE INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (GOOGLE_PLACE_ID, SNAPSHOT_DATE)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS COMPETITOR_TRENDS (
+            GOOGLE_PLACE_ID TEXT PRIMARY KEY,
+            CATEGORY TEXT,
+            FIRST_SEEN TEXT NOT NULL,
+            LAST_SEEN TEXT NOT NULL,
+            LAST_RATING REAL,
+            LAST_REVIEW_COUNT INTEGER,
+            REVIEWS_30D INTEGER NOT NULL DEFAULT 0,
+            REVIEWS_90D INTEGER NOT NULL DEFAULT 0,
+            RATING_CHANGE_90D REAL NOT NULL DEFAULT 0,
+            REVIEWS_PER_MONTH REAL NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS CATEGORY_TRENDS (
+            CATEGORY TEXT PRIMARY KEY,
+            COMPETITORS INTEGER NOT NULL,
+            AVG_RATING REAL,
+            REVIEWS_30D INTEGER NOT NULL DEFAULT 0,
+            REVIEWS_90D INTEGER NOT NULL DEFAULT 0,
+            REVIEWS_PER_MONTH REAL NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS BUSINESSES (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            NAME TEXT NOT NULL,
+            CATEGORY TEXT DEFAULT '',
+            ADDRESS TEXT DEFAULT '',
+            CITY TEXT DEFAULT '',
+            STATE TEXT DEFAULT '',
+            ZIP TEXT DEFAULT '',
+            LATITUDE REAL,
+            LONGITUDE REAL,
+            PHONE TEXT DEFAULT '',
+            WEBSITE TEXT DEFAULT '',
+            SOURCE TEXT DEFAULT '',
+            GOOGLE_PLACE_ID TEXT,
+            RATING REAL,
+            REVIEW_COUNT INTEGER,
+            IMAGE_PATH TEXT,
+            CONTACT_ID INTEGER,
+            CREATED_DATE TEXT DEFAULT (datetime('now')),
+            UPDATED_DATE TEXT,
+            FOREIGN KEY (CONTACT_ID) REFERENCES CONTACTS(CONTACT_ID) ON DELETE SET NULL
+        );
+
+        -- Geohash cell counts per source table (see density.py)
+        CREATE TABLE IF NOT EXISTS GEO_DENSITY (
+            SOURCE_TABLE TEXT NOT NULL,
+            GEOHASH_LEN INTEGER NOT NULL,
+            GEOHASH TEXT NOT NULL,
+            CATEGORY TEXT NOT NULL DEFAULT '',
+            CNT INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (SOURCE_TABLE, GEOHASH_LEN, GEOHASH, CATEGORY)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS DENSITY_STATE (
+            SOURCE_TABLE TEXT PRIMARY KEY,
+            LAST_ID INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Google Places enrichment checkpoint (see scripts/enrich_businesses.py)
+        CREATE TABLE IF NOT EXISTS ENRICH_PROGRESS (
+            BUSINESS_ID INTEGER PRIMARY KEY,
+            STATUS TEXT NOT NULL,
+            ATTEMPTS INTEGER NOT NULL DEFAULT 1,
+            UPDATED_DATE TEXT DEFAULT (datetime('now'))
+        );
+
+        -- Business -> content-addressed image blob (see scripts/image_store.py)
+        CREATE TABLE IF NOT EXISTS BUSINESS_IMAGES (
+            BUSINESS_ID INTEGER NOT NULL,
+            SOURCE TEXT NOT NULL,
+            SHA256 TEXT NOT NULL,
+            PATH TEXT NOT NULL,
+            BYTES INTEGER NOT NULL,
+            SOURCE_REF TEXT,
+            CREATED_DATE TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (BUSINESS_ID, SOURCE)
+        );
+
+        CREATE TABLE IF NOT EXISTS DATA_VERSIONS (
+            TABLE_NAME TEXT PRIMARY KEY,
+            VERSION INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Change feed for the offline static app (see sync.py); SEQ is the client's cursor
+        CREATE TABLE IF NOT EXISTS SYNC_LOG (
+            SEQ INTEGER PRIMARY KEY AUTOINCREMENT,
+            TABLE_NAME TEXT NOT NULL,
+            ROW_ID INTEGER NOT NULL,
+            DELETED INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (TABLE_NAME, ROW_ID)
+        );
+
+        -- Results of applied push batches, so a retried push is not applied twice
+        CREATE TABLE IF NOT EXISTS SYNC_PUSHES (
+            BATCH_ID TEXT PRIMARY KEY,
+            RESULT TEXT NOT NULL,
+            CREATED_DATE TEXT NOT NULL DEFAULT (datetime('now'))
         );
     """)
 
+    ensure_columns(cur)
+    dedupe_competitor_places(cur)
+
+    cur.executescript("""
+        -- Renewal scheduler scans only recurring Won deals by due date
+        CREATE INDEX IF NOT EXISTS IX_DEALS_NEXT_RENEWAL
+            ON DEALS(NEXT_RENEWAL_DATE) WHERE RECURRING = 1 AND STAGE = 'Won';
+        -- One renewal per parent deal per due date (keeps reruns idempotent)
+        CREATE UNIQUE INDEX IF NOT EXISTS UX_DEALS_RENEWAL
+            ON DEALS(RENEWED_FROM_DEAL_ID, RENEWAL_DUE_DATE) WHERE RENEWED_FROM_DEAL_ID IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS IX_TASKS_DEAL ON TASKS(DEAL_ID);
+
+        -- Per-contact lookups (contact detail page, duplicate merge)
+        CREATE INDEX IF NOT EXISTS IX_DEALS_CONTACT ON DEALS(CONTACT_ID);
+        CREATE INDEX IF NOT EXISTS IX_INTERACTIONS_CONTACT ON INTERACTIONS(CONTACT_ID);
+        CREATE INDEX IF NOT EXISTS IX_TASKS_CONTACT ON TASKS(CONTACT_ID);
+        CREATE INDEX IF NOT EXISTS IX_CAMPAIGN_CONTACTS_CONTACT ON CAMPAIGN_CONTACTS(CONTACT_ID);
+
+        -- Prospecting: keyset pages per category, loader dedupe, converted lookups
+        CREATE INDEX IF NOT EXISTS IX_BUSINESSES_CATEGORY ON BUSINESSES(CATEGORY, ID);
+        CREATE UNIQUE INDEX IF NOT EXISTS UX_BUSINESSES_NAME_CATEGORY ON BUSINESSES(NAME, CATEGORY);
+        CREATE INDEX IF NOT EXISTS IX_BUSINESSES_CONTACT ON BUSINESSES(CONTACT_ID) WHERE CONTACT_ID IS NOT NULL;
+
+        -- Competitor pulls upsert on the Google place id
+        CREATE UNIQUE INDEX IF NOT EXISTS UX_COMPETITORS_PLACE
+            ON COMPETITORS(GOOGLE_PLACE_ID) WHERE GOOGLE_PLACE_ID <> '';
+        -- Trend rollups read only the last 90 days of snapshots
+        CREATE INDEX IF NOT EXISTS IX_COMPETITOR_SNAPSHOTS_DATE ON COMPETITOR_SNAPSHOTS(SNAPSHOT_DATE);
+
+        -- /api/v1 filters (see api_v1.py); entries sort by rowid within a value, so keyset pages seek
+        CREATE INDEX IF NOT EXISTS IX_CONTACTS_LEAD_STATUS ON CONTACTS(LEAD_STATUS);
+        CREATE INDEX IF NOT EXISTS IX_CONTACTS_TYPE ON CONTACTS(CONTACT_TYPE);
+        CREATE INDEX IF NOT EXISTS IX_CONTACTS_ASSIGNED ON CONTACTS(ASSIGNED_TO);
+        CREATE INDEX IF NOT EXISTS IX_DEALS_STAGE ON DEALS(STAGE);
+        CREATE INDEX IF NOT EXISTS IX_TASKS_STATUS ON TASKS(STATUS);
+        CREATE INDEX IF NOT EXISTS IX_CAMPAIGNS_STATUS ON CAMPAIGNS(STATUS);
+        CREATE INDEX IF NOT EXISTS IX_COMPETITORS_CATEGORY ON COMPETITORS(CATEGORY);
+    """)
+
+    # R-tree point indexes for nearest/radius search (see geo.py)
+    for table, id_col in geo.POINT_TABLES.items():
+        geo.create_point_index(cur, table, id_col)
+
+    create_version_triggers(cur)
+    sync.create_sqlite_triggers(cur)
+
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
-    print("All tables created successfully!")
 
-    # Show table counts
-    tables = ['CONTACTS', 'DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGNS', 'COMPETITORS']
-    for t in tables:
-        cur.execute(f"SELECT COUNT(*) FROM {t}")
-        print(f"  {t}: {cur.fetchone()[0]} rows")
+    if verbose:
+        print("All tables created successfully!")
+
+        # Show table counts
+        tables = ['CONTACTS', 'DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGNS', 'COMPETITORS', 'BUSINESSES']
+        for t in tables:
+            cur.execute(f"SELECT COUNT(*) FROM {t}")
+            print(f"  {t}: {cur.fetchone()[0]} rows")
 
     conn.close()
 
 
+def ensure_schema():
+    """Run create_tables() only if the database's schema stamp is behind.
+
+    Reading PRAGMA user_version is a single page read, so worker boot skips
+    the full DDL script when the schema is already current.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    if version >= SCHEMA_VERSION:
+        return False
+    create_tables(verbose=False)
+    return True
+
+
+def ensure_columns(cur):
+    """Add any COLUMN_UPGRADES columns missing from an older database."""
+    for table, columns in COLUMN_UPGRADES.items():
+        existing = {r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+        for name, decl in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def dedupe_competitor_places(cur):
+    """Keep the oldest row per GOOGLE_PLACE_ID (earlier pulls inserted every run) so UX_COMPETITORS_PLACE can build."""
+    cur.execute("""
+        DELETE FROM COMPETITORS
+        WHERE GOOGLE_PLACE_ID <> ''
+          AND COMPETITOR_ID NOT IN (SELECT MIN(COMPETITOR_ID) FROM COMPETITORS
+                                    WHERE GOOGLE_PLACE_ID <> '' GROUP BY GOOGLE_PLACE_ID)
+    """)
+
+
+def create_version_triggers(cur):
+    """Bump DATA_VERSIONS.VERSION for a table on every insert/update/delete."""
+    for table in VERSIONED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO DATA_VERSIONS (TABLE_NAME, VERSION) VALUES (?, 0)", (table,))
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS TRG_{table}_{op}_VERSION
+                AFTER {op} ON {table}
+                BEGIN
+                    UPDATE DATA_VERSIONS SET VERSION = VERSION + 1 WHERE TABLE_NAME = '{table}';
+                END
+            """)
+
+
+def load_businesses_json(json_file=BUSINESSES_JSON):
+    """Bulk-load an OpenStreetMap business pull (data/auburn_businesses.json) into BUSINESSES.
+
+    One executemany of INSERT OR IGNORE; rows already present by
+    (NAME, CATEGORY) are skipped via UX_BUSINESSES_NAME_CATEGORY.
+    Returns (inserted, skipped).
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        businesses = json.load(f)
+
+    rows = []
+    for biz in businesses:
+        name = (biz.get('name') or '').strip()
+        if not name:
+            continue
+        rows.append((
+            name,
+            biz.get('category', ''),
+            biz.get('full_address', ''),
+            biz.get('city') or 'Auburn',
+            biz.get('state') or 'AL',
+            biz.get('zip', ''),
+            biz.get('lat') if biz.get('lat') != '' else None,
+            biz.get('lon') if biz.get('lon') != '' else None,
+            biz.get('phone', ''),
+            biz.get('website', ''),
+        ))
+
+    conn = get_db()
+    try:
+        before = conn.execute("SELECT COUNT(*) FROM BUSINESSES").fetchone()[0]
+        conn.executemany("""
+            INSERT OR IGNORE INTO BUSINESSES (NAME, CATEGORY, ADDRESS, CITY, STATE, ZIP,
+                LATITUDE, LONGITUDE, PHONE, WEBSITE, SOURCE)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'OpenStreetMap')
+        """, rows)
+        inserted = conn.execute("SELECT COUNT(*) FROM BUSINESSES").fetchone()[0] - before
+        conn.commit()
+        density.refresh_density(conn, sources=['BUSINESSES'])
+    finally:
+        conn.close()
+    return inserted, len(rows) - inserted
+
+
 def export_from_sqlserver():
     """Export data from local SQL Server to JSON files for cloud import."""
     try:
@@ -182,6 +480,7 @@ def export_from_sqlserver():
         'TASKS': 'SELECT * FROM TASKS ORDER BY TASK_ID',
         'CAMPAIGNS': 'SELECT * FROM CAMPAIGNS ORDER BY CAMPAIGN_ID',
         'COMPETITORS': 'SELECT * FROM COMPETITORS ORDER BY COMPETITOR_ID',
+        'BUSINESSES': 'SELECT * FROM BUSINESSES ORDER BY ID',
     }
 
     for table_name, query in tables.items():
@@ -223,7 +522,7 @@ def import_to_sqlite():
     cur = conn.cursor()
 
     # Order matters for foreign keys
-    tables = ['CONTACTS', 'DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGNS', 'COMPETITORS']
+    tables = ['CONTACTS', 'DEALS', 'INTERACTIONS', 'TASKS', 'CAMPAIGNS', 'COMPETITORS', 'BUSINESSES']
 
     for table_name in tables:
         filepath = os.path.join(export_dir, f'{table_name}.json')
@@ -255,6 +554,7 @@ def import_to_sqlite():
         conn.commit()
         print(f"  Imported {table_name}: {len(rows)} rows")
 
+    density.refresh_density(conn)
     conn.close()
     print("Import complete!")
 
@@ -272,6 +572,11 @@ if __name__ == '__main__':
             create_tables()
             print("Importing data...")
             import_to_sqlite()
+        elif cmd == 'businesses':
+            json_file = sys.argv[2] if len(sys.argv) > 2 else BUSINESSES_JSON
+            ensure_schema()
+            inserted, skipped = load_businesses_json(json_file)
+            print(f"Loaded {json_file}: {inserted} inserted, {skipped} already present")
         elif cmd == 'full':
             print("Full pipeline: export -> create -> import")
             export_from_sqlserver()
@@ -279,7 +584,7 @@ if __name__ == '__main__':
             import_to_sqlite()
         else:
             print(f"Unknown command: {cmd}")
-            print("Usage: python init_db.py [export|import|full]")
+            print("Usage: python init_db.py [export|import|full|businesses [file.json]]")
     else:
         print("Creating SQLite database...")
         create_tables()
@@ -287,3 +592,4 @@ if __name__ == '__main__':
         print("\nTo export from SQL Server:  python init_db.py export")
         print("To import into SQLite:      python init_db.py import")
         print("To do both:                 python init_db.py full")
+        print("To load businesses JSON:    python init_db.py businesses [file.json]")
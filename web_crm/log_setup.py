@@ -0,0 +1,211 @@
+"""
+Shared logging setup for the web CRM and the ingestion scripts.
+
+Log calls only format the record and put it on an in-memory queue; a
+background QueueListener thread does the blocking file/console writes.
+Files rotate by size (logs/<name>.log, .1, .2, ...) instead of one file per
+run/day. Set LOG_JSON=1 (or json_lines=True) for structured JSON lines.
+
+RotatingFileHandler is only safe with one writer per file. Multi-worker
+servers (wsgi.py, gunicorn) set LOG_PER_PROCESS=1 (or per_process=True) so
+each worker logs to its own logs/<name>.<pid>.log and rotates it alone.
+
+    from log_setup import setup_logging, SamplingFilter
+    setup_logging('pull_businesses')
+    logger = logging.getLogger(__name__)
+    logger.addFilter(SamplingFilter(every=20, prefixes=('OK:', 'SKIP')))
+
+Run `python log_setup.py --bench` to compare against a synchronous FileHandler.
+"""
+
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+MAX_BYTES = 10 * 1024 * 1024  # rotate at 10 MB
+BACKUP_COUNT = 5
+
+_listener = None
+_listener_pid = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg (+ exc)."""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass only 1 in `every` records whose message starts with one of `prefixes`.
+
+    Used for high-volume per-item lines (e.g. 'OK:' / 'SKIP' in the Street View
+    downloader). Other messages and WARNING+ records always pass. The number
+    of suppressed records per prefix is kept in `suppressed`.
+    """
+
+    def __init__(self, every=10, prefixes=('OK:', 'SKIP')):
+        super().__init__()
+        self.every = max(1, every)
+        self.prefixes = tuple(prefixes)
+        self.seen = dict.fromkeys(self.prefixes, 0)
+        self.suppressed = dict.fromkeys(self.prefixes, 0)
+
+    def filter(self, record):
+        if self.every == 1 or record.levelno >= logging.WARNING:
+            return True
+        msg = str(record.msg).lstrip()
+        for prefix in self.prefixes:
+            if msg.startswith(prefix):
+                self.seen[prefix] += 1
+                if (self.seen[prefix] - 1) % self.every == 0:
+                    return True
+                self.suppressed[prefix] += 1
+                return False
+        return True
+
+
+def setup_logging(name, level=logging.INFO, json_lines=None, console=True,
+                  max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, log_dir=LOG_DIR,
+                  per_process=None):
+    """Send root logging through a queue to a rotating file (and console).
+
+    Safe to call more than once; only the first call in each process installs
+    handlers (a forked worker replaces the ones it inherited). With
+    per_process the file name includes the pid. Returns the running QueueListener.
+    """
+    global _listener, _listener_pid
+    with _lock:
+        if _listener is not None:
+            if _listener_pid == os.getpid():
+                return _listener
+            # Forked after setup: the listener thread didn't survive the fork
+            root = logging.getLogger()
+            for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+                root.removeHandler(handler)
+            _listener = None
+
+        if json_lines is None:
+            json_lines = os.environ.get('LOG_JSON', '0') == '1'
+        if per_process is None:
+            per_process = os.environ.get('LOG_PER_PROCESS', '0') == '1'
+        if per_process:
+            name = f'{name}.{os.getpid()}'
+        formatter = JsonFormatter() if json_lines else logging.Formatter(LOG_FORMAT)
+
+        os.makedirs(log_dir, exist_ok=True)
+        ext = 'jsonl' if json_lines else 'log'
+        file_handler = RotatingFileHandler(os.path.join(log_dir, f'{name}.{ext}'),
+                                           maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding='utf-8', delay=True)
+        file_handler.setFormatter(formatter)
+        handlers = [file_handler]
+        if console:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handlers.append(stream_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(QueueHandler(log_queue))
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+class _FsyncFileHandler(logging.FileHandler):
+    """FileHandler that fsyncs every record, standing in for slow/network disks."""
+
+    def flush(self):
+        super().flush()
+        if self.stream:
+            os.fsync(self.stream.fileno())
+
+
+def _bench(records=20000, fsync=False):
+    """Time per-call overhead of a sync FileHandler vs. the queued setup."""
+    import time
+    import tempfile
+
+    tmp = tempfile.mkdtemp(prefix='log_bench_')
+    handler_cls = _FsyncFileHandler if fsync else logging.FileHandler
+
+    sync_logger = logging.getLogger('bench.sync')
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    sync_handler = handler_cls(os.path.join(tmp, 'sync.log'))
+    sync_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    sync_logger.addHandler(sync_handler)
+    start = time.perf_counter()
+    for i in range(records):
+        sync_logger.info("  OK: Business %d -> /images/x.jpg (%d bytes)", i, i * 10)
+    sync_us = (time.perf_counter() - start) / records * 1e6
+    sync_handler.close()
+
+    listener = setup_logging('bench', console=False, log_dir=tmp)
+    if fsync:
+        queued_handler = handler_cls(os.path.join(tmp, 'queued.log'))
+        queued_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        listener.handlers = (queued_handler,)
+    queued_logger = logging.getLogger('bench.queued')
+    start = time.perf_counter()
+    for i in range(records):
+        queued_logger.info("  OK: Business %d -> /images/x.jpg (%d bytes)", i, i * 10)
+    queued_us = (time.perf_counter() - start) / records * 1e6
+
+    sampled = SamplingFilter(every=20)
+    queued_logger.addFilter(sampled)
+    start = time.perf_counter()
+    for i in range(records):
+        queued_logger.info("  OK: Business %d -> /images/x.jpg (%d bytes)", i, i * 10)
+    sampled_us = (time.perf_counter() - start) / records * 1e6
+    shutdown_logging()
+
+    print(f"{records:,} records per run{' (fsync per record)' if fsync else ''} (log dir: {tmp})")
+    print(f"  sync FileHandler:      {sync_us:6.2f} us/call")
+    print(f"  QueueHandler:          {queued_us:6.2f} us/call")
+    print(f"  QueueHandler + 1/20:   {sampled_us:6.2f} us/call")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Shared logging setup')
+    parser.add_argument('--bench', action='store_true', help='Benchmark sync vs queued logging')
+    parser.add_argument('--records', type=int, default=20000, help='Records per benchmark run')
+    parser.add_argument('--fsync', action='store_true', help='fsync each record (simulates slow disks)')
+    args = parser.parse_args()
+    if args.bench:
+        _bench(args.records, fsync=args.fsync)
+    else:
+        parser.print_help()
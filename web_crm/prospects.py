@@ -0,0 +1,112 @@
+"""
+Prospect search over BUSINESSES and conversion to CRM contacts.
+
+Results are keyset-paginated on ID (WHERE ID > last seen id), so every page
+is an index range scan regardless of how deep the user pages. Filters map to
+indexes: CATEGORY -> IX_BUSINESSES_CATEGORY (CATEGORY, ID), radius ->
+BUSINESSES_RTREE (SQLite) or the geography distance (SQL Server).
+
+SQL Server needs the CONTACT_ID link column on its BUSINESSES table:
+    ALTER TABLE BUSINESSES ADD CONTACT_ID INT NULL;
+"""
+
+import geo
+
+PAGE_SIZE = 50
+AUBURN_CENTER = (32.6099, -85.4808)
+METERS_PER_MILE = 1609.344
+
+
+def search_prospects(cur, sqlite=True, category='', lat=None, lon=None, radius_m=None,
+                     has_phone=False, min_rating=None, after_id=0, limit=PAGE_SIZE, row_to_dict=None):
+    """One page of businesses matching the filters, ordered by ID.
+
+    Returns (rows, next_after_id); next_after_id is None on the last page.
+    Rows get DISTANCE_M when a radius is given.
+    """
+    row_to_dict = row_to_dict or (lambda _cur, row: dict(row))
+    where = ["b.ID > ?"]
+    params = [after_id or 0]
+    select = "b.*"
+    if category:
+        where.append("b.CATEGORY = ?")
+        params.append(category)
+    if has_phone:
+        where.append("b.PHONE IS NOT NULL AND b.PHONE <> ''")
+    if min_rating is not None:
+        where.append("b.RATING >= ?")
+        params.append(min_rating)
+
+    select_params = []
+    if radius_m and lat is not None and lon is not None:
+        dist, select_params = geo.distance_sql('b', lat, lon, sqlite)
+        select += f", {dist} AS DISTANCE_M"
+        radius_where, radius_params = geo.within_radius_sql('BUSINESSES', 'b', lat, lon, radius_m, sqlite)
+        where.append(radius_where)
+        params += radius_params
+
+    # Fetch one extra row to know whether there is a next page
+    top = "" if sqlite else f"TOP ({int(limit) + 1}) "
+    sql = f"SELECT {top}{select} FROM BUSINESSES b WHERE {' AND '.join(where)} ORDER BY b.ID"
+    if sqlite:
+        sql += f" LIMIT {int(limit) + 1}"
+    cur.execute(sql, select_params + params)
+    rows = [row_to_dict(cur, row) for row in cur.fetchall()]
+    next_after = rows[limit - 1]['ID'] if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+def category_counts(cur):
+    """[(category, count)] for the filter dropdown (covered by IX_BUSINESSES_CATEGORY)."""
+    cur.execute("""
+        SELECT CATEGORY, COUNT(*) FROM BUSINESSES
+        WHERE CATEGORY IS NOT NULL AND CATEGORY <> ''
+        GROUP BY CATEGORY ORDER BY CATEGORY
+    """)
+    return [(row[0], row[1]) for row in cur.fetchall()]
+
+
+def convert_to_contact(conn, business_id, sqlite=True):
+    """Create a CONTACTS row from a business and link it. Returns (contact_id, created).
+
+    A business that was already converted returns its existing contact.
+    """
+    now = "datetime('now')" if sqlite else "GETDATE()"
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT NAME, CATEGORY, ADDRESS, CITY, STATE, ZIP, PHONE, WEBSITE, SOURCE, RATING, CONTACT_ID
+            FROM BUSINESSES WHERE ID = ?
+        """, (business_id,))
+        biz = cur.fetchone()
+        if biz is None:
+            raise LookupError(f"Business #{business_id} not found")
+        name, category, address, city, state, zip_code, phone, website, source, rating, contact_id = biz
+        if contact_id:
+            return contact_id, False
+
+        notes = f"Converted from prospect list ({source or 'Businesses'}): {category or 'Uncategorized'}"
+        if website:
+            notes += f"\nWebsite: {website}"
+        if rating:
+            notes += f"\nGoogle rating: {rating}"
+        values = (name, address or '', city or 'Auburn', state or 'AL', zip_code or '', phone or '', notes)
+        insert = f"""
+            INSERT INTO CONTACTS (FIRST_NAME, LAST_NAME, COMPANY, ADDRESS, CITY, STATE, ZIP, PHONE,
+                CONTACT_TYPE, LEAD_SOURCE, LEAD_STATUS, PROPERTY_TYPE, NOTES, CREATED_DATE, UPDATED_DATE)
+            VALUES ('', '', ?, ?, ?, ?, ?, ?, 'Prospect', 'Other', 'New', 'Commercial', ?, {now}, {now})
+        """
+        if sqlite:
+            cur.execute(insert, values)
+            contact_id = cur.lastrowid
+        else:
+            # CONTACTS has a SYNC_LOG trigger, which rules out a bare OUTPUT clause
+            cur.execute(f"SET NOCOUNT ON; {insert}; SELECT CAST(SCOPE_IDENTITY() AS INT)", values)
+            contact_id = cur.fetchone()[0]
+        cur.execute(f"UPDATE BUSINESSES SET CONTACT_ID = ?, UPDATED_DATE = {now} WHERE ID = ?",
+                    (contact_id, business_id))
+        conn.commit()
+        return contact_id, True
+    except Exception:
+        conn.rollback()
+        raise
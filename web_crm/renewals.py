@@ -0,0 +1,213 @@
+"""
+Recurring-deal renewal scheduler.
+
+Won deals with RECURRING = 1 and a RECURRING_FREQUENCY carry a
+NEXT_RENEWAL_DATE. Each run, in one transaction:
+  1. backfills NEXT_RENEWAL_DATE for recurring Won deals that don't have one
+     (won/close/created date + one period),
+  2. skips missed periods older than the most recent one, so a deal that
+     hasn't been processed for a while (or was won long ago) gets one
+     renewal for the period currently due instead of one per missed period,
+  3. inserts a 'Scheduled' renewal deal for every deal due within the lead
+     window (including that overdue period) and advances the parent's
+     NEXT_RENEWAL_DATE by one period,
+  4. inserts a follow-up 'Renewal' task for each renewal deal without one.
+
+All steps are INSERT ... SELECT / UPDATE statements, so a run is a handful of
+queries no matter how many recurring customers there are. Reruns are safe:
+renewals are unique on (RENEWED_FROM_DEAL_ID, RENEWAL_DUE_DATE) and every
+insert is guarded by NOT EXISTS.
+
+SQL Server DDL: see SQLSERVER_DDL below (run once by ensure_sqlserver()).
+
+Usage (e.g. as a daily PythonAnywhere scheduled task):
+    python renewals.py
+    python renewals.py --as-of 2026-06-01 --lead-days 30 --dry-run
+"""
+
+import logging
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_MONTHS = {
+    'Monthly': 1,
+    'Quarterly': 3,
+    'Semi-Annual': 6,
+    'Annual': 12,
+}
+DEFAULT_LEAD_DAYS = 14      # create renewals this many days before they're due
+MAX_SKIP_PERIODS = 600      # safety cap on step 2 (50 years of monthly periods)
+
+SQLSERVER_DDL = [
+    """
+    IF COL_LENGTH('DEALS', 'NEXT_RENEWAL_DATE') IS NULL
+        ALTER TABLE DEALS ADD NEXT_RENEWAL_DATE DATE NULL
+    """,
+    """
+    IF COL_LENGTH('DEALS', 'RENEWED_FROM_DEAL_ID') IS NULL
+        ALTER TABLE DEALS ADD RENEWED_FROM_DEAL_ID INT NULL
+    """,
+    """
+    IF COL_LENGTH('DEALS', 'RENEWAL_DUE_DATE') IS NULL
+        ALTER TABLE DEALS ADD RENEWAL_DUE_DATE DATE NULL
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_DEALS_NEXT_RENEWAL' AND object_id = OBJECT_ID('DEALS'))
+        CREATE INDEX IX_DEALS_NEXT_RENEWAL ON DEALS(NEXT_RENEWAL_DATE) WHERE RECURRING = 1 AND STAGE = 'Won'
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_DEALS_RENEWAL' AND object_id = OBJECT_ID('DEALS'))
+        CREATE UNIQUE INDEX UX_DEALS_RENEWAL ON DEALS(RENEWED_FROM_DEAL_ID, RENEWAL_DUE_DATE)
+            WHERE RENEWED_FROM_DEAL_ID IS NOT NULL
+    """,
+]
+
+_sqlserver_ready = False
+
+
+def ensure_sqlserver(conn):
+    """Add the renewal columns and indexes to SQL Server (SQLite gets them from init_db). Once per process."""
+    global _sqlserver_ready
+    if _sqlserver_ready:
+        return
+    cur = conn.cursor()
+    for ddl in SQLSERVER_DDL:
+        cur.execute(ddl)
+    conn.commit()
+    _sqlserver_ready = True
+
+
+def _months_case():
+    whens = ' '.join(f"WHEN '{freq}' THEN {months}" for freq, months in FREQUENCY_MONTHS.items())
+    return f"CASE RECURRING_FREQUENCY {whens} END"
+
+
+def _add_period(col, sqlite):
+    """SQL expression: date column + one recurring period for that deal."""
+    months = _months_case()
+    if sqlite:
+        return f"date({col}, '+' || ({months}) || ' months')"
+    return f"DATEADD(month, {months}, CAST({col} AS DATE))"
+
+
+def _concat(sqlite, *parts):
+    return (' || ' if sqlite else ' + ').join(parts)
+
+
+def _as_text(col, sqlite):
+    return col if sqlite else f"CONVERT(VARCHAR(10), {col}, 23)"
+
+
+def run_renewals(conn, sqlite=True, as_of=None, lead_days=DEFAULT_LEAD_DAYS, dry_run=False):
+    """Generate due renewal deals and follow-up tasks. Returns a count summary."""
+    as_of = as_of or date.today()
+    horizon = (as_of + timedelta(days=lead_days)).isoformat()
+    now = "datetime('now')" if sqlite else "GETDATE()"
+    frequencies = ', '.join(f"'{f}'" for f in FREQUENCY_MONTHS)
+    recurring_won = f"d.RECURRING = 1 AND d.STAGE = 'Won' AND d.RECURRING_FREQUENCY IN ({frequencies})"
+    next_period = _add_period('NEXT_RENEWAL_DATE', sqlite)
+
+    def advance(cur, test, until):
+        """Move NEXT_RENEWAL_DATE on one period for every deal where `<test> until` holds."""
+        cur.execute(f"""
+            UPDATE DEALS SET NEXT_RENEWAL_DATE = {next_period}
+            WHERE RECURRING = 1 AND STAGE = 'Won' AND RECURRING_FREQUENCY IN ({frequencies})
+              AND {test} ?
+        """, (until,))
+        return max(cur.rowcount, 0)
+
+    if not sqlite:
+        ensure_sqlserver(conn)
+    cur = conn.cursor()
+    summary = {'backfilled': 0, 'skipped': 0, 'renewals': 0, 'tasks': 0}
+    try:
+        # 1. Backfill next due date for newly won recurring deals
+        anchor = "COALESCE(WON_DATE, CLOSE_DATE, CREATED_DATE)"
+        cur.execute(f"""
+            UPDATE DEALS SET NEXT_RENEWAL_DATE = {_add_period(anchor, sqlite)}
+            WHERE RECURRING = 1 AND STAGE = 'Won' AND NEXT_RENEWAL_DATE IS NULL
+              AND RECURRING_FREQUENCY IN ({frequencies})
+        """)
+        summary['backfilled'] = max(cur.rowcount, 0)
+
+        # 2. Stale deals skip missed periods up to the most recent one, which step 3 renews
+        for _ in range(MAX_SKIP_PERIODS):
+            moved = advance(cur, f"{next_period} <=", as_of.isoformat())
+            if not moved:
+                break
+            summary['skipped'] += moved
+
+        # 3. One renewal for the period now due (overdue or within the lead window),
+        #    then move the parent on by a period
+        cur.execute(f"""
+            INSERT INTO DEALS (CONTACT_ID, DEAL_NAME, SERVICE_TYPE, STAGE, AMOUNT, CLOSE_DATE,
+                PROBABILITY, RECURRING, RECURRING_FREQUENCY, NOTES,
+                RENEWED_FROM_DEAL_ID, RENEWAL_DUE_DATE, CREATED_DATE, UPDATED_DATE)
+            SELECT d.CONTACT_ID,
+                {_concat(sqlite, 'd.DEAL_NAME', "' - Renewal '", _as_text('d.NEXT_RENEWAL_DATE', sqlite))},
+                d.SERVICE_TYPE, 'Scheduled', d.AMOUNT, d.NEXT_RENEWAL_DATE,
+                100, 0, '',
+                {_concat(sqlite, "'Auto-generated '", 'd.RECURRING_FREQUENCY', "' renewal of deal #'",
+                         'CAST(d.DEAL_ID AS VARCHAR(12))')},
+                d.DEAL_ID, d.NEXT_RENEWAL_DATE, {now}, {now}
+            FROM DEALS d
+            WHERE {recurring_won} AND d.NEXT_RENEWAL_DATE <= ?
+              AND NOT EXISTS (SELECT 1 FROM DEALS r
+                              WHERE r.RENEWED_FROM_DEAL_ID = d.DEAL_ID
+                                AND r.RENEWAL_DUE_DATE = d.NEXT_RENEWAL_DATE)
+        """, (horizon,))
+        summary['renewals'] = max(cur.rowcount, 0)
+        advance(cur, 'NEXT_RENEWAL_DATE <=', horizon)
+
+        # 4. Follow-up task for every renewal deal that doesn't have one yet
+        cur.execute(f"""
+            INSERT INTO TASKS (CONTACT_ID, DEAL_ID, TASK_TYPE, DESCRIPTION, DUE_DATE,
+                PRIORITY, STATUS, ASSIGNED_TO, CREATED_DATE)
+            SELECT r.CONTACT_ID, r.DEAL_ID, 'Renewal',
+                {_concat(sqlite, "'Schedule renewal: '", 'r.DEAL_NAME')},
+                r.RENEWAL_DUE_DATE, 'Normal', 'Pending', 'Jason', {now}
+            FROM DEALS r
+            WHERE r.RENEWED_FROM_DEAL_ID IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM TASKS t
+                              WHERE t.DEAL_ID = r.DEAL_ID AND t.TASK_TYPE = 'Renewal')
+        """)
+        summary['tasks'] = max(cur.rowcount, 0)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    logger.info(f"Renewals as of {as_of} (horizon {horizon}){' [dry run]' if dry_run else ''}: {summary}")
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import get_db, init_logging, USE_SQLITE
+
+    parser = argparse.ArgumentParser(description='Generate renewal deals and tasks for recurring Won deals')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help='Run as if today were this date (YYYY-MM-DD)')
+    parser.add_argument('--lead-days', type=int, default=DEFAULT_LEAD_DAYS,
+                        help=f'Create renewals this many days ahead (default: {DEFAULT_LEAD_DAYS})')
+    parser.add_argument('--dry-run', action='store_true', help='Report counts without committing')
+    args = parser.parse_args()
+
+    init_logging()
+    if USE_SQLITE:
+        from init_db import ensure_schema
+        ensure_schema()
+
+    conn = get_db()
+    try:
+        result = run_renewals(conn, sqlite=USE_SQLITE, as_of=args.as_of,
+                              lead_days=args.lead_days, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    print(f"Backfilled: {result['backfilled']}  Skipped periods: {result['skipped']}  Renewal deals: {result['renewals']}  Tasks: {result['tasks']}"
+          f"{'  (dry run, rolled back)' if args.dry_run else ''}")
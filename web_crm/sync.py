@@ -0,0 +1,362 @@
+"""
+Delta sync between the CRM database and the offline static app (docs/app.js).
+
+SYNC_LOG holds one row per synced record: the table, the record's id, a
+tombstone flag and SEQ, a sequence number that every insert, update or
+delete of the record moves to the end of the log (triggers replace the old
+row). SEQ is the sync cursor. A client that has seen everything up to SEQ n
+asks for SEQ > n and gets each changed record once, in its latest state, no
+matter how many times it was edited in between. An update that only touches
+UPDATED_DATE (e.g. a competitor pull that found nothing new) keeps its SEQ,
+so unchanged rows are never resent.
+
+changes() builds the feed in the static app's own field names (firstName,
+contactId, ...) and sends rows as arrays under one field list per table:
+
+    {"v": 1, "cursor": 812, "more": false,
+     "tables": {"contacts": {"fields": ["id", "firstName", ..., "_v"],
+                             "rows": [[14, "Mike", ..., 809]], "deleted": [3]}}}
+
+`_v` is the record's SEQ: the version the client last saw. apply_push()
+applies a batch of offline edits in one transaction. An edit carries that
+version as `base`, and is refused as a conflict (returning the server's row)
+when the record has changed since. Records created offline carry negative
+ids; the server assigns real ids, rewrites references to them later in the
+same batch (a new deal for a new contact), and returns the mapping. A batch
+id makes a retried push return the stored results instead of applying twice.
+
+SQL Server DDL: see SQLSERVER_DDL below (run once by ensure_sqlserver()).
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+FEED_VERSION = 1
+DEFAULT_LIMIT = 1000     # log entries per feed page; clients loop while "more"
+MAX_LIMIT = 5000
+MAX_PUSH_OPS = 500
+PUSH_RETENTION_DAYS = 30
+ID_CHUNK = 500           # ids per IN (...) lookup
+
+
+def _camel(column):
+    head, *rest = column.lower().split('_')
+    return head + ''.join(w.title() for w in rest)
+
+
+class SyncTable:
+    """A table the static app mirrors: its key, field <-> column names and whether it accepts pushes."""
+
+    def __init__(self, name, table, key, columns, renames=None, writable=True, on_delete=()):
+        self.name = name
+        self.table = table
+        self.key = key
+        renames = renames or {}
+        self.fields = {renames.get(col, _camel(col)): col for col in columns}   # field -> column
+        self.writable = writable
+        self.on_delete = list(on_delete)   # statements run with the id before a delete, for dependent rows
+
+    @property
+    def field_names(self):
+        return ['id'] + list(self.fields) + ['_v']
+
+    @property
+    def columns(self):
+        return list(self.fields.values())
+
+
+TABLES = {t.name: t for t in [
+    SyncTable('contacts', 'CONTACTS', 'CONTACT_ID', [
+        'FIRST_NAME', 'LAST_NAME', 'COMPANY', 'JOB_TITLE', 'EMAIL', 'PHONE', 'ADDRESS', 'CITY', 'STATE', 'ZIP',
+        'NEIGHBORHOOD', 'CONTACT_TYPE', 'LEAD_SOURCE', 'LEAD_STATUS', 'INTEREST_SERVICES', 'PROPERTY_TYPE',
+        'ESTIMATED_VALUE', 'RATING', 'NOTES', 'ASSIGNED_TO', 'DO_NOT_CONTACT', 'CREATED_DATE', 'UPDATED_DATE'],
+        # Same cascade as the web UI's contact delete
+        on_delete=["UPDATE TASKS SET DEAL_ID = NULL WHERE DEAL_ID IN (SELECT DEAL_ID FROM DEALS WHERE CONTACT_ID = ?)",
+                   "DELETE FROM INTERACTIONS WHERE CONTACT_ID = ?", "DELETE FROM TASKS WHERE CONTACT_ID = ?",
+                   "DELETE FROM DEALS WHERE CONTACT_ID = ?", "DELETE FROM CAMPAIGN_CONTACTS WHERE CONTACT_ID = ?"]),
+    SyncTable('deals', 'DEALS', 'DEAL_ID', [
+        'CONTACT_ID', 'DEAL_NAME', 'SERVICE_TYPE', 'STAGE', 'AMOUNT', 'CLOSE_DATE', 'PROBABILITY',
+        'RECURRING_FREQUENCY', 'NOTES', 'WON_DATE', 'LOST_REASON', 'NEXT_RENEWAL_DATE', 'CREATED_DATE',
+        'UPDATED_DATE'], renames={'DEAL_NAME': 'name', 'RECURRING_FREQUENCY': 'recurring'},
+        on_delete=["UPDATE TASKS SET DEAL_ID = NULL WHERE DEAL_ID = ?"]),
+    SyncTable('tasks', 'TASKS', 'TASK_ID', [
+        'CONTACT_ID', 'DEAL_ID', 'TASK_TYPE', 'DESCRIPTION', 'DUE_DATE', 'PRIORITY', 'STATUS', 'ASSIGNED_TO',
+        'COMPLETED_DATE', 'CREATED_DATE']),
+    SyncTable('interactions', 'INTERACTIONS', 'INTERACTION_ID', [
+        'CONTACT_ID', 'INTERACTION_TYPE', 'DIRECTION', 'SUBJECT', 'NOTES', 'OUTCOME', 'FOLLOW_UP_DATE',
+        'CREATED_BY', 'CREATED_DATE'], renames={'INTERACTION_TYPE': 'type'}),
+    SyncTable('campaigns', 'CAMPAIGNS', 'CAMPAIGN_ID', [
+        'CAMPAIGN_NAME', 'CAMPAIGN_TYPE', 'TARGET_AREA', 'START_DATE', 'END_DATE', 'BUDGET', 'LEADS_GENERATED',
+        'DEALS_WON', 'REVENUE_GENERATED', 'STATUS', 'NOTES', 'CREATED_DATE'], renames={'CAMPAIGN_NAME': 'name'},
+        on_delete=["DELETE FROM CAMPAIGN_CONTACTS WHERE CAMPAIGN_ID = ?"]),
+    # Filled by scripts/pull_competitors.py; the static app only reads them
+    SyncTable('competitors', 'COMPETITORS', 'COMPETITOR_ID', [
+        'COMPANY_NAME', 'CATEGORY', 'ADDRESS', 'CITY', 'STATE', 'PHONE', 'WEBSITE', 'RATING', 'REVIEW_COUNT',
+        'PRICE_RANGE', 'STRENGTHS', 'WEAKNESSES', 'NOTES', 'GOOGLE_MAPS_URL', 'LATITUDE', 'LONGITUDE'],
+        renames={'COMPANY_NAME': 'name', 'RATING': 'googleRating'}, writable=False),
+]}
+
+# Fields holding another synced record's id (rewritten when that record was created offline)
+REFERENCES = {'contactId': 'contacts', 'dealId': 'deals'}
+
+SQLSERVER_DDL = [
+    """
+    IF OBJECT_ID('SYNC_LOG') IS NULL
+        CREATE TABLE SYNC_LOG (
+            SEQ BIGINT IDENTITY(1,1) PRIMARY KEY, TABLE_NAME VARCHAR(40) NOT NULL, ROW_ID INT NOT NULL,
+            DELETED BIT NOT NULL DEFAULT 0, CONSTRAINT UX_SYNC_LOG_ROW UNIQUE (TABLE_NAME, ROW_ID)
+        )
+    """,
+    """
+    IF OBJECT_ID('SYNC_PUSHES') IS NULL
+        CREATE TABLE SYNC_PUSHES (
+            BATCH_ID VARCHAR(64) PRIMARY KEY, RESULT NVARCHAR(MAX) NOT NULL,
+            CREATED_DATE DATETIME NOT NULL DEFAULT GETDATE()
+        )
+    """,
+] + [f"""
+    IF OBJECT_ID('TRG_{t.table}_SYNC') IS NULL EXEC('
+        CREATE TRIGGER TRG_{t.table}_SYNC ON {t.table} AFTER INSERT, UPDATE, DELETE AS
+        BEGIN
+            SET NOCOUNT ON;
+            DELETE FROM SYNC_LOG WHERE TABLE_NAME = ''{t.table}''
+                AND ROW_ID IN (SELECT {t.key} FROM inserted UNION SELECT {t.key} FROM deleted);
+            INSERT INTO SYNC_LOG (TABLE_NAME, ROW_ID, DELETED)
+                SELECT ''{t.table}'', {t.key}, 0 FROM inserted
+                UNION ALL
+                SELECT ''{t.table}'', {t.key}, 1 FROM deleted WHERE {t.key} NOT IN (SELECT {t.key} FROM inserted);
+        END')
+    """ for t in TABLES.values()] + [f"""
+    INSERT INTO SYNC_LOG (TABLE_NAME, ROW_ID, DELETED)
+        SELECT '{t.table}', {t.key}, 0 FROM {t.table} s
+        WHERE NOT EXISTS (SELECT 1 FROM SYNC_LOG l WHERE l.TABLE_NAME = '{t.table}' AND l.ROW_ID = s.{t.key})
+    """ for t in TABLES.values()]
+
+_sqlserver_ready = False
+
+
+def ensure_sqlserver(conn):
+    """Create SYNC_LOG, SYNC_PUSHES and the triggers on SQL Server (SQLite gets them from init_db). Once per process."""
+    global _sqlserver_ready
+    if _sqlserver_ready:
+        return
+    cur = conn.cursor()
+    for ddl in SQLSERVER_DDL:
+        cur.execute(ddl)
+    conn.commit()
+    _sqlserver_ready = True
+
+
+def create_sqlite_triggers(cur):
+    """(Re)create the SYNC_LOG triggers and log any rows that predate them."""
+    for t in TABLES.values():
+        watched = ' OR '.join(f"NEW.{c} IS NOT OLD.{c}" for c in t.columns if c != 'UPDATED_DATE')
+        for op, ref, deleted, when in [('INSERT', 'NEW', 0, ''),
+                                       ('UPDATE', 'NEW', 0, f"WHEN {watched}"),
+                                       ('DELETE', 'OLD', 1, '')]:
+            cur.execute(f"DROP TRIGGER IF EXISTS TRG_{t.table}_{op}_SYNC")
+            cur.execute(f"""
+                CREATE TRIGGER TRG_{t.table}_{op}_SYNC
+                AFTER {op} ON {t.table} {when}
+                BEGIN
+                    DELETE FROM SYNC_LOG WHERE TABLE_NAME = '{t.table}' AND ROW_ID = {ref}.{t.key};
+                    INSERT INTO SYNC_LOG (TABLE_NAME, ROW_ID, DELETED) VALUES ('{t.table}', {ref}.{t.key}, {deleted});
+                END
+            """)
+        cur.execute(f"INSERT OR IGNORE INTO SYNC_LOG (TABLE_NAME, ROW_ID, DELETED) "
+                    f"SELECT '{t.table}', {t.key}, 0 FROM {t.table}")
+
+
+def _value(v):
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return v
+
+
+def _fetch_rows(cur, spec, ids):
+    """{id: [field values...]} for the ids that still exist."""
+    rows = {}
+    ids = list(ids)
+    for i in range(0, len(ids), ID_CHUNK):
+        chunk = ids[i:i + ID_CHUNK]
+        cur.execute(f"SELECT {spec.key}, {', '.join(spec.columns)} FROM {spec.table} "
+                    f"WHERE {spec.key} IN ({', '.join('?' * len(chunk))})", chunk)
+        for row in cur.fetchall():
+            rows[row[0]] = [_value(v) for v in row]
+    return rows
+
+
+def changes(conn, since=0, tables=None, limit=DEFAULT_LIMIT, sqlite=True):
+    """The feed page after cursor `since` for the named tables (all by default)."""
+    specs = [TABLES[name] for name in (tables or TABLES)]
+    names = [s.table for s in specs]
+    marks = ', '.join('?' * len(names))
+    cur = conn.cursor()
+    if sqlite:
+        conn.execute("BEGIN")   # read the log and the rows from one snapshot
+        sql = (f"SELECT SEQ, TABLE_NAME, ROW_ID, DELETED FROM SYNC_LOG "
+               f"WHERE SEQ > ? AND TABLE_NAME IN ({marks}) ORDER BY SEQ LIMIT {limit + 1}")
+    else:
+        # Locking read: wait for writers holding lower SEQs instead of skipping past them
+        sql = (f"SELECT TOP {limit + 1} SEQ, TABLE_NAME, ROW_ID, DELETED FROM SYNC_LOG WITH (READCOMMITTEDLOCK) "
+               f"WHERE SEQ > ? AND TABLE_NAME IN ({marks}) ORDER BY SEQ")
+    try:
+        cur.execute(sql, [since] + names)
+        log = cur.fetchall()
+        more = len(log) > limit
+        log = log[:limit]
+
+        entries = {}
+        for seq, table, row_id, deleted in log:
+            entries.setdefault(table, []).append((seq, row_id, deleted))
+        out = {}
+        for spec in specs:
+            if spec.table not in entries:
+                continue
+            live = {row_id: seq for seq, row_id, deleted in entries[spec.table] if not deleted}
+            deleted = [row_id for _, row_id, gone in entries[spec.table] if gone]
+            found = _fetch_rows(cur, spec, live)
+            deleted += [row_id for row_id in live if row_id not in found]   # deleted since the log read
+            out[spec.name] = {'fields': spec.field_names, 'deleted': deleted,
+                              'rows': [found[row_id] + [seq] for row_id, seq in live.items() if row_id in found]}
+    finally:
+        if sqlite:
+            conn.rollback()
+    return {'v': FEED_VERSION, 'cursor': log[-1][0] if log else since, 'more': more, 'tables': out}
+
+
+class PushError(ValueError):
+    """A malformed push batch; nothing was applied."""
+
+
+def _validate(ops):
+    if not isinstance(ops, list):
+        raise PushError("ops must be a list")
+    if len(ops) > MAX_PUSH_OPS:
+        raise PushError(f"at most {MAX_PUSH_OPS} ops per push")
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise PushError(f"op {i}: not an object")
+        spec = TABLES.get(op.get('t'))
+        if spec is None or not spec.writable:
+            raise PushError(f"op {i}: table must be one of {sorted(n for n, t in TABLES.items() if t.writable)}")
+        if op.get('op') not in ('put', 'del'):
+            raise PushError(f"op {i}: op must be 'put' or 'del'")
+        if not isinstance(op.get('id'), int) or op['id'] == 0:
+            raise PushError(f"op {i}: id must be a non-zero integer (negative for records created offline)")
+        if op['op'] == 'put' and not isinstance(op.get('data'), dict):
+            raise PushError(f"op {i}: put needs a data object")
+
+
+def _version(cur, spec, row_id):
+    """(SEQ, DELETED) of a record in SYNC_LOG, or None if it was never logged."""
+    cur.execute("SELECT SEQ, DELETED FROM SYNC_LOG WHERE TABLE_NAME = ? AND ROW_ID = ?", (spec.table, row_id))
+    row = cur.fetchone()
+    return (row[0], bool(row[1])) if row else None
+
+
+def _server_row(cur, spec, row_id, seq):
+    row = _fetch_rows(cur, spec, [row_id]).get(row_id)
+    return dict(zip(spec.field_names, row + [seq])) if row else None
+
+
+def _columns(spec, data, id_map):
+    """{column: value} for the known fields in data, with offline ids swapped for server ids."""
+    values = {}
+    for field, value in data.items():
+        column = spec.fields.get(field)
+        if column is None:
+            continue
+        if field in REFERENCES and isinstance(value, int) and value < 0:
+            value = id_map.get((REFERENCES[field], value))   # unknown offline id -> no link
+        values[column] = value
+    if spec.name == 'deals' and 'RECURRING_FREQUENCY' in values:
+        values['RECURRING'] = 1 if values['RECURRING_FREQUENCY'] else 0
+    return values
+
+
+def _insert(cur, spec, values, sqlite):
+    cols = list(values)
+    sql = (f"INSERT INTO {spec.table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+           if cols else f"INSERT INTO {spec.table} DEFAULT VALUES")
+    if sqlite:
+        cur.execute(sql, list(values.values()))
+        return cur.lastrowid
+    # The SYNC_LOG trigger rules out a bare OUTPUT clause
+    cur.execute(f"SET NOCOUNT ON; {sql}; SELECT CAST(SCOPE_IDENTITY() AS INT)", list(values.values()))
+    return cur.fetchone()[0]
+
+
+def _apply(cur, spec, op, id_map, sqlite):
+    row_id, base = op['id'], op.get('base')
+    if op['op'] == 'put' and row_id < 0:
+        values = _columns(spec, op['data'], id_map)
+        new_id = _insert(cur, spec, values, sqlite)
+        id_map[(spec.name, row_id)] = new_id
+        return {'status': 'ok', 'id': new_id, 'v': _version(cur, spec, new_id)[0]}
+    if row_id < 0:   # delete of a record that never reached the server
+        row_id = id_map.get((spec.name, row_id))
+        if row_id is None:
+            return {'status': 'ok', 'id': op['id']}
+
+    version = _version(cur, spec, row_id)
+    if version is None or version[1]:
+        return {'status': 'ok' if op['op'] == 'del' else 'gone', 'id': row_id}
+    if base is not None and version[0] != base:
+        return {'status': 'conflict', 'id': row_id, 'row': _server_row(cur, spec, row_id, version[0])}
+
+    if op['op'] == 'del':
+        for sql in spec.on_delete:
+            cur.execute(sql, (row_id,))
+        cur.execute(f"DELETE FROM {spec.table} WHERE {spec.key} = ?", (row_id,))
+        return {'status': 'ok', 'id': row_id}
+    values = _columns(spec, op['data'], id_map)
+    if values:
+        cur.execute(f"UPDATE {spec.table} SET {', '.join(f'{c} = ?' for c in values)} WHERE {spec.key} = ?",
+                    list(values.values()) + [row_id])
+    return {'status': 'ok', 'id': row_id, 'v': _version(cur, spec, row_id)[0]}
+
+
+def apply_push(conn, ops, batch_id=None, sqlite=True):
+    """Apply offline edits in order, in one transaction, and commit.
+
+    ops: [{"t": table, "op": "put"|"del", "id": id, "base": _v, "data": {field: value}}]
+    Returns {"results": [{"status": "ok"|"conflict"|"gone", "id", "v"?, "row"?}], "ids": {table: {offline: id}}}.
+    Raises PushError (nothing applied) for a malformed batch; database errors roll back the whole batch.
+    """
+    _validate(ops)
+    cur = conn.cursor()
+    try:
+        if batch_id:
+            cur.execute("SELECT RESULT FROM SYNC_PUSHES WHERE BATCH_ID = ?", (batch_id,))
+            row = cur.fetchone()
+            if row:
+                logger.info(f"Sync push {batch_id}: replayed stored result")
+                return json.loads(row[0])
+
+        id_map = {}
+        results = [_apply(cur, TABLES[op['t']], op, id_map, sqlite) for op in ops]
+        ids = {}
+        for (name, offline_id), server_id in id_map.items():
+            ids.setdefault(name, {})[offline_id] = server_id
+        response = {'results': results, 'ids': ids}
+
+        if batch_id:
+            stale = (f"datetime('now', '-{PUSH_RETENTION_DAYS} days')" if sqlite
+                     else f"DATEADD(day, -{PUSH_RETENTION_DAYS}, GETDATE())")
+            cur.execute(f"DELETE FROM SYNC_PUSHES WHERE CREATED_DATE < {stale}")
+            cur.execute("INSERT INTO SYNC_PUSHES (BATCH_ID, RESULT) VALUES (?, ?)",
+                        (batch_id, json.dumps(response, default=_value)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conflicts = sum(r['status'] == 'conflict' for r in results)
+    logger.info(f"Sync push: {len(ops)} ops, {len(id_map)} created, {conflicts} conflicts")
+    return response
@@ -14,11 +14,11 @@ if project_dir not in sys.path:
 # Force SQLite mode for cloud deployment
 os.environ['USE_SQLITE'] = '1'
 os.environ['SECRET_KEY'] = 'tiger-marketing-crm-production-2026'
+# Each worker process rotates its own logs/web_crm.<pid>.log
+os.environ.setdefault('LOG_PER_PROCESS', '1')
 
-# Initialize database if needed
-db_path = os.path.join(project_dir, 'tiger_crm.db')
-if not os.path.exists(db_path):
-    from init_db import create_tables
-    create_tables()
+# Create/upgrade the database only if its schema version stamp is behind
+from init_db import ensure_schema
+ensure_schema()
 
 from app import app as application